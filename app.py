@@ -1,8 +1,17 @@
 import streamlit as st
 from src.data import load_graph_from_csv, generate_synthetic_graph
 from src.graph_analysis import GraphAnalyzer
-from src.visualization import create_pyvis_network, plot_centralities_summary
+from src.visualization import (LAYOUT_MAX_NODES, community_level, plot_centralities_summary, render_level,
+                               supergraph_level, top_degree_level)
+from src.community_detection import resolution_stability
+from src.csr_graph import CSRGraph
+from src.jobs import JobRunner
+from src.personalized_pagerank import PersonalizedPageRank
+from src.result_cache import ResultCache, graph_fingerprint
+from src import profiling
+import json
 import os
+import pandas as pd
 import time
 import io
 import zipfile
@@ -11,6 +20,112 @@ import zipfile
 st.set_page_config(page_title="Network Influence Analysis", layout="wide")
 st.title("🌐 Network Influence Analysis — Graph Theory Dashboard")
 
+@st.cache_resource
+def get_result_cache():
+    # one disk-backed cache per server process; analysis.py --cache_dir writes to the same directory
+    return ResultCache()
+
+@st.cache_resource
+def get_job_runner():
+    # analyses run here, outside the script, so widget changes neither interrupt nor repeat them
+    return JobRunner(max_workers=2)
+
+@st.cache_resource(max_entries=2)
+def get_ppr(fingerprint, _G):
+    # one query service (and LRU cache of answers) per graph, shared across reruns and sessions
+    return PersonalizedPageRank(_G, weight=None)
+
+def run_analysis(job, G, cache, backend, method, sweep, betweenness_k, closeness_k, n_jobs, seed):
+    """Background job: communities, then centralities, publishing results as soon as they are usable."""
+    analyzer = GraphAnalyzer(G, backend=backend)
+    job.progress('fingerprint', "Hashing the graph for the result cache...")
+    fingerprint = graph_fingerprint(G)
+    # the igraph backend runs Louvain as multilevel, so it shares that partition's cache entry
+    partition_method = 'igraph_multilevel' if backend == 'igraph' else method
+    partition_params = {'method': partition_method, 'seed': seed}
+    if sweep is not None:
+        # same stage and params as analysis.py --resolutions, so either one warms the other
+        seeds = list(range(seed, seed + sweep['sweep_seeds']))
+        partition_params = {'resolutions': sweep['resolutions'], 'seeds': seeds, 'select': sweep['select']}
+
+    # --- Community Detection ---
+    job.progress('communities', "🧩 Computing communities...")
+    with profiling.stage('app.communities', graph=G):
+        t0 = time.time()
+        if sweep is None:
+            analyzer.partition = cache.get('partition', fingerprint, partition_params)
+            cached = analyzer.partition is not None
+        else:
+            analyzer.sweep = cache.get('louvain_sweep', fingerprint, partition_params)
+            cached = analyzer.sweep is not None
+            analyzer.partition = analyzer.sweep['partition'] if cached else None
+        try:
+            # each step runs in a forked process that a cancel kills; the analyzer there is a copy
+            if not cached and sweep is None:
+                def communities():
+                    analyzer.compute_communities(method=partition_method, seed=seed)
+                    return analyzer.partition
+                analyzer.partition = job.run(communities)
+                cache.put('partition', fingerprint, partition_params, analyzer.partition)
+            elif not cached:
+                analyzer.sweep = job.run(analyzer.sweep_communities, partition_params['resolutions'],
+                                         partition_params['seeds'], n_jobs=n_jobs, select=sweep['select'])
+                analyzer.partition = analyzer.sweep['partition']
+                cache.put('louvain_sweep', fingerprint, partition_params, analyzer.sweep)
+            n_comms = len(set(analyzer.partition.values()))
+            best = f" (best run: resolution {analyzer.sweep['best'][0]}, seed {analyzer.sweep['best'][1]})" \
+                if analyzer.sweep is not None else ""
+            job.progress('communities', f"✅ {n_comms} communities in {time.time()-t0:.1f}s"
+                         + best + (" (cached)" if cached else ""))
+        except Exception as e:
+            job.progress('communities', f"❌ Community detection failed: {e}")
+            analyzer.partition = None
+
+    # --- Centralities ---
+    centrality_params = {
+        'partition': partition_params if analyzer.partition is not None else None,
+        'betweenness_k': betweenness_k,
+        'closeness_k': closeness_k,
+        'seed': seed,
+        'backend': backend,
+    }
+    analysis = {'graph': G, 'analyzer': analyzer, 'fingerprint': fingerprint,
+                'partition_key': centrality_params['partition'], 'csr': None}
+    cached = cache.get('centralities', fingerprint, centrality_params)
+    if cached is not None:
+        analyzer.centrality_df, analyzer.closeness_error = cached
+        job.publish('analysis', analysis)
+        job.progress('centralities', "✅ Centralities (cached)")
+        return
+
+    def centralities():
+        # runs in the step process; after the first table only the refined betweenness column is sent
+        def send(a):
+            job.send((a.betweenness_pivots, a.centrality_df['betweenness'].to_numpy() if sent else a.centrality_df))
+            sent.append(a.betweenness_pivots)
+        sent = []
+        analyzer.compute_centralities(betweenness_k=betweenness_k, n_jobs=n_jobs, closeness_k=closeness_k, seed=seed,
+                                      on_update=send)
+        return analyzer.centrality_df, analyzer.closeness_error, analyzer.betweenness_pivots
+
+    def on_update(update):
+        # the table is usable from the first betweenness estimate on; later ones replace it
+        analyzer.betweenness_pivots, values = update
+        df = analyzer.centrality_df
+        analyzer.centrality_df = values if isinstance(values, pd.DataFrame) else df.assign(betweenness=values)
+        job.publish('analysis', analysis)
+        if betweenness_k is not None and analyzer.betweenness_pivots is not None:
+            job.progress('betweenness', f"📈 Betweenness from {analyzer.betweenness_pivots} of {betweenness_k} pivots")
+
+    job.progress('centralities', "📊 Computing centralities...")
+    with profiling.stage('app.centralities', graph=G):
+        t0 = time.time()
+        analyzer.centrality_df, analyzer.closeness_error, analyzer.betweenness_pivots = \
+            job.run(centralities, on_message=on_update)
+    # only the complete table is cached; a cancelled run keeps its partial estimate on screen
+    cache.put('centralities', fingerprint, centrality_params, (analyzer.centrality_df, analyzer.closeness_error))
+    job.progress('centralities', f"✅ Centralities computed in {time.time()-t0:.1f}s")
+
 # ------------------- DATA SOURCE -------------------
 st.sidebar.header("📂 Data source")
 data_source = st.sidebar.selectbox(
@@ -19,22 +134,31 @@ data_source = st.sidebar.selectbox(
 )
 
 if data_source == "Generate synthetic graph":
-    n = st.sidebar.number_input("Nodes", min_value=100, max_value=200000, value=1000, step=100)
-    m = st.sidebar.number_input("Edges", min_value=100, max_value=1000000, value=3000, step=100)
+    models = {"Barabási–Albert": "ba", "Power-law (Chung–Lu)": "chung_lu", "Planted communities": "planted"}
+    model = st.sidebar.selectbox("Model", list(models))
+    n = st.sidebar.number_input("Nodes", min_value=100, max_value=5000000, value=1000, step=100)
+    m = st.sidebar.number_input("Edges", min_value=100, max_value=20000000, value=3000, step=100)
     seed = st.sidebar.number_input("Random seed", min_value=0, value=42)
+    n_communities, mixing = 10, 0.1
+    if models[model] == "planted":
+        n_communities = st.sidebar.number_input("Planted communities", min_value=2, max_value=10000, value=10)
+        mixing = st.sidebar.slider("Mixing (fraction of edges between communities)", 0.0, 1.0, 0.1)
     
     if st.sidebar.button("Generate"):
         with st.spinner("🔄 Generating synthetic graph..."):
-            G = generate_synthetic_graph(n_nodes=int(n), n_edges=int(m), seed=int(seed))
+            G = generate_synthetic_graph(n_nodes=int(n), n_edges=int(m), seed=int(seed), model=models[model],
+                                         n_communities=int(n_communities), mixing=float(mixing))
             st.session_state["graph"] = G
             st.success(f"✅ Generated graph: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
 
 else:
     uploaded = st.sidebar.file_uploader("Upload CSV (two columns: source,target)", type=["csv"])
-    if uploaded is not None:
+    # only parse the file once; the script reruns on every widget interaction
+    if uploaded is not None and st.session_state.get("upload_key") != (uploaded.name, uploaded.size):
         with st.spinner("📥 Loading CSV..."):
             G = load_graph_from_csv(uploaded)
             st.session_state["graph"] = G
+            st.session_state["upload_key"] = (uploaded.name, uploaded.size)
             st.success(f"✅ Loaded graph: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
 
 # ------------------- RETRIEVE GRAPH -------------------
@@ -46,54 +170,187 @@ else:
 
 # ------------------- ANALYSIS OPTIONS -------------------
 st.sidebar.header("⚙️ Analysis options")
+backend = st.sidebar.selectbox("Compute backend", ["networkx", "igraph"],
+                               help="igraph runs every metric in its C core; Louvain becomes igraph multilevel")
 method = st.sidebar.selectbox("Community method", ["louvain", "igraph_multilevel"])
+sweep = None
+if method == "louvain" and backend == "networkx":
+    with st.sidebar.expander("Louvain resolution sweep"):
+        if st.checkbox("Sweep resolutions and seeds, keep the best run"):
+            resolutions = st.multiselect("Resolutions", [0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 2.0, 3.0],
+                                         default=[0.5, 1.0, 1.5, 2.0])
+            sweep_seeds = st.number_input("Seeds per resolution", min_value=1, max_value=20, value=3)
+            sweep_select = st.selectbox("Keep", ["modularity", "stability"],
+                                        format_func=lambda s: {"modularity": "Highest modularity",
+                                                               "stability": "Most stable resolution"}[s])
+            if resolutions:
+                sweep = {'resolutions': [float(r) for r in sorted(resolutions)], 'sweep_seeds': int(sweep_seeds),
+                         'select': sweep_select}
 approx_betw = st.sidebar.slider("Approximate betweenness: sample k nodes (0 = exact)", 0, 1000, 200)
-max_vis_nodes = st.sidebar.number_input("Max nodes to visualize (PyVis)", min_value=100, max_value=5000, value=1000, step=100)
+closeness_mode = st.sidebar.selectbox("Closeness centrality", ["exact", "approximate (pivot sampling)"])
+closeness_k = None
+if closeness_mode != "exact":
+    closeness_k = st.sidebar.slider("Approximate closeness: BFS pivots (more = slower, more accurate)", 10, 2000, 200)
+n_jobs = st.sidebar.number_input("Worker processes (betweenness, Louvain sweep)", min_value=1, max_value=os.cpu_count() or 1, value=1, step=1)
+max_vis_nodes = st.sidebar.number_input("Max nodes to visualize (PyVis)", min_value=100, max_value=LAYOUT_MAX_NODES,
+                                        value=1000, step=100)
+analysis_seed = st.sidebar.number_input("Analysis seed", min_value=0, value=42)
+# on by default when the server was started with NETWORK_PROFILE set
+profile_stages = st.sidebar.checkbox("Profile stages (see the Performance tab)", value=profiling.enabled())
+if profile_stages and not profiling.enabled():
+    profiling.enable()
+elif not profile_stages and profiling.enabled():
+    profiling.PROFILER.disable()
+
+# ------------------- RESULT CACHE -------------------
+st.sidebar.header("🗄️ Result cache")
+cache = get_result_cache()
+cache_stats = cache.stats()
+st.sidebar.caption(f"Hits: {cache_stats['hits']} | Misses: {cache_stats['misses']} | "
+                   f"Entries: {cache_stats['entries']} | Size: {cache_stats['bytes'] / 1024**2:.1f} MB "
+                   f"of {cache_stats['max_bytes'] / 1024**2:.0f} MB")
+if st.sidebar.button("🧹 Clear cache"):
+    cache.clear()
 
 # ------------------- RUN ANALYSIS -------------------
+runner = get_job_runner()
+job = runner.get(st.session_state.get("job_id"))
 if st.sidebar.button("🚀 Run analysis"):
-    analyzer = GraphAnalyzer(G)
+    if job is not None and not job.done:
+        job.cancel()
+    # the Performance tab shows the stages of this run (and of the views rendered after it)
+    profiling.PROFILER.reset()
+    job = runner.submit("analysis", run_analysis, G, cache, backend=backend, method=method, sweep=sweep,
+                        betweenness_k=None if approx_betw == 0 else int(approx_betw), closeness_k=closeness_k,
+                        n_jobs=int(n_jobs), seed=int(analysis_seed))
+    st.session_state["job_id"] = job.id
+    st.session_state.pop("analysis", None)
 
-    # --- Community Detection ---
-    with st.spinner("🧩 Computing communities..."):
-        t0 = time.time()
-        try:
-            analyzer.compute_communities(method=method)
-            n_comms = len(set(analyzer.partition.values()))
-            st.success(f"✅ Community detection complete: {n_comms} communities found in {time.time()-t0:.1f}s")
-        except Exception as e:
-            st.error(f"❌ Community detection failed: {e}")
-            analyzer.partition = None
+def show_job(job):
+    icons = {'queued': '⏳', 'running': '⚙️', 'cancelling': '⏳', 'done': '✅', 'failed': '❌', 'cancelled': '⏹️'}
+    st.caption(f"{icons[job.status]} {job.status.capitalize()} — {job.elapsed():.0f}s")
+    for t, stage, message in job.events[-8:]:
+        st.text(f"{t:6.1f}s  {message or stage}")
+    if job.error:
+        st.error(job.error.strip().splitlines()[-1])
+    if not job.done and st.button("⏹️ Cancel", key=f"cancel-{job.id}", disabled=job.cancel_requested):
+        job.cancel()
 
-    # --- Centralities ---
-    with st.spinner("📊 Computing centralities..."):
-        t0 = time.time()
-        analyzer.compute_centralities(betweenness_k=(None if approx_betw == 0 else int(approx_betw)))
-        st.success(f"✅ Centralities computed in {time.time()-t0:.1f}s")
+@st.fragment(run_every=1.0)
+def job_monitor(job_id):
+    # polls the job without rerunning the page; any new stage or result triggers a full rerun
+    job = runner.get(job_id)
+    show_job(job)
+    if job.version != st.session_state.get("job_version"):
+        st.rerun()
+
+if job is not None:
+    st.session_state["job_version"] = job.version
+    with st.sidebar:
+        st.header("🧵 Analysis job")
+        if job.done:
+            show_job(job)
+        else:
+            job_monitor(job.id)
+    # the newest published results, partial while betweenness is still being refined
+    if 'analysis' in job.results:
+        st.session_state["analysis"] = job.results['analysis']
+
+# results stay on screen across reruns, e.g. while drilling into communities
+analysis = st.session_state.get("analysis")
+if analysis is not None and analysis['graph'] is G:
+    analyzer, fingerprint, partition_key = analysis['analyzer'], analysis['fingerprint'], analysis['partition_key']
+
+    def get_csr():
+        # converted once, and only when a layout is not cached yet
+        if analysis['csr'] is None:
+            analysis['csr'] = CSRGraph.from_networkx(G)
+        return analysis['csr']
 
     # Save results for download
-    top_df = analyzer.top_n_by_metric('degree', n=20).set_index('node')
+    influencers = analyzer.influencer_index()
     comm_df = analyzer.community_sizes().head(30).set_index('community')
     centrality_df = analyzer.centrality_df
 
     # --- Tabs for results ---
-    tab1, tab2, tab3, tab4 = st.tabs(["🏆 Influencers", "👥 Communities", "📊 Centralities", "🌐 Network"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🏆 Influencers", "👥 Communities", "📊 Centralities", "🌐 Network",
+                                            "⏱️ Performance"])
 
     # --- Influencers ---
     with tab1:
-        st.subheader("🏆 Top Influencers (by Degree)")
+        st.subheader("🏆 Top Influencers")
+        if job is not None and not job.done and analyzer.betweenness_pivots is not None:
+            st.caption(f"Betweenness is estimated from {analyzer.betweenness_pivots} pivots so far "
+                       "and is refined while the job runs.")
+        col1, col2, col3 = st.columns(3)
+        metric = col1.selectbox("Metric", influencers.metrics, index=influencers.metrics.index('degree'))
+        communities = [None] + (analyzer.community_sizes()['community'].tolist() if influencers.has_communities else [])
+        community = col2.selectbox("Community", communities, format_func=lambda c: "All" if c is None else f"C{c}")
+        top_k = col3.number_input("Top k", min_value=1, max_value=1000, value=20)
+        # answered from the precomputed rank arrays, no re-sorting per query
+        top_df = influencers.top(metric, k=int(top_k), community=community).set_index('node')
+        top_df['percentile'] = influencers.percentile(top_df.index.to_numpy(), metric)
         st.dataframe(top_df)
+
+        ego_node = st.text_input("Top neighbours of node (ego network)")
+        if ego_node:
+            node = int(ego_node) if influencers.nodes.dtype.kind in 'iu' and ego_node.lstrip('-').isdigit() else ego_node
+            try:
+                st.dataframe(influencers.ego(node, metric, k=int(top_k)).set_index('node'))
+            except KeyError:
+                st.warning(f"Node {ego_node} is not in the graph")
         st.download_button("📥 Download Influencers (CSV)", top_df.to_csv().encode('utf-8'), "top_influencers.csv", "text/csv")
 
+        st.subheader("🎯 Personalized PageRank")
+        ppr = get_ppr(fingerprint, G)
+        col1, col2 = st.columns([1, 3])
+        seed_kind = col1.radio("Seeds", ["Nodes", "Community"], horizontal=True,
+                               disabled=analyzer.partition is None)
+        if seed_kind == "Community" and analyzer.partition is not None:
+            seed_community = col2.selectbox("Community", analyzer.community_sizes()['community'].tolist(),
+                                            format_func=lambda c: f"C{c}")
+            seeds = [v for v, c in analyzer.partition.items() if c == seed_community]
+        else:
+            seed_text = col2.text_input("Seed nodes (comma-separated)")
+            to_node = lambda s: int(s) if ppr.nodes.dtype.kind in 'iu' and s.lstrip('-').isdigit() else s
+            seeds = [to_node(s.strip()) for s in seed_text.split(',') if s.strip()]
+        if seeds:
+            try:
+                t0 = time.perf_counter()
+                # single nodes are answered by local push, seed sets by block power iteration; both are cached
+                ppr_df = ppr.top(seeds if len(seeds) > 1 else seeds[0], k=int(top_k))
+                stats = ppr.stats()
+                st.caption(f"Answered in {1000 * (time.perf_counter() - t0):.1f} ms | "
+                           f"cache hits: {stats['hits']}, entries: {stats['entries']}")
+                if analyzer.partition is not None:
+                    ppr_df['community'] = ppr_df['node'].map(analyzer.partition)
+                st.dataframe(ppr_df.set_index('rank'))
+            except KeyError as e:
+                st.warning(str(e.args[0]))
+
     # --- Communities ---
     with tab2:
         st.subheader("👥 Community Sizes (Top 30)")
         st.bar_chart(comm_df)
         st.download_button("📥 Download Communities (CSV)", comm_df.to_csv().encode('utf-8'), "community_sizes.csv", "text/csv")
+        if analyzer.sweep is not None:
+            st.subheader("🔬 Resolution sweep")
+            runs = analyzer.sweep['runs']
+            st.line_chart(resolution_stability(runs).set_index('resolution')[['modularity', 'stability']])
+            st.dataframe(runs, hide_index=True)
+            run = st.selectbox("Community sizes of run", list(analyzer.sweep['summaries']),
+                               index=list(analyzer.sweep['summaries']).index(analyzer.sweep['best']),
+                               format_func=lambda r: f"resolution {r[0]}, seed {r[1]}")
+            st.dataframe(pd.DataFrame(analyzer.sweep['summaries'][run][:30], columns=['community', 'size']),
+                         hide_index=True)
 
     # --- Centralities ---
     with tab3:
         st.subheader("📈 Centrality Metrics Distribution")
+        if analyzer.closeness_error is not None:
+            err = analyzer.closeness_error
+            st.info(f"ℹ️ Approximate closeness vs exact: mean abs error {err['mean_abs_error']:.4f}, "
+                    f"relative error {err['relative_error']:.1%}, rank correlation {err['spearman']:.3f}")
         fig = plot_centralities_summary(centrality_df)
         st.plotly_chart(fig, use_container_width=True)
         st.download_button("📥 Download Centralities (CSV)", centrality_df.to_csv(index=False).encode('utf-8'), "centralities.csv", "text/csv")
@@ -104,14 +361,52 @@ if st.sidebar.button("🚀 Run analysis"):
         demo_dir = "demos"
         os.makedirs(demo_dir, exist_ok=True)
         net_path = os.path.join(demo_dir, "network.html")
-        create_pyvis_network(G, analyzer.partition, output_path=net_path, max_nodes=int(max_vis_nodes))
+        partition = analyzer.partition
 
-        with open(net_path, "r", encoding="utf-8") as f:
-            html_content = f.read()
+        # layouts are computed server-side once per level and cached; the browser only draws them
+        views = ["Community overview", "Drill into a community"] if partition else ["Top nodes by degree"]
+        view = st.radio("Level of detail", views, horizontal=True)
+        if view == "Community overview":
+            level = cache.get_or_compute('layout', fingerprint, {'partition': partition_key, 'level': 'communities'},
+                                         lambda: supergraph_level(get_csr(), partition))
+            st.caption(f"One node per community ({len(level['nodes'])} largest shown), "
+                       "edges weighted by the links between communities.")
+        elif view == "Drill into a community":
+            sizes = analyzer.community_sizes().set_index('community')['size']
+            community = st.selectbox("Community", sizes.index.tolist(),
+                                     format_func=lambda c: f"C{c} ({sizes[c]} nodes)")
+            level = cache.get_or_compute('layout', fingerprint,
+                                         {'partition': partition_key, 'level': 'community',
+                                          'community': community, 'max_nodes': int(max_vis_nodes)},
+                                         lambda: community_level(get_csr(), partition, community,
+                                                                 max_nodes=int(max_vis_nodes)))
+            if sizes[community] > len(level['nodes']):
+                st.caption(f"Showing the {len(level['nodes'])} highest-degree members of {sizes[community]}.")
+        else:
+            level = cache.get_or_compute('layout', fingerprint, {'level': 'top_degree', 'max_nodes': int(max_vis_nodes)},
+                                         lambda: top_degree_level(get_csr(), max_nodes=int(max_vis_nodes)))
+        html_content = render_level(level, output_path=net_path)
         st.components.v1.html(html_content, height=600, scrolling=True)
 
         st.download_button("📥 Download Network (HTML)", html_content.encode('utf-8'), "network_visualization.html", "text/html")
 
+    # --- Performance ---
+    with tab5:
+        st.subheader("⏱️ Stage breakdown")
+        stages = profiling.PROFILER.summary()
+        if not profiling.enabled():
+            st.info("Enable \"Profile stages\" in the sidebar (or start the app with NETWORK_PROFILE=1) "
+                    "and run the analysis again.")
+        elif stages.empty:
+            st.info("No stages recorded yet; run the analysis.")
+        else:
+            st.bar_chart(stages.set_index('stage')[['wall', 'cpu']])
+            st.dataframe(stages, hide_index=True)
+            st.download_button("📥 Download trace (Chrome trace JSON)",
+                               json.dumps(profiling.PROFILER.chrome_trace()).encode('utf-8'), "trace.json",
+                               "application/json")
+            st.caption("Open the trace in chrome://tracing or ui.perfetto.dev for the timeline.")
+
     # ------------------- ZIP ALL RESULTS -------------------
     buffer = io.BytesIO()
     with zipfile.ZipFile(buffer, "w") as zf:
@@ -0,0 +1,242 @@
+"""
+Benchmark suite for the analysis pipeline.
+Times every stage separately (graph generation, CSV ingestion, community detection, each
+centrality, PyVis export) on synthetic graphs of increasing size, records peak memory,
+writes machine-readable JSON and optionally compares against a stored baseline.
+
+    python benchmarks/run_benchmarks.py --tier quick --output bench.json
+    python benchmarks/run_benchmarks.py --tier full --baseline benchmarks/baseline.json --threshold 0.25
+    python benchmarks/run_benchmarks.py --tier quick --save-baseline benchmarks/baseline.json
+
+Runs fully offline; failed stages are recorded in the JSON. Exits with status 1 when a stage
+regresses past the threshold, or fails or is missing where the baseline has it.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+sys.path.insert(0, os.path.abspath(SRC))
+
+import networkx as nx
+import pandas as pd
+from data import generate_synthetic_graph
+from graph_build import build_graph, build_graph_bulk
+from community_detection import run_louvain
+from centrality import degree_centrality, pagerank, betweenness_approx, eigenvector, closeness_approx
+from graph_analysis import GraphAnalyzer
+from visualization import create_pyvis_network
+
+# (label, nodes, edges)
+TIERS = {
+    'quick': [('1k', 1000, 5000), ('10k', 10000, 50000)],
+    'full': [('1k', 1000, 5000), ('10k', 10000, 50000), ('100k', 100000, 1000000),
+             ('500k', 500000, 5000000)],
+}
+# stages that are too slow to run above this many edges are skipped
+SLOW_STAGE_MAX_EDGES = {
+    'ingest_rowwise': 1000000,
+    'closeness_exact': 10000,
+    'louvain': 5000000,
+}
+# regressions smaller than this many seconds are treated as noise
+NOISE_FLOOR_SECONDS = 0.05
+
+def _rss_mb():
+    # current resident set size; /proc is cheap to poll and, unlike tracemalloc,
+    # does not slow the measured code down or miss allocations made in C libraries
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(fn, interval=0.01):
+    """Run fn once; return (result, wall seconds, peak RSS growth in MB over the starting RSS)."""
+    gc.collect()
+    start = _rss_mb()
+    peak = [start]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], _rss_mb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    t0 = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - t0
+        done.set()
+        sampler.join()
+    peak[0] = max(peak[0], _rss_mb())
+    return result, elapsed, peak[0] - start
+
+def stages_for(G, csv_path, workdir, betweenness_k):
+    """(name, callable) pairs for every timed stage on graph G."""
+    def igraph_multilevel():
+        analyzer = GraphAnalyzer(G)
+        analyzer.compute_communities(method='igraph_multilevel', seed=42)
+        return analyzer.partition
+
+    return [
+        ('ingest_rowwise', lambda: build_graph(csv_path)),
+        ('ingest_bulk', lambda: build_graph_bulk(csv_path)),
+        ('louvain', lambda: run_louvain(G, random_state=42)),
+        ('igraph_multilevel', igraph_multilevel),
+        ('degree', lambda: degree_centrality(G)),
+        ('pagerank', lambda: pagerank(G)),
+        ('betweenness', lambda: betweenness_approx(G, k=betweenness_k, seed=42)),
+        ('eigenvector', lambda: eigenvector(G, max_iter=1000)),
+        ('closeness_approx', lambda: closeness_approx(G, k=100, seed=42)),
+        ('closeness_exact', lambda: nx.closeness_centrality(G)),
+        ('pyvis_export', lambda: create_pyvis_network(G, output_path=os.path.join(workdir, 'network.html'),
+                                                      max_nodes=1000)),
+    ]
+
+def warm_up(workdir):
+    """Run every stage once on a tiny graph so imports and JIT-free first-call costs are not timed."""
+    G = generate_synthetic_graph(n_nodes=200, n_edges=600, seed=0)
+    csv_path = os.path.join(workdir, 'warmup.csv')
+    nx.to_pandas_edgelist(G)[['source', 'target']].to_csv(csv_path, index=False)
+    for name, fn in stages_for(G, csv_path, workdir, 10):
+        try:
+            fn()
+        except Exception as e:
+            # the timed run will fail too and be recorded; this only says why early
+            print(f"[warm-up] {name}: failed ({e})", flush=True)
+
+def run_tier(tier, repeat=1, betweenness_k=100, only=None):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        warm_up(workdir)
+        for label, n_nodes, n_edges in TIERS[tier]:
+            G, t_gen, m_gen = measure(lambda: generate_synthetic_graph(n_nodes=n_nodes, n_edges=n_edges, seed=42))
+            results.append({'size': label, 'nodes': n_nodes, 'edges': G.number_of_edges(),
+                            'stage': 'generate', 'status': 'ok', 'seconds': t_gen, 'peak_mb': m_gen})
+            print(f"[{label}] generate: {t_gen:.3f}s, {m_gen:.1f} MB", flush=True)
+            csv_path = os.path.join(workdir, f'edges_{label}.csv')
+            nx.to_pandas_edgelist(G)[['source', 'target']].to_csv(csv_path, index=False)
+            for name, fn in stages_for(G, csv_path, workdir, betweenness_k):
+                if only and name not in only:
+                    continue
+                if G.number_of_edges() > SLOW_STAGE_MAX_EDGES.get(name, float('inf')):
+                    continue
+                times, peaks = [], []
+                try:
+                    for _ in range(repeat):
+                        _, elapsed, peak = measure(fn)
+                        times.append(elapsed)
+                        peaks.append(peak)
+                except Exception as e:
+                    # recorded, so a stage that stops working shows up in the JSON and in compare()
+                    print(f"[{label}] {name}: failed ({e})", flush=True)
+                    results.append({'size': label, 'nodes': n_nodes, 'edges': G.number_of_edges(),
+                                    'stage': name, 'status': 'failed', 'error': f'{type(e).__name__}: {e}',
+                                    'seconds': None, 'peak_mb': None})
+                    continue
+                results.append({'size': label, 'nodes': n_nodes, 'edges': G.number_of_edges(),
+                                'stage': name, 'status': 'ok', 'seconds': min(times), 'peak_mb': max(peaks)})
+                print(f"[{label}] {name}: {min(times):.3f}s, {max(peaks):.1f} MB", flush=True)
+    return results
+
+def environment():
+    import importlib.metadata as md
+    versions = {}
+    for pkg in ('networkx', 'numpy', 'scipy', 'pandas', 'python-louvain', 'igraph', 'pyvis'):
+        try:
+            versions[pkg] = md.version(pkg)
+        except md.PackageNotFoundError:
+            versions[pkg] = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions,
+    }
+
+def _ok(r):
+    # baselines written before failures were recorded have no status
+    return r is not None and r.get('status', 'ok') == 'ok'
+
+def compare(results, baseline, threshold, only=None):
+    """
+    Return (stage rows, regressions) comparing seconds against the baseline.
+    A stage that ran in the baseline but failed or is missing now counts as a regression; sizes
+    not run now, and stages left out by `only`, are not compared.
+    """
+    current = {(r['size'], r['stage']): r for r in results}
+    sizes = {r['size'] for r in results}
+    rows, regressions = [], []
+    for b in baseline['results']:
+        if not _ok(b) or b['size'] not in sizes or (only and b['stage'] not in only and b['stage'] != 'generate'):
+            continue
+        r = current.get((b['size'], b['stage']))
+        row = {'size': b['size'], 'stage': b['stage'], 'baseline': b['seconds'],
+               'current': r['seconds'] if _ok(r) else None, 'ratio': None,
+               'status': 'ok' if _ok(r) else ('missing' if r is None else 'failed')}
+        rows.append(row)
+        if row['status'] != 'ok':
+            regressions.append(row)
+            continue
+        row['ratio'] = r['seconds'] / b['seconds'] if b['seconds'] > 0 else float('inf')
+        if row['ratio'] > 1 + threshold and r['seconds'] - b['seconds'] > NOISE_FLOOR_SECONDS:
+            regressions.append(row)
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tier', choices=sorted(TIERS), default='quick')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per stage (the fastest is kept)')
+    parser.add_argument('--betweenness_k', type=int, default=100)
+    parser.add_argument('--stages', default=None, help='comma-separated subset of stages to run')
+    parser.add_argument('--output', default=None, help='write results JSON here')
+    parser.add_argument('--baseline', default=None, help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown ratio, e.g. 0.25 = +25%%')
+    parser.add_argument('--save-baseline', dest='save_baseline', default=None,
+                        help='also store the results as a new baseline')
+    args = parser.parse_args()
+    if args.baseline and not os.path.exists(args.baseline):
+        # checked up front rather than after the whole suite has run
+        parser.error(f"baseline {args.baseline} not found; record one first with --save-baseline {args.baseline}")
+
+    only = set(args.stages.split(',')) if args.stages else None
+    results = run_tier(args.tier, repeat=args.repeat, betweenness_k=args.betweenness_k, only=only)
+    report = {
+        'tier': args.tier,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'environment': environment(),
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'results': results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('Wrote', path)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.threshold, only=only)
+        if rows:
+            print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+        if regressions:
+            print(f"{len(regressions)} stage(s) failed, missing or slower than baseline by more than {args.threshold:.0%}:")
+            for r in regressions:
+                current = f"{r['current']:.3f}s" if r['status'] == 'ok' else r['status']
+                print(f"  [{r['size']}] {r['stage']}: {r['baseline']:.3f}s -> {current}")
+            sys.exit(1)
+        print('No regressions against', args.baseline)
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,162 @@
 """
-End-to-end analysis: loads graph, computes communities and centralities, writes summary CSVs.
+End-to-end analysis: loads graph, computes communities and centralities, writes the node metrics
+and community summary (Parquet by default, CSV with --format csv).
 """
 import argparse
+import os
 import networkx as nx
 import pandas as pd
-from community_detection import run_louvain, summarize_partition
+from community_detection import louvain_partition, louvain_sweep, summarize_partition
 from centrality import degree_centrality, pagerank, betweenness_approx, eigenvector
+from csr_graph import read_graph
+from result_cache import ResultCache, graph_fingerprint
+from scheduler import Stage, run_stages
+from igraph_backend import IgraphBackend
+import profiling
+from metrics_io import FORMATS, community_summary, node_table, write_community_summary, write_node_metrics, write_table
 
-def write_node_table(G, partition, centralities, outpath):
-    data = []
-    for node in G.nodes():
-        row = {'node': node, 'community': partition.get(node, -1)}
-        for k, d in centralities.items():
-            row[k] = d.get(node, None)
-        data.append(row)
-    df = pd.DataFrame(data)
-    df.to_csv(outpath, index=False)
+# rough working set of one array stage (sparse operator copies, per-node vectors) and of the
+# NetworkX graph Louvain needs, used to bound how many stages run at once
+ARRAY_STAGE_BYTES_PER_ENTRY = 48
+ARRAY_STAGE_BYTES_PER_NODE = 64
+NETWORKX_BYTES_PER_EDGE = 600
+
+def default_jobs(csr, n_stages):
+    """Stages run at once: one per core, fewer when their working sets would not fit in free memory."""
+    cores = min(os.cpu_count() or 1, n_stages)
+    try:
+        available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return cores
+    louvain = NETWORKX_BYTES_PER_EDGE * csr.number_of_edges()
+    array_stage = ARRAY_STAGE_BYTES_PER_ENTRY * len(csr.indices) + ARRAY_STAGE_BYTES_PER_NODE * csr.number_of_nodes()
+    return max(1, min(cores, 1 + (available - louvain) // max(array_stage, 1)))
+
+def parse_timeout(value):
+    name, _, seconds = value.partition('=')
+    try:
+        return name, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected STAGE=SECONDS, got {value!r}")
+
+def parse_resolutions(value):
+    try:
+        return [float(r) for r in value.split(',') if r.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated resolutions, got {value!r}")
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('--graph', required=True)
+    parser.add_argument('--graph', required=True, help='gpickle file or CSR graph directory')
     parser.add_argument('--outdir', required=True)
     parser.add_argument('--pagerank_tol', type=float, default=1e-6)
+    parser.add_argument('--n_jobs', type=int, default=1, help='worker processes for betweenness (-1 = all cores)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--backend', choices=['networkx', 'igraph'], default='networkx',
+                        help='igraph runs every metric (and Louvain, as multilevel) in its C core')
+    parser.add_argument('--resolutions', type=parse_resolutions, default=None, metavar='R1,R2,...',
+                        help='sweep Louvain over these resolutions (and --sweep_seeds seeds), keep the best run')
+    parser.add_argument('--sweep_seeds', type=int, default=3, help='seeds per resolution in the sweep')
+    parser.add_argument('--sweep_select', choices=['modularity', 'stability'], default='modularity',
+                        help='keep the highest-modularity run, or the best seed of the most stable resolution')
+    parser.add_argument('--format', choices=FORMATS, default='csv',
+                        help='node_metrics / community_summary file format (parquet: smaller, column reads)')
+    parser.add_argument('--cache_dir', default=None,
+                        help='result cache shared with the Streamlit app (e.g. .cache/results); also the '
+                             'checkpoint: a rerun after a crash reuses every stage that finished')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='stages run concurrently (default: all cores, fewer if free memory is short)')
+    parser.add_argument('--timeout', type=float, default=None, help='seconds before any stage is stopped')
+    parser.add_argument('--stage_timeout', type=parse_timeout, action='append', default=[], metavar='STAGE=SECONDS',
+                        help='timeout for one stage, e.g. eigenvector=120 (repeatable)')
+    parser.add_argument('--profile', nargs='?', const=profiling.DEFAULT_DIR, default=None, metavar='DIR',
+                        help='record per-stage timings and memory; writes trace.json and stages.csv to DIR')
+    parser.add_argument('--cprofile', action='store_true', help='with --profile, also dump a cProfile file per stage')
     args = parser.parse_args()
+    if args.resolutions and args.backend == 'igraph':
+        parser.error('--resolutions sweeps python-louvain and needs the networkx backend')
+    if args.profile:
+        profiling.enable(output_dir=args.profile, cprofile=args.cprofile)
+
+    with profiling.stage('analysis.read_graph') as rec:
+        # a CSR directory is memory-mapped as it is; the stages fork after this and share its arrays
+        # instead of each converting (and, as refcounts are touched, copying) a NetworkX graph
+        csr = read_graph(args.graph, as_networkx=False)
+        rec['nodes_out'], rec['edges_out'] = csr.number_of_nodes(), csr.number_of_edges()
 
-    G = nx.read_gpickle(args.graph)
+    cache = ResultCache(args.cache_dir) if args.cache_dir else None
+    fingerprint = graph_fingerprint(csr) if cache else None
+    timeouts = dict(args.stage_timeout)
 
-    print('Running Louvain...')
-    partition = run_louvain(G)
+    def stage(name, params, fn):
+        def run():
+            with profiling.stage(f'analysis.{name}', graph=csr):
+                return fn()
+        return Stage(name, run, params=params, timeout=timeouts.get(name, args.timeout))
+
+    # every stage only reads the graph, so they are all independent and run side by side
+    if args.backend == 'igraph':
+        backend = IgraphBackend(csr)
+        params = {'backend': 'igraph'}
+        stages = [
+            stage('partition', {'method': 'igraph_multilevel', 'seed': args.seed},
+                  lambda: backend.communities(seed=args.seed)),
+            stage('degree', params, lambda: backend.degree(weighted=True)),
+            stage('pagerank', params, lambda: backend.pagerank(weighted=True)),
+            stage('betweenness', {'k': 200, 'seed': args.seed, **params},
+                  lambda: backend.betweenness(k=200, seed=args.seed, weighted=True)),
+            stage('eigenvector', params, lambda: backend.eigenvector(weighted=True)),
+        ]
+    else:
+        if args.resolutions:
+            seeds = list(range(args.seed, args.seed + args.sweep_seeds))
+            # same stage key and params as the app's sweep, so batch runs warm the dashboard
+            partition_stage = stage('louvain_sweep', {'resolutions': args.resolutions, 'seeds': seeds,
+                                                      'select': args.sweep_select},
+                                    lambda: louvain_sweep(csr, args.resolutions, seeds, n_jobs=args.n_jobs,
+                                                          select=args.sweep_select))
+        else:
+            # same stage key as the app's louvain partition, so batch runs warm the dashboard;
+            # python-louvain is the one stage that needs NetworkX, built inside its own process
+            partition_stage = stage('partition', {'method': 'louvain', 'seed': args.seed},
+                                    lambda: louvain_partition(csr, random_state=args.seed))
+        stages = [
+            partition_stage,
+            stage('degree', {}, lambda: degree_centrality(csr)),
+            stage('pagerank', {'tol': args.pagerank_tol}, lambda: pagerank(csr, tol=args.pagerank_tol)),
+            stage('betweenness', {'k': 200, 'seed': args.seed},
+                  lambda: betweenness_approx(csr, k=200, seed=args.seed, n_jobs=args.n_jobs)),
+            stage('eigenvector', {}, lambda: eigenvector(csr)),
+        ]
+    jobs = args.jobs or default_jobs(csr, len(stages))
+    print(f'Running {len(stages)} stages ({args.backend}, {jobs} at a time)...')
+    results, report = run_stages(stages, max_workers=jobs, checkpoint=cache, fingerprint=fingerprint)
+    failed = [name for name, r in report.items() if r['status'] not in ('done', 'cached')]
+    first = stages[0].name
+    if first not in results:
+        raise SystemExit(f"Community detection failed, nothing written: {report[first]['error']}")
+    partition = results[first]
+    if first == 'louvain_sweep':
+        sweep, partition = partition, partition['partition']
+        print(sweep['runs'].to_string(index=False, float_format=lambda x: f'{x:.4f}'))
+        print('Best run (resolution, seed):', sweep['best'])
+    central = {s.name: results[s.name] for s in stages[1:] if s.name in results}
     print('Partition sizes:', summarize_partition(partition)[:10])
+    if failed:
+        print('Missing from the output:', ', '.join(failed))
 
-    print('Computing centralities...')
-    central = {}
-    central['degree'] = degree_centrality(G)
-    central['pagerank'] = pagerank(G, tol=args.pagerank_tol)
-    central['betweenness'] = betweenness_approx(G, k=200)
-    try:
-        central['eigenvector'] = eigenvector(G)
-    except Exception as e:
-        print('Eigenvector failed', e)
-
-    write_node_table(G, partition, central, f"{args.outdir}/node_metrics.csv")
-    # export community-level summary
-    import pandas as pd
-    df = pd.read_csv(f"{args.outdir}/node_metrics.csv")
-    comm_summary = df.groupby('community').agg({
-        'node': 'count',
-        'degree': 'mean',
-        'pagerank': 'mean'
-    }).rename(columns={'node': 'size'})
-    comm_summary.to_csv(f"{args.outdir}/community_summary.csv")
+    with profiling.stage('analysis.write_outputs', graph=csr, format=args.format):
+        df = node_table(csr.nodes.tolist(), partition, central)
+        # export community-level summary, aggregated from the same in-memory columns
+        write_node_metrics(df, args.outdir, fmt=args.format)
+        write_community_summary(community_summary(df), args.outdir, fmt=args.format)
+        if first == 'louvain_sweep':
+            write_table(sweep['runs'], args.outdir, 'louvain_sweep', fmt=args.format)
+    if cache is not None:
+        print('Cache:', cache.stats())
+    if args.profile:
+        print(profiling.PROFILER.summary().to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+        print('Profile written to', profiling.PROFILER.write())
     print('Analysis written to', args.outdir)
 
 if __name__ == '__main__':
@@ -1,21 +1,382 @@
 """
 Compute centrality measures with optional parallelization.
+PageRank and eigenvector centrality run as sparse matrix-vector power iterations over a CSR adjacency;
+betweenness splits its pivot set across a joblib process pool.
 """
+import random
+from heapq import heappush, heappop
+from itertools import count
+import numpy as np
 import networkx as nx
 from joblib import Parallel, delayed
 
+try:
+    from .csr_graph import CSRGraph
+    from .profiling import profiled
+except ImportError:
+    from csr_graph import CSRGraph
+    from profiling import profiled
+
+def _as_csr(G, weight='weight'):
+    """Return (CSRGraph, node keys in row order) for a NetworkX graph or a CSRGraph."""
+    if isinstance(G, CSRGraph):
+        return G, G.nodes.tolist()
+    return CSRGraph.from_networkx(G, weight=weight), list(G.nodes())
+
+def _node_vector(values, csr, keys, dtype):
+    """Turn a {node: value} dict or an array in row order into a dense vector."""
+    if values is None:
+        return None
+    if isinstance(values, dict):
+        return np.array([values.get(n, 0) for n in keys], dtype=dtype)
+    return np.asarray(values, dtype=dtype)
+
+def _transition_operator(csr, weight, dtype):
+    """A^T with rows scaled for the random walk, plus the dangling-node mask."""
+    A = csr.to_scipy(dtype=dtype)
+    if weight is None:
+        A.data = np.ones_like(A.data)
+    out = np.asarray(A.sum(axis=1), dtype=dtype).ravel()
+    dangling = out == 0
+    inv_out = np.zeros_like(out)
+    inv_out[~dangling] = 1.0 / out[~dangling]
+    return A.T.tocsr(), inv_out, dangling
+
+def pagerank_scores(csr, alpha=0.85, personalization=None, max_iter=100, tol=1e-06,
+                    nstart=None, dangling=None, weight='weight', dtype=np.float64):
+    """
+    Sparse power-iteration PageRank over a CSRGraph; vector arguments and the result are in row order.
+    Dangling mass is redistributed by `dangling` (defaults to the personalization vector).
+    `nstart` warm-starts the iteration, e.g. from a previous score vector.
+    """
+    n = csr.number_of_nodes()
+    if n == 0:
+        return np.zeros(0, dtype=dtype)
+    AT, inv_out, is_dangling = _transition_operator(csr, weight, dtype)
+
+    if personalization is None:
+        p = np.full(n, 1.0 / n, dtype=dtype)
+    else:
+        p = np.asarray(personalization, dtype=dtype)
+        if p.sum() == 0:
+            raise ZeroDivisionError
+        p = p / p.sum()
+    if dangling is None:
+        d = p
+    else:
+        d = np.asarray(dangling, dtype=dtype)
+        d = d / d.sum()
+    if nstart is None:
+        x = np.full(n, 1.0 / n, dtype=dtype)
+    else:
+        x = np.asarray(nstart, dtype=dtype)
+        x = x / x.sum()
+
+    for _ in range(max_iter):
+        xlast = x
+        x = alpha * (AT @ (x * inv_out) + x[is_dangling].sum() * d) + (1 - alpha) * p
+        # check convergence, l1 norm
+        if np.abs(x - xlast).sum() < n * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+@profiled()
+def pagerank_sparse(G, alpha=0.85, personalization=None, max_iter=100, tol=1e-06,
+                    nstart=None, dangling=None, weight='weight', dtype=np.float64):
+    """
+    PageRank with the nx.pagerank signature, computed by pagerank_scores.
+    G may be a NetworkX graph or a CSRGraph; dict arguments are keyed by node.
+    """
+    csr, keys = _as_csr(G, weight=weight or 'weight')
+    x = pagerank_scores(csr, alpha=alpha,
+                        personalization=_node_vector(personalization, csr, keys, dtype),
+                        max_iter=max_iter, tol=tol,
+                        nstart=_node_vector(nstart, csr, keys, dtype),
+                        dangling=_node_vector(dangling, csr, keys, dtype),
+                        weight=weight, dtype=dtype)
+    return dict(zip(keys, x.tolist()))
+
+def eigenvector_scores(csr, max_iter=100, tol=1e-06, nstart=None, weight='weight', dtype=np.float64):
+    """
+    Sparse power iteration for eigenvector centrality (in-edges for directed graphs),
+    normalized to unit Euclidean length as in NetworkX. Iterates on (A^T + I) like
+    nx.eigenvector_centrality so bipartite graphs do not oscillate.
+    """
+    n = csr.number_of_nodes()
+    if n == 0:
+        raise nx.NetworkXPointlessConcept('cannot compute centrality for the null graph')
+    AT = csr.to_scipy(dtype=dtype).T.tocsr()
+    if weight is None:
+        AT.data = np.ones_like(AT.data)
+    if nstart is None:
+        x = np.full(n, 1.0 / n, dtype=dtype)
+    else:
+        x = np.asarray(nstart, dtype=dtype)
+        if not x.any():
+            raise nx.NetworkXException('initial vector cannot have all zero values')
+        x = x / np.abs(x).sum()
+    for _ in range(max_iter):
+        xlast = x
+        x = xlast + AT @ xlast
+        norm = np.sqrt((x * x).sum()) or 1.0
+        x = x / norm
+        if np.abs(x - xlast).sum() < n * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+@profiled()
+def eigenvector_sparse(G, max_iter=100, tol=1e-06, nstart=None, weight='weight', dtype=np.float64):
+    csr, keys = _as_csr(G, weight=weight or 'weight')
+    x = eigenvector_scores(csr, max_iter=max_iter, tol=tol,
+                           nstart=_node_vector(nstart, csr, keys, dtype),
+                           weight=weight, dtype=dtype)
+    return dict(zip(keys, x.tolist()))
+
+# Pivots are summed in fixed-size blocks, in pivot order, so the floating-point result
+# does not depend on how many workers processed the blocks.
+_PIVOT_BLOCK = 16
+
+def _bfs_dependencies(indptr, indices, s, bc):
+    """Level-synchronous BFS from s and Brandes accumulation, vectorized per level."""
+    n = len(indptr) - 1
+    dist = np.full(n, -1, dtype=np.int64)
+    sigma = np.zeros(n)
+    dist[s] = 0
+    sigma[s] = 1.0
+    frontier = np.array([s], dtype=np.int64)
+    levels = []
+    d = 0
+    while frontier.size:
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            break
+        src = np.repeat(frontier, counts)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        dst = indices[offsets]
+        new = dst[dist[dst] < 0]
+        dist[new] = d + 1
+        # edges (v, w) lying on a shortest path from s
+        on_path = dist[dst] == d + 1
+        v, w = src[on_path], dst[on_path]
+        np.add.at(sigma, w, sigma[v])
+        levels.append((v, w))
+        frontier = np.unique(new)
+        d += 1
+    delta = np.zeros(n)
+    for v, w in reversed(levels):
+        np.add.at(delta, v, sigma[v] / sigma[w] * (1.0 + delta[w]))
+    delta[s] = 0.0
+    bc += delta
+
+def _dijkstra_dependencies(indptr, indices, weights, s, bc):
+    """
+    Weighted single-source Brandes step (same tie handling as NetworkX), straight on the CSR
+    (or memmapped) arrays: only the rows of settled nodes are turned into Python values.
+    """
+    S = []
+    P = {}
+    sigma = {s: 1.0}
+    D = {}
+    seen = {s: 0}
+    c = count()
+    Q = [(0, next(c), s, s)]
+    while Q:
+        dist, _, pred, v = heappop(Q)
+        if v in D:
+            continue
+        sigma[v] += sigma[pred]  # count paths
+        S.append(v)
+        D[v] = dist
+        start, end = indptr[v], indptr[v + 1]
+        for w, weight in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            vw_dist = dist + weight
+            if w not in D and (w not in seen or vw_dist < seen[w]):
+                seen[w] = vw_dist
+                heappush(Q, (vw_dist, next(c), v, w))
+                sigma[w] = 0.0
+                P[w] = [v]
+            elif vw_dist == seen[w]:
+                sigma[w] += sigma[v]
+                P[w].append(v)
+    delta = dict.fromkeys(S, 0.0)
+    while S:
+        w = S.pop()
+        coeff = (1 + delta[w]) / sigma[w]
+        for v in P.get(w, ()):
+            delta[v] += sigma[v] * coeff
+        if w != s:
+            bc[w] += delta[w]
+
+def _betweenness_block(indptr, indices, weights, sources, weighted):
+    """Partial dependency sums for one block of pivots; runs inside a worker."""
+    bc = np.zeros(len(indptr) - 1)
+    if weighted:
+        for s in sources:
+            _dijkstra_dependencies(indptr, indices, weights, s, bc)
+    else:
+        indptr = np.asarray(indptr, dtype=np.int64)
+        for s in sources:
+            _bfs_dependencies(indptr, indices, s, bc)
+    return bc
+
+def rescale_betweenness(bc, n, normalized, directed, sources=None):
+    # same scaling as networkx (endpoints=False), including its sampled-pivot correction
+    N = n - 1
+    if N < 2:
+        return bc
+    if sources is None:
+        if normalized:
+            return bc / (N * (N - 1))
+        return bc / 2 if not directed else bc
+    k = len(sources)
+    correction = 1 if directed else 2
+    if normalized:
+        scale_source = 1 / ((k - 1) * (N - 1)) if k > 1 else np.nan
+        scale_nonsource = 1 / (k * (N - 1))
+    else:
+        scale_source = N / ((k - 1) * correction) if k > 1 else np.nan
+        scale_nonsource = N / (k * correction)
+    scale = np.full(n, scale_nonsource)
+    scale[np.asarray(sources, dtype=np.int64)] = scale_source
+    return bc * scale
+
+def _dependency_sum(csr, sources, weighted, n_jobs, block_size):
+    """Brandes dependencies summed over the given pivots, in blocks of block_size."""
+    blocks = [sources[i:i + block_size] for i in range(0, len(sources), block_size)]
+    if n_jobs == 1 or len(blocks) <= 1:
+        partials = (_betweenness_block(csr.indptr, csr.indices, csr.weights, b, weighted) for b in blocks)
+    else:
+        partials = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r', return_as='generator')(
+            delayed(_betweenness_block)(csr.indptr, csr.indices, csr.weights, b, weighted) for b in blocks)
+    bc = np.zeros(csr.number_of_nodes())
+    for part in partials:
+        bc += part
+    return bc
+
+@profiled()
+def betweenness_parallel(G, k=None, normalized=True, weight=None, seed=42, n_jobs=1, block_size=_PIVOT_BLOCK):
+    """
+    Brandes betweenness, exact or sampled from k pivots, with the pivots split across processes.
+    Workers receive the CSR arrays through joblib's memmapping (or the graph's own memmap when
+    it was loaded from disk), so the graph is shared read-only rather than pickled per task.
+    Pivots are drawn like nx.betweenness_centrality(seed=...) and the result is identical for
+    any n_jobs.
+    """
+    csr, keys = _as_csr(G, weight=weight or 'weight')
+    n = csr.number_of_nodes()
+    if k is not None and k >= n:
+        k = None
+    sources = list(range(n)) if k is None else random.Random(seed).sample(range(n), k)
+    bc = _dependency_sum(csr, sources, weight is not None, n_jobs, block_size)
+    bc = rescale_betweenness(bc, n, normalized, csr.is_directed(), None if k is None else sources)
+    return dict(zip(keys, bc.tolist()))
+
+def betweenness_progressive(G, k, normalized=True, weight=None, seed=42, n_jobs=1, first=50,
+                            block_size=_PIVOT_BLOCK):
+    """
+    Sampled betweenness that refines as it goes: yields (pivots, {node: estimate}) after `first`
+    pivots, then each time the pivot count doubles, ending with all k pivots. The pivots are
+    those of betweenness_parallel(k=k, seed=seed), so the last estimate is its result.
+    """
+    csr, keys = _as_csr(G, weight=weight or 'weight')
+    n = csr.number_of_nodes()
+    if k is None or k >= n:
+        yield n, betweenness_parallel(csr, k=None, normalized=normalized, weight=weight, n_jobs=n_jobs)
+        return
+    sources = random.Random(seed).sample(range(n), k)
+    bc = np.zeros(n)
+    done = 0
+    step = min(first, k)
+    while done < k:
+        bc += _dependency_sum(csr, sources[done:step], weight is not None, n_jobs, block_size)
+        done = step
+        estimate = rescale_betweenness(bc.copy(), n, normalized, csr.is_directed(), sources[:done])
+        yield done, dict(zip(keys, estimate.tolist()))
+        step = min(2 * step, k)
+
+@profiled()
+def closeness_approx(G, k=100, seed=42, wf_improved=True, harmonic=False, batch_size=64):
+    """
+    Closeness (or harmonic) centrality estimated from BFS runs out of k random pivots.
+    Larger k trades speed for accuracy; k=None (or k >= n) gives the exact values.
+    For each node u the distances d(p, u) from the sampled pivots stand in for the distances
+    from all other nodes, as in nx.closeness_centrality / nx.harmonic_centrality.
+    """
+    from scipy.sparse.csgraph import shortest_path
+    csr, keys = _as_csr(G)
+    n = csr.number_of_nodes()
+    if n <= 1:
+        return dict.fromkeys(keys, 0.0)
+    if k is None or k >= n:
+        pivots = np.arange(n)
+    else:
+        pivots = np.array(random.Random(seed).sample(range(n), k))
+    A = csr.to_scipy()
+    reach = np.zeros(n)
+    total = np.zeros(n)
+    for i in range(0, len(pivots), batch_size):
+        batch = pivots[i:i + batch_size]
+        dist = shortest_path(A, directed=csr.is_directed(), unweighted=True, indices=batch)
+        dist[np.arange(len(batch)), batch] = np.inf  # a pivot does not count towards itself
+        finite = np.isfinite(dist)
+        reach += finite.sum(axis=0)
+        if harmonic:
+            with np.errstate(divide='ignore'):
+                total += np.where(finite, 1.0 / dist, 0.0).sum(axis=0)
+        else:
+            total += np.where(finite, dist, 0.0).sum(axis=0)
+    # number of pivots other than u itself
+    samples = np.full(n, float(len(pivots)))
+    samples[pivots] -= 1
+    samples[samples == 0] = np.nan
+    if harmonic:
+        scores = total * (n - 1) / samples
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(total > 0, reach / total, 0.0)
+            if wf_improved:
+                scores *= reach / samples
+    return dict(zip(keys, np.nan_to_num(scores).tolist()))
+
+def estimate_error(approx, exact):
+    """Compare an estimated {node: score} dict against exact values."""
+    keys = list(exact)
+    a = np.array([approx.get(n, 0.0) for n in keys])
+    e = np.array([exact[n] for n in keys])
+    err = np.abs(a - e)
+    scale = np.abs(e).mean() or 1.0
+    import pandas as pd
+    rank_corr = pd.Series(a).corr(pd.Series(e), method='spearman') if len(keys) > 1 else 1.0
+    return {
+        'mean_abs_error': float(err.mean()) if len(keys) else 0.0,
+        'max_abs_error': float(err.max()) if len(keys) else 0.0,
+        'relative_error': float(err.mean() / scale) if len(keys) else 0.0,
+        'spearman': float(rank_corr),
+    }
+
+@profiled()
 def degree_centrality(G):
-    return dict(G.degree(weight='weight'))
+    if not isinstance(G, CSRGraph):
+        return dict(G.degree(weight='weight'))
+    # as nx's weighted degree: in + out for directed graphs, undirected self-loops counted twice
+    rows, cols, w = G.edge_arrays()
+    n = G.number_of_nodes()
+    if G.is_directed():
+        deg = G.degree() + np.bincount(cols, weights=w, minlength=n)
+    else:
+        loops = rows == cols
+        deg = G.degree() + np.bincount(rows[loops], weights=w[loops], minlength=n)
+    return dict(zip(G.nodes.tolist(), deg.tolist()))
 
 def pagerank(G, **kwargs):
-    return nx.pagerank(G, weight='weight', **kwargs)
+    kwargs.setdefault('weight', 'weight')
+    return pagerank_sparse(G, **kwargs)
 
-def betweenness_approx(G, k=100, seed=42):
+def betweenness_approx(G, k=100, seed=42, n_jobs=1):
     # approximate betweenness using k node samples
-    return nx.betweenness_centrality(G, k=k, seed=seed, weight='weight')
+    return betweenness_parallel(G, k=k, seed=seed, weight='weight', n_jobs=n_jobs)
 
 def eigenvector(G, max_iter=100, tol=1e-06):
-    try:
-        return nx.eigenvector_centrality_numpy(G, weight='weight')
-    except Exception:
-        return nx.eigenvector_centrality(G, max_iter=max_iter, tol=tol, weight='weight')
+    return eigenvector_sparse(G, max_iter=max_iter, tol=tol, weight='weight')
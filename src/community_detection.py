@@ -1,21 +1,202 @@
 """
 Louvain community detection wrapper using python-louvain (community package).
+louvain_sweep runs Louvain over a grid of resolutions and seeds in worker processes and scores
+every run by modularity and by its agreement (adjusted Rand index) with the other seeds at the
+same resolution.
 """
 import community as community_louvain
 import networkx as nx
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
 
-def run_louvain(G, weight='weight', resolution=1.0):
+try:
+    from .csr_graph import CSRGraph
+    from .profiling import profiled
+except ImportError:
+    from csr_graph import CSRGraph
+    from profiling import profiled
+
+@profiled()
+def run_louvain(G, weight='weight', resolution=1.0, partition=None, random_state=None):
     # convert to undirected weighted graph for Louvain
-    if G.is_directed():
-        U = G.to_undirected()
-    else:
-        U = G
-    partition = community_louvain.best_partition(U, weight=weight, resolution=resolution)
+    U = undirected(G)
+    if partition is not None:
+        partition = seed_partition(U, partition)
+    partition = community_louvain.best_partition(U, partition=partition, weight=weight,
+                                                 resolution=resolution, random_state=random_state)
     # partition: dict node -> community_id
     return partition
 
+def louvain_partition(G, random_state=None, weight='weight'):
+    """
+    Louvain on G (NetworkX or CSRGraph) rebuilt from its CSR form. python-louvain's result depends
+    on node and adjacency order, so graphs with the same fingerprint (result_cache) only get the same
+    partition this way; every producer of the cached 'partition' stage calls this.
+    """
+    csr = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G, weight=weight)
+    return run_louvain(csr.to_networkx(), random_state=random_state)
+
+def undirected(G):
+    """The undirected graph Louvain runs on; undirected graphs are used as they are, without a copy."""
+    return G.to_undirected() if G.is_directed() else G
+
+def undirected_edges(csr):
+    """
+    (src, dst, weight) row positions of each undirected edge of a CSRGraph, once, in row order.
+    A reciprocal directed pair keeps the weight of its later row, as DiGraph.to_undirected does.
+    """
+    rows, cols, w = csr.induced_edges()
+    rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+    if csr.is_directed():
+        lo, hi = np.minimum(rows, cols), np.maximum(rows, cols)
+        n = csr.number_of_nodes()
+        # np.unique keeps the first occurrence, so search the reversed arrays for the last one
+        _, last = np.unique((lo * n + hi)[::-1], return_index=True)
+        keep = len(lo) - 1 - last
+        rows, cols, w = lo[keep], hi[keep], w[keep]
+    return rows, cols, np.asarray(w, dtype=np.float64)
+
+def seed_partition(G, prior):
+    """
+    Restrict a prior partition to the nodes of G, giving unseen nodes singleton communities,
+    so it can seed best_partition (which requires every node to be assigned).
+    """
+    next_id = max(prior.values(), default=-1) + 1
+    seeded = {}
+    for n in G.nodes():
+        if n in prior:
+            seeded[n] = prior[n]
+        else:
+            seeded[n] = next_id
+            next_id += 1
+    return seeded
+
+def align_partition(partition, prior, next_id=None):
+    """
+    Relabel `partition` so each community keeps the prior label it overlaps most
+    (largest overlaps matched first); unmatched communities get fresh labels from `next_id`
+    (default: one past the largest prior label).
+    best_partition renumbers from 0, which would otherwise change every row.
+    """
+    from collections import Counter
+    overlap = Counter((c, prior[n]) for n, c in partition.items() if n in prior)
+    mapping = {}
+    used = set()
+    for (c, p), _ in sorted(overlap.items(), key=lambda x: -x[1]):
+        if c not in mapping and p not in used:
+            mapping[c] = p
+            used.add(p)
+    if next_id is None:
+        next_id = max(list(prior.values()) + [-1]) + 1
+    for c in sorted(set(partition.values())):
+        if c not in mapping:
+            mapping[c] = next_id
+            next_id += 1
+    return {n: mapping[c] for n, c in partition.items()}
+
 def summarize_partition(partition):
     from collections import Counter
     cnt = Counter(partition.values())
     sizes = sorted(cnt.items(), key=lambda x: -x[1])
     return sizes
+
+def adjusted_rand_index(a, b):
+    """Adjusted Rand index of two label arrays over the same nodes (1 = identical partitions)."""
+    _, a = np.unique(a, return_inverse=True)
+    _, b = np.unique(b, return_inverse=True)
+    pairs = lambda counts: (counts * (counts - 1) / 2).sum()
+    _, joint = np.unique(a.astype(np.int64) * (b.max() + 1) + b, return_counts=True)
+    index = pairs(joint)
+    sum_a, sum_b = pairs(np.bincount(a)), pairs(np.bincount(b))
+    total = len(a) * (len(a) - 1) / 2
+    expected = sum_a * sum_b / total if total else 0.0
+    best = (sum_a + sum_b) / 2
+    if best == expected:
+        return 1.0
+    return float((index - expected) / (best - expected))
+
+def modularity(labels, src, dst, w, resolution=1.0):
+    """Modularity of a label array on an undirected edge list (each edge once), as community.modularity."""
+    m = w.sum()
+    if m == 0:
+        return 0.0
+    inside = labels[src] == labels[dst]
+    n_comm = labels.max() + 1
+    internal = np.bincount(labels[src][inside], w[inside], minlength=n_comm)
+    degree = np.bincount(labels[src], w, minlength=n_comm) + np.bincount(labels[dst], w, minlength=n_comm)
+    return float((internal / m - resolution * (degree / (2 * m)) ** 2).sum())
+
+def _sweep_block(n, src, dst, w, runs):
+    # each worker rebuilds the integer-labelled graph once for its whole share of the runs
+    U = nx.Graph()
+    U.add_nodes_from(range(n))
+    U.add_weighted_edges_from(zip(src.tolist(), dst.tolist(), w.tolist()))
+    out = []
+    for resolution, seed in runs:
+        part = community_louvain.best_partition(U, resolution=resolution, random_state=seed)
+        out.append(np.fromiter((part[i] for i in range(n)), dtype=np.int64, count=n))
+    return out
+
+@profiled()
+def louvain_sweep(G, resolutions=(0.5, 1.0, 1.5, 2.0), seeds=(0, 1, 2), weight='weight', n_jobs=1,
+                  select='modularity'):
+    """
+    Louvain for every (resolution, seed) pair on G (NetworkX or CSRGraph). The edge arrays come
+    straight from the CSR form; on an undirected graph they are in the order louvain_partition sees,
+    so the (1.0, seed) run matches louvain_partition(G, seed). The runs are split across n_jobs processes.
+    Returns a dict with
+      'runs': DataFrame (resolution, seed, modularity, n_communities, largest, stability), where
+              modularity is at resolution 1 so runs are comparable and stability is the mean
+              adjusted Rand index against the other seeds at the same resolution;
+      'summaries': {(resolution, seed): summarize_partition(...)};
+      'best': (resolution, seed) of the selected run and 'partition': its node -> community dict.
+    select='modularity' keeps the highest-modularity run; select='stability' keeps the most
+    stable resolution and, within it, the highest-modularity seed.
+    """
+    if select not in ('modularity', 'stability'):
+        raise ValueError(f"Unsupported selection: {select}")
+    csr = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G, weight=weight)
+    nodes = csr.nodes.tolist()
+    src, dst, w = undirected_edges(csr)
+    runs = [(float(r), int(s)) for r in resolutions for s in seeds]
+    if not runs:
+        raise ValueError("louvain_sweep needs at least one resolution and one seed")
+    n_jobs = min(n_jobs if n_jobs > 0 else len(runs), len(runs))
+    blocks = [runs[i::n_jobs] for i in range(n_jobs)]
+    if n_jobs == 1:
+        parts = [_sweep_block(len(nodes), src, dst, w, runs)]
+    else:
+        parts = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(
+            delayed(_sweep_block)(len(nodes), src, dst, w, b) for b in blocks)
+    labels = {}
+    for block, block_labels in zip(blocks, parts):
+        labels.update(zip(block, block_labels))
+
+    rows = []
+    for resolution, seed in runs:
+        lab = labels[(resolution, seed)]
+        sizes = np.bincount(lab)
+        others = [adjusted_rand_index(lab, labels[(resolution, s)]) for s in seeds if s != seed]
+        rows.append({'resolution': resolution, 'seed': seed, 'modularity': modularity(lab, src, dst, w),
+                     'n_communities': int((sizes > 0).sum()), 'largest': int(sizes.max()) if len(sizes) else 0,
+                     'stability': float(np.mean(others)) if others else np.nan})
+    df = pd.DataFrame(rows)
+    if select == 'stability' and df['stability'].notna().any():
+        stable = df.groupby('resolution')['stability'].mean().idxmax()
+        best = df[df['resolution'] == stable]['modularity'].idxmax()
+    else:
+        best = df['modularity'].idxmax()
+    best = (float(df.at[best, 'resolution']), int(df.at[best, 'seed']))
+    partitions = {run: dict(zip(nodes, lab.tolist())) for run, lab in labels.items()}
+    return {
+        'runs': df,
+        'summaries': {run: summarize_partition(p) for run, p in partitions.items()},
+        'best': best,
+        'partition': partitions[best],
+    }
+
+def resolution_stability(runs):
+    """Mean pairwise adjusted Rand index between the seeds of each resolution, from louvain_sweep's runs."""
+    return runs.groupby('resolution').agg(modularity=('modularity', 'mean'), n_communities=('n_communities', 'mean'),
+                                          stability=('stability', 'mean')).reset_index()
@@ -0,0 +1,432 @@
+"""
+Compact on-disk graph format: CSR adjacency arrays plus a node-ID table.
+Each array is stored as its own .npy file inside a directory and opened with numpy memmap,
+so loading is near-instant and several processes share the same pages.
+Updates can be saved as an overlay (overlay/*.npy) holding only the rows they changed; see CSROverlay.
+"""
+import json
+import os
+import pickle
+import shutil
+import numpy as np
+import networkx as nx
+
+FORMAT_NAME = 'csr-graph'
+FORMAT_VERSION = 1
+_ARRAYS = ('indptr', 'indices', 'weights', 'nodes')
+OVERLAY_DIR = 'overlay'
+_OVERLAY_ARRAYS = ('rows', 'indptr', 'indices', 'weights', 'nodes')
+# an overlay holding more than this fraction of the base's entries is folded into the base on save
+OVERLAY_MAX_FRACTION = 0.05
+
+def _gather(indptr, indices, weights, rows):
+    """(index into `rows`, column, weight) of every entry stored in the given rows, row by row."""
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = np.asarray(indptr[rows], dtype=np.int64)
+    counts = np.asarray(indptr[rows + 1], dtype=np.int64) - starts
+    idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+    return (np.repeat(np.arange(len(rows)), counts), np.asarray(indices[idx], dtype=np.int64),
+            np.asarray(weights[idx], dtype=np.float64))
+
+class CSRGraph:
+    """
+    Adjacency in compressed sparse row form.
+    Row i holds the out-neighbours of node i (both directions for undirected graphs),
+    `nodes[i]` is the original node ID.
+    """
+    def __init__(self, indptr, indices, weights, nodes, directed=False, n_edges=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.nodes = nodes
+        self.directed = bool(directed)
+        if n_edges is None:
+            n_edges = len(indices) if directed else (len(indices) + self._n_self_loops()) // 2
+        self.n_edges = int(n_edges)
+        self._node_index = None
+
+    def _n_self_loops(self):
+        rows = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        return int(np.count_nonzero(rows == self.indices))
+
+    def number_of_nodes(self):
+        return len(self.indptr) - 1
+
+    def number_of_edges(self):
+        return self.n_edges
+
+    def is_directed(self):
+        return self.directed
+
+    def degree(self, weighted=True):
+        """Out-degree per node position (weighted sum of the row if `weighted`)."""
+        if not weighted:
+            return np.diff(self.indptr)
+        # cumsum difference is empty-row safe, unlike np.add.reduceat
+        csum = np.concatenate([[0.0], np.cumsum(self.weights, dtype=np.float64)])
+        return csum[self.indptr[1:]] - csum[self.indptr[:-1]]
+
+    def positions(self, nodes):
+        """Map node IDs to row positions (-1 for unknown IDs)."""
+        if self._node_index is None:
+            import pandas as pd
+            self._node_index = pd.Index(self.nodes)
+        return self._node_index.get_indexer(np.asarray(nodes))
+
+    def row_counts(self):
+        return np.diff(self.indptr)
+
+    def row_entries(self, positions):
+        """(index into `positions`, column, weight) of every entry in those rows; touches only those rows."""
+        return _gather(self.indptr, self.indices, self.weights, positions)
+
+    def edge_arrays(self):
+        """Return (rows, cols, weights) for every stored entry."""
+        rows = np.repeat(np.arange(self.number_of_nodes(), dtype=self.indices.dtype), np.diff(self.indptr))
+        return rows, self.indices, self.weights
+
+    def to_scipy(self, dtype=None):
+        import scipy.sparse as sp
+        n = self.number_of_nodes()
+        data = self.weights if dtype is None else self.weights.astype(dtype, copy=False)
+        return sp.csr_matrix((data, self.indices, self.indptr), shape=(n, n))
+
+    # ---------- converters ----------
+
+    @classmethod
+    def from_edges(cls, src, dst, weights, nodes, directed=False):
+        """Build from integer-coded edge arrays; undirected edges are mirrored."""
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        n_edges = len(src)
+        if not directed:
+            loops = src == dst
+            src, dst = np.concatenate([src, dst[~loops]]), np.concatenate([dst, src[~loops]])
+            weights = np.concatenate([weights, weights[~loops]])
+        n = len(nodes)
+        # one int64 key sort is much faster than lexsort on two columns
+        order = np.argsort(src * n + dst) if n < 3037000499 else np.lexsort((dst, src))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        index_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+        return cls(indptr, dst[order].astype(index_dtype), weights[order],
+                   _node_table(nodes), directed=directed, n_edges=n_edges)
+
+    @classmethod
+    def from_networkx(cls, G, weight='weight'):
+        nodes = list(G.nodes())
+        index = {n: i for i, n in enumerate(nodes)}
+        m = G.number_of_edges()
+        src = np.empty(m, dtype=np.int64)
+        dst = np.empty(m, dtype=np.int64)
+        w = np.empty(m, dtype=np.float64)
+        for i, (u, v, d) in enumerate(G.edges(data=weight, default=1)):
+            src[i] = index[u]
+            dst[i] = index[v]
+            w[i] = d
+        return cls.from_edges(src, dst, w, nodes, directed=G.is_directed())
+
+    def induced_edges(self, positions=None):
+        """
+        (rows, cols, weights) of the subgraph induced on the unique row `positions` (all rows if None),
+        each undirected edge listed once.
+        """
+        if positions is None:
+            rows, cols, w = self.edge_arrays()
+        else:
+            # gather only the rows of the selected nodes, so a small subgraph never touches the rest
+            positions = np.asarray(positions, dtype=np.int64)
+            local, cols, w = self.row_entries(positions)
+            rows = positions[local]
+            keep = np.zeros(self.number_of_nodes(), dtype=bool)
+            keep[positions] = True
+            mask = keep[cols]
+            rows, cols, w = rows[mask], cols[mask], w[mask]
+        if not self.directed:
+            mask = rows <= cols
+            rows, cols, w = rows[mask], cols[mask], w[mask]
+        return rows, cols, w
+
+    def to_networkx(self, positions=None):
+        """Convert to NetworkX; `positions` restricts to the induced subgraph on those rows."""
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        G.add_nodes_from((self.nodes if positions is None else self.nodes[np.asarray(positions)]).tolist())
+        rows, cols, w = self.induced_edges(positions)
+        labels = self.nodes
+        G.add_weighted_edges_from(zip(labels[rows].tolist(), labels[cols].tolist(), w.tolist()))
+        return G
+
+    # ---------- storage ----------
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        # a full write supersedes any overlay saved there earlier
+        shutil.rmtree(os.path.join(path, OVERLAY_DIR), ignore_errors=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        meta = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'directed': self.directed,
+            'n_nodes': self.number_of_nodes(),
+            'n_edges': self.n_edges,
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap=True, overlay=True):
+        """
+        Open a CSR directory. A saved overlay is merged in, which reads the base into memory;
+        pass overlay=False for the memory-mapped base alone.
+        """
+        meta = _read_meta(path)
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode) for name in _ARRAYS}
+        csr = cls(arrays['indptr'], arrays['indices'], arrays['weights'], arrays['nodes'],
+                  directed=meta['directed'], n_edges=meta['n_edges'])
+        if overlay and 'overlay' in meta:
+            return CSROverlay.load(path, base=csr).merged()
+        return csr
+
+class CSROverlay:
+    """
+    A CSRGraph plus replacement rows: the rows an update changed and those of nodes added after the
+    base, held as a small CSR of their own. An update then costs the rows it touches instead of a
+    copy of the base arrays; merged() folds the overlay into a plain CSRGraph.
+    Rows are read through row_entries/row_counts, which CSRGraph provides as well.
+    """
+    def __init__(self, base, rows=None, indptr=None, indices=None, weights=None, added=None,
+                 n_edges=None, path=None):
+        self.base = base
+        self.directed = base.directed
+        # sorted positions of the replaced rows and their entries
+        self.rows = np.zeros(0, dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+        self.row_indptr = np.zeros(1, dtype=np.int64) if indptr is None else np.asarray(indptr, dtype=np.int64)
+        self.row_indices = np.zeros(0, dtype=np.int64) if indices is None else np.asarray(indices, dtype=np.int64)
+        self.row_weights = np.zeros(0) if weights is None else np.asarray(weights, dtype=np.float64)
+        # IDs of the nodes appended after the base's
+        self.added = base.nodes[:0] if added is None else np.asarray(added)
+        self.n_edges = base.n_edges if n_edges is None else int(n_edges)
+        # the directory the base was loaded from, if any
+        self.path = path
+        self._nodes = None
+        self._added_index = None
+
+    def number_of_nodes(self):
+        return self.base.number_of_nodes() + len(self.added)
+
+    def number_of_edges(self):
+        return self.n_edges
+
+    def is_directed(self):
+        return self.directed
+
+    def _same_id_kind(self):
+        return not len(self.added) or self.added.dtype.kind == self.base.nodes.dtype.kind
+
+    @property
+    def nodes(self):
+        if self._nodes is None:
+            if not len(self.added):
+                self._nodes = self.base.nodes
+            elif self._same_id_kind():
+                self._nodes = np.concatenate([self.base.nodes, self.added])
+            else:
+                self._nodes = np.concatenate([self.base.nodes.astype(str), self.added.astype(str)])
+        return self._nodes
+
+    def positions(self, nodes):
+        """Map node IDs to row positions (-1 for unknown IDs)."""
+        nodes = np.asarray(nodes)
+        pos = self.base.positions(nodes)
+        missing = pos < 0
+        if missing.any() and len(self.added):
+            if self._added_index is None:
+                import pandas as pd
+                self._added_index = pd.Index(self.added)
+            extra = self._added_index.get_indexer(nodes[missing])
+            pos[missing] = np.where(extra >= 0, extra + self.base.number_of_nodes(), -1)
+        return pos
+
+    def row_counts(self):
+        counts = np.zeros(self.number_of_nodes(), dtype=np.int64)
+        counts[:self.base.number_of_nodes()] = self.base.row_counts()
+        counts[self.rows] = np.diff(self.row_indptr)
+        return counts
+
+    def _slots(self, positions):
+        """Overlay slot of each position and whether the row is replaced."""
+        if not len(self.rows):
+            return np.zeros(len(positions), dtype=np.int64), np.zeros(len(positions), dtype=bool)
+        slot = np.minimum(np.searchsorted(self.rows, positions), len(self.rows) - 1)
+        return slot, self.rows[slot] == positions
+
+    def row_entries(self, positions):
+        """(index into `positions`, column, weight) of every entry in those rows; touches only those rows."""
+        positions = np.asarray(positions, dtype=np.int64)
+        slot, over = self._slots(positions)
+        in_base = np.flatnonzero(~over & (positions < self.base.number_of_nodes()))
+        in_over = np.flatnonzero(over)
+        b_local, b_cols, b_w = self.base.row_entries(positions[in_base])
+        o_local, o_cols, o_w = _gather(self.row_indptr, self.row_indices, self.row_weights, slot[in_over])
+        local = np.concatenate([in_base[b_local], in_over[o_local]])
+        order = np.argsort(local, kind='stable')
+        return local[order], np.concatenate([b_cols, o_cols])[order], np.concatenate([b_w, o_w])[order]
+
+    def with_rows(self, rows, indptr, indices, weights, added=None, n_edges=None):
+        """
+        A new overlay in which the sorted, unique `rows` hold the given CSR slices, with the `added`
+        node IDs appended (rows of added nodes not among `rows` are empty).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = np.diff(indptr)
+        keep = np.flatnonzero(~np.isin(self.rows, rows))
+        local, cols, w = _gather(self.row_indptr, self.row_indices, self.row_weights, keep)
+        all_rows = np.concatenate([self.rows[keep], rows])
+        all_counts = np.concatenate([np.diff(self.row_indptr)[keep], counts])
+        # reorder the rows by position and carry their entries along
+        order = np.argsort(all_rows, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        segment = np.concatenate([local, len(keep) + np.repeat(np.arange(len(rows)), counts)])
+        entries = np.argsort(rank[segment], kind='stable')
+        new_indptr = np.zeros(len(all_rows) + 1, dtype=np.int64)
+        np.cumsum(all_counts[order], out=new_indptr[1:])
+        nodes = self.added
+        if added is not None and len(added):
+            added = _node_table(added)
+            if not len(nodes):
+                nodes = added
+            elif nodes.dtype.kind == added.dtype.kind:
+                nodes = np.concatenate([nodes, added])
+            else:
+                nodes = np.concatenate([nodes.astype(str), added.astype(str)])
+        return CSROverlay(self.base, all_rows[order], new_indptr,
+                          np.concatenate([cols, indices])[entries], np.concatenate([w, weights])[entries],
+                          nodes, n_edges=self.n_edges if n_edges is None else n_edges, path=self.path)
+
+    def induced_edges(self, positions=None):
+        if positions is None:
+            return self.merged().induced_edges()
+        return CSRGraph.induced_edges(self, positions)
+
+    to_networkx = CSRGraph.to_networkx
+
+    def merged(self):
+        """The graph as one in-memory CSRGraph."""
+        base = self.base
+        nb = base.number_of_nodes()
+        counts = self.row_counts()
+        indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        index_dtype = np.int32 if len(counts) < np.iinfo(np.int32).max else np.int64
+        indices = np.empty(indptr[-1], dtype=index_dtype)
+        weights = np.empty(indptr[-1], dtype=np.float64)
+        # entries of unchanged base rows keep their offset within the row
+        entry_row = np.repeat(np.arange(nb), base.row_counts())
+        kept = np.ones(nb, dtype=bool)
+        kept[self.rows[self.rows < nb]] = False
+        kept = kept[entry_row]
+        offset = np.arange(len(entry_row)) - np.asarray(base.indptr, dtype=np.int64)[entry_row]
+        dest = indptr[entry_row[kept]] + offset[kept]
+        indices[dest] = base.indices[kept]
+        weights[dest] = base.weights[kept]
+        over_counts = np.diff(self.row_indptr)
+        dest = (np.repeat(indptr[self.rows] - self.row_indptr[:-1], over_counts)
+                + np.arange(len(self.row_indices)))
+        indices[dest] = self.row_indices
+        weights[dest] = self.row_weights
+        # copy the node table: saving over a memory-mapped base must not read from the file being written
+        return CSRGraph(indptr, indices, weights, np.array(self.nodes), directed=self.directed,
+                        n_edges=self.n_edges)
+
+    def save(self, path):
+        """
+        Back where the base was loaded from, write only the overlay while it stays under
+        OVERLAY_MAX_FRACTION of the base; otherwise write the merged graph.
+        """
+        same = self.path is not None and os.path.abspath(path) == os.path.abspath(self.path)
+        small = len(self.row_indices) <= OVERLAY_MAX_FRACTION * max(len(self.base.indices), 1)
+        if not (same and small and self._same_id_kind()):
+            self.merged().save(path)
+            return
+        overlay_dir = os.path.join(path, OVERLAY_DIR)
+        os.makedirs(overlay_dir, exist_ok=True)
+        arrays = dict(rows=self.rows, indptr=self.row_indptr, indices=self.row_indices,
+                      weights=self.row_weights, nodes=self.added)
+        for name in _OVERLAY_ARRAYS:
+            np.save(os.path.join(overlay_dir, f'{name}.npy'), arrays[name])
+        meta = _read_meta(path)
+        meta['overlay'] = {'n_nodes': self.number_of_nodes(), 'n_edges': self.n_edges}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap=True, base=None):
+        """Open a CSR directory as its memory-mapped base plus the saved overlay (empty if none)."""
+        if base is None:
+            base = CSRGraph.load(path, mmap=mmap, overlay=False)
+        meta = _read_meta(path)
+        if 'overlay' not in meta:
+            return cls(base, path=path)
+        # overlays are small and rewritten in place, so they are read into memory rather than mapped
+        arrays = {name: np.load(os.path.join(path, OVERLAY_DIR, f'{name}.npy')) for name in _OVERLAY_ARRAYS}
+        return cls(base, arrays['rows'], arrays['indptr'], arrays['indices'], arrays['weights'],
+                   arrays['nodes'], n_edges=meta['overlay']['n_edges'], path=path)
+
+def _read_meta(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT_NAME:
+        raise ValueError(f"{path} is not a {FORMAT_NAME} directory")
+    return meta
+
+def _node_table(nodes):
+    """Store node IDs as int64 when possible, else as fixed-width strings (both memmappable)."""
+    arr = np.asarray(nodes)
+    if arr.dtype.kind in 'iu':
+        return arr.astype(np.int64)
+    if arr.dtype.kind == 'O' and all(isinstance(n, (int, np.integer)) for n in nodes):
+        return arr.astype(np.int64)
+    return arr.astype(str)
+
+def is_csr_graph(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, 'meta.json'))
+
+def read_graph(path, as_networkx=True):
+    """
+    Load a graph stored either as a CSR directory or a gpickle file.
+    With as_networkx=False a CSR directory is returned as a memory-mapped CSRGraph.
+    """
+    if is_csr_graph(path):
+        csr = CSRGraph.load(path)
+        return csr.to_networkx() if as_networkx else csr
+    if hasattr(nx, 'read_gpickle'):
+        G = nx.read_gpickle(path)
+    else:
+        # networkx>=3.0 dropped the gpickle helpers
+        with open(path, 'rb') as f:
+            G = pickle.load(f)
+    return G if as_networkx else CSRGraph.from_networkx(G)
+
+def write_graph(G, path, fmt='gpickle'):
+    if isinstance(G, CSROverlay):
+        if fmt == 'csr':
+            G.save(path)
+            return
+        G = G.merged()
+    if fmt == 'csr':
+        csr = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        csr.save(path)
+    elif fmt == 'gpickle':
+        if isinstance(G, CSRGraph):
+            G = G.to_networkx()
+        if hasattr(nx, 'write_gpickle'):
+            nx.write_gpickle(G, path)
+        else:
+            with open(path, 'wb') as f:
+                pickle.dump(G, f, pickle.HIGHEST_PROTOCOL)
+    else:
+        raise ValueError(f"Unsupported graph format: {fmt}")
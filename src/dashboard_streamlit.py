@@ -1,59 +1,106 @@
 """
 A Streamlit dashboard to visualize communities and top influencers using pyvis for network preview.
 Run with: streamlit run src/dashboard_streamlit.py -- --graph outputs/graph.gpickle
+The graph path may also be a CSR graph directory written by graph_build.py --format csr.
+The preview starts at the community supergraph; pick a community to load only its subgraph.
 """
 import streamlit as st
 import networkx as nx
 import pandas as pd
-from pyvis.network import Network
-import tempfile
+from csr_graph import read_graph
+from metrics_io import NODE_METRICS, read_node_metrics, table_version
+from influencer_index import InfluencerIndex
+from visualization import (LAYOUT_MAX_NODES, community_level, render_level, supergraph_level,
+                           top_degree_level)
 
-@st.cache_data
+@st.cache_resource
 def load_graph(path):
-    return nx.read_gpickle(path)
-
-def make_pyvis(G, partition, top_n=100):
-    net = Network(height='700px', width='100%', notebook=False)
-    # choose top_n nodes by degree
-    deg = dict(G.degree(weight='weight'))
-    nodes_sorted = sorted(deg.items(), key=lambda x: -x[1])[:top_n]
-    nodes_set = set(n for n, _ in nodes_sorted)
-    for n in nodes_set:
-        net.add_node(n, label=str(n), title=str(n), group=partition.get(n, -1))
-    for u, v, d in G.edges(data=True):
-        if u in nodes_set and v in nodes_set:
-            net.add_edge(u, v, value=d.get('weight', 1))
-    net.force_atlas_2based()
-    return net
+    # CSR directories come back memory-mapped and are shared across sessions, not copied
+    return read_graph(path, as_networkx=False)
+
+OUTPUT_DIR = 'outputs'
+# the only node_metrics columns the dashboard shows; Parquet output lets us read just these
+METRICS_COLUMNS = ['node', 'community', 'pagerank', 'degree']
+
+def metrics_version():
+    # part of the cache keys below, so rewriting node_metrics or adding a delta file invalidates them
+    return table_version(OUTPUT_DIR, NODE_METRICS)
+
+@st.cache_data
+def load_metrics(version):
+    try:
+        return read_node_metrics(OUTPUT_DIR, columns=METRICS_COLUMNS)
+    except Exception:
+        return None
+
+@st.cache_resource
+def load_influencers(graph_path, version):
+    # built once per metrics file and shared across sessions; every query below is an array slice
+    df = load_metrics(version)
+    if df is None or 'pagerank' not in df.columns:
+        return None
+    return InfluencerIndex(df, metrics=['pagerank', 'degree'], graph=load_graph(graph_path))
+
+def load_partition(df):
+    # no partition at all (out_of_core.py writes community -1 for every node): show the top-degree view
+    if df is None or 'community' not in df.columns or (df.community < 0).all():
+        return {}
+    return pd.Series(df.community.values, index=df.node.values).to_dict()
+
+# layouts are computed once per graph (and community) and reused across reruns and sessions
+@st.cache_data
+def overview_level(graph_path, top_n, version):
+    G = load_graph(graph_path)
+    partition = load_partition(load_metrics(version))
+    if not partition:
+        return top_degree_level(G, max_nodes=top_n)
+    return supergraph_level(G, partition)
+
+@st.cache_data
+def drill_level(graph_path, community, top_n, version):
+    return community_level(load_graph(graph_path), load_partition(load_metrics(version)), community,
+                           max_nodes=top_n)
 
 def main():
     st.title('Network Influence Analysis')
     st.sidebar.header('Settings')
-    graph_path = st.sidebar.text_input('Graph gpickle path', 'outputs/graph.gpickle')
+    graph_path = st.sidebar.text_input('Graph path (gpickle or CSR directory)', 'outputs/graph.gpickle')
+    top_n = st.sidebar.number_input('Max nodes per view', min_value=50, max_value=LAYOUT_MAX_NODES, value=500, step=50)
     if st.sidebar.button('Load'):
+        st.session_state['graph_path'] = graph_path
+    # keep the loaded graph across reruns so the drill-down controls stay usable
+    if 'graph_path' in st.session_state:
+        graph_path = st.session_state['graph_path']
         G = load_graph(graph_path)
         st.sidebar.success(f'Loaded graph: nodes={G.number_of_nodes()} edges={G.number_of_edges()}')
         # try to load node metrics
-        try:
-            df = pd.read_csv('outputs/node_metrics.csv')
-        except Exception:
-            df = None
+        version = metrics_version()
+        df = load_metrics(version)
 
         # Try to load partition from node metrics
-        partition = {}
-        if df is not None and 'community' in df.columns:
-            partition = pd.Series(df.community.values,index=df.node.values).to_dict()
+        partition = load_partition(df)
 
         st.subheader('Top influencers (by PageRank)')
-        if df is not None and 'pagerank' in df.columns:
-            top = df.sort_values('pagerank', ascending=False).head(20)
-            st.table(top[['node','community','pagerank','degree']])
+        influencers = load_influencers(graph_path, version)
+        if influencers is not None:
+            rows = influencers.top_rows('pagerank', k=20)
+            st.table(df.iloc[rows][['node','community','pagerank','degree']])
 
         st.subheader('Network preview (pyvis)')
-        net = make_pyvis(G, partition)
-        path = tempfile.NamedTemporaryFile(delete=False, suffix='.html').name
-        net.save_graph(path)
-        st.components.v1.html(open(path, 'r', encoding='utf-8').read(), height=700)
+        community = None
+        if partition:
+            sizes = pd.Series(partition).value_counts()
+            options = ['All communities'] + sizes.index.tolist()
+            community = st.selectbox('View', options,
+                                     format_func=lambda c: c if isinstance(c, str) else f'Community {c} ({sizes[c]} nodes)')
+        if community is None or isinstance(community, str):
+            level = overview_level(graph_path, int(top_n), version)
+        else:
+            level = drill_level(graph_path, community, int(top_n), version)
+            if influencers is not None:
+                st.caption(f'Top influencers in community {community}')
+                st.table(df.iloc[influencers.top_rows('pagerank', k=10, community=community)][['node','pagerank','degree']])
+        st.components.v1.html(render_level(level, height='700px'), height=700)
 
 if __name__ == '__main__':
     main()
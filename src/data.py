@@ -2,32 +2,169 @@ import networkx as nx
 import pandas as pd
 import numpy as np
 
-def generate_synthetic_graph(n_nodes=10000, n_edges=150000, seed=None):
+try:
+    from .csr_graph import CSRGraph
+except ImportError:
+    from csr_graph import CSRGraph
+
+MODELS = ('ba', 'chung_lu', 'planted')
+
+def _edge_keys(u, v, n):
+    """Encode undirected edges as int64 keys u*n+v with u < v."""
+    lo, hi = np.minimum(u, v), np.maximum(u, v)
+    return lo.astype(np.int64) * n + hi
+
+def _sorted_unique(a):
+    # sort-based unique; cheaper than np.unique's hash path on large int64 key arrays
+    a = np.sort(a)
+    if len(a) == 0:
+        return a
+    return a[np.concatenate([[True], a[1:] != a[:-1]])]
+
+def _merge_keys(keys, new):
+    """Union of two sorted unique key arrays."""
+    return _sorted_unique(np.concatenate([keys, new]))
+
+def _fill_uniform(keys, n, target, rng, batch=1 << 24):
+    """
+    Add uniformly random new edges to the sorted unique `keys` until there are `target`.
+    Near full density the remaining non-edges are enumerated and sampled directly,
+    so the fill never stalls on rejected duplicates.
+    """
+    max_edges = n * (n - 1) // 2
+    target = min(target, max_edges)
+    while len(keys) < target:
+        need = target - len(keys)
+        if need > (max_edges - len(keys)) // 2:
+            iu, ju = np.triu_indices(n, k=1)
+            free = np.setdiff1d(iu.astype(np.int64) * n + ju, keys, assume_unique=True)
+            pick = rng.choice(len(free), size=need, replace=False)
+            return _merge_keys(keys, free[pick])
+        size = min(batch, int(need * 1.2) + 16)
+        u = rng.randint(0, n, size)
+        v = rng.randint(0, n, size)
+        ok = u != v
+        new = _sorted_unique(_edge_keys(u[ok], v[ok], n))
+        new = new[~np.isin(new, keys, assume_unique=True)]
+        if len(new) > need:
+            new = rng.choice(new, size=need, replace=False)
+        keys = _merge_keys(keys, new)
+    return keys
+
+def _sample_cdf(cdf, r):
+    """Inverse-CDF sampling; the needles are sorted first, which makes searchsorted cache friendly."""
+    order = np.argsort(r)
+    out = np.empty(len(r), dtype=np.int64)
+    out[order] = np.searchsorted(cdf, r[order])
+    return np.minimum(out, len(cdf) - 1)
+
+def _power_law_weights(n, exponent, rng):
+    # expected degrees w_i ~ i^(-1/(exponent-1)), shuffled so node IDs carry no rank
+    w = np.arange(1, n + 1, dtype=np.float64) ** (-1.0 / (exponent - 1.0))
+    rng.shuffle(w)
+    return w
+
+def generate_edge_arrays(n_nodes=10000, n_edges=150000, seed=None, model='chung_lu',
+                         n_communities=10, mixing=0.1, exponent=2.5, batch=1 << 24):
+    """
+    Vectorized scale-free edge generator; returns (src, dst, membership) int arrays.
+    'chung_lu': endpoints drawn in batches proportional to power-law expected degrees.
+    'planted': the same degrees with n_communities planted groups; a fraction `mixing`
+    of edges leave the source's community (membership holds the ground truth, else None).
+    Duplicates and self-loops are removed in bulk; the result is reproducible per seed.
+    """
+    if model not in ('chung_lu', 'planted'):
+        raise ValueError(f"Unsupported model for edge arrays: {model}")
+    rng = np.random.RandomState(seed)
+    n = int(n_nodes)
+    target = min(int(n_edges), n * (n - 1) // 2)
+    w = _power_law_weights(n, exponent, rng)
+    cdf = np.cumsum(w)
+    cdf /= cdf[-1]
+
+    membership = None
+    if model == 'planted':
+        membership = rng.randint(0, n_communities, n)
+        # nodes laid out community by community, with a per-community degree CDF
+        order = np.argsort(membership, kind='stable')
+        comm_cdf = np.cumsum(w[order])
+        bounds = np.searchsorted(membership[order], np.arange(n_communities + 1))
+        lo = np.concatenate([[0.0], comm_cdf])[bounds[:-1]]
+        hi = comm_cdf[np.maximum(bounds[1:] - 1, 0)]
+
+    keys = np.empty(0, dtype=np.int64)
+    # a few rounds of preferential sampling; heavy hubs saturate, the rest is filled uniformly
+    for _ in range(20):
+        need = target - len(keys)
+        if need <= 0:
+            break
+        size = min(batch, int(need * 1.3) + 16)
+        u = _sample_cdf(cdf, rng.random_sample(size))
+        if model == 'planted':
+            c = membership[u]
+            inside = rng.random_sample(size) >= mixing
+            r = lo[c] + rng.random_sample(size) * (hi[c] - lo[c])
+            v_in = order[_sample_cdf(comm_cdf, r)]
+            v_out = _sample_cdf(cdf, rng.random_sample(size))
+            v = np.where(inside, v_in, v_out)
+        else:
+            v = _sample_cdf(cdf, rng.random_sample(size))
+        ok = u != v
+        new = _sorted_unique(_edge_keys(u[ok], v[ok], n))
+        new = new[~np.isin(new, keys, assume_unique=True)]
+        if len(new) > need:
+            new = rng.choice(new, size=need, replace=False)
+        keys = _merge_keys(keys, new)
+        if len(new) < need * 0.01:
+            break
+    keys = _fill_uniform(keys, n, target, rng, batch=batch)
+    keys = keys[rng.permutation(len(keys))]
+    return keys // n, keys % n, membership
+
+def generate_synthetic_graph(n_nodes=10000, n_edges=150000, seed=None, model='ba', as_csr=False,
+                             n_communities=10, mixing=0.1):
     """
     Generate an undirected synthetic graph.
     For scale-free social-like graphs, Barabasi-Albert is used for realism.
     If you need exact edge count, we fall back to gnm_random_graph.
+    model='chung_lu' / 'planted' use the vectorized generate_edge_arrays instead (planted
+    graphs carry the ground-truth `community` node attribute), and as_csr=True returns a
+    CSRGraph built straight from the arrays without going through NetworkX.
     """
+    if model not in MODELS:
+        raise ValueError(f"Unsupported model: {model}")
+    if model != 'ba':
+        src, dst, membership = generate_edge_arrays(n_nodes, n_edges, seed=seed, model=model,
+                                                    n_communities=n_communities, mixing=mixing)
+        if as_csr:
+            return CSRGraph.from_edges(src, dst, np.ones(len(src)), np.arange(n_nodes), directed=False)
+        G = nx.Graph()
+        G.add_nodes_from(range(n_nodes))
+        G.add_edges_from(zip(src.tolist(), dst.tolist()))
+        if membership is not None:
+            nx.set_node_attributes(G, dict(enumerate(membership.tolist())), name='community')
+        nx.set_node_attributes(G, {n: str(n) for n in G.nodes()}, name='label')
+        return G
+
     rng = np.random.RandomState(seed)
     # use Barabasi-Albert if feasible
     try:
         # choose m parameter (edges to attach) roughly edges/n_nodes
         m_param = max(1, int(n_edges // n_nodes))
         G = nx.barabasi_albert_graph(n_nodes, m_param, seed=seed)
-        # If edges are far from desired, patch by adding random edges
+        # If edges are far from desired, patch by adding random edges in vectorized batches
         if G.number_of_edges() < n_edges:
-            extra = int(n_edges - G.number_of_edges())
-            nodes = list(G.nodes())
-            while extra > 0:
-                u, v = rng.choice(nodes), rng.choice(nodes)
-                if u != v and not G.has_edge(u, v):
-                    G.add_edge(u, v)
-                    extra -= 1
+            e = np.array(G.edges(), dtype=np.int64).reshape(-1, 2)
+            keys = _sorted_unique(_edge_keys(e[:, 0], e[:, 1], n_nodes))
+            extra = np.setdiff1d(_fill_uniform(keys, n_nodes, int(n_edges), rng), keys, assume_unique=True)
+            G.add_edges_from(zip((extra // n_nodes).tolist(), (extra % n_nodes).tolist()))
     except Exception:
         # fallback to G(n, m)
         max_edges = n_nodes*(n_nodes-1)//2
         m = min(n_edges, max_edges)
         G = nx.gnm_random_graph(n_nodes, m, seed=seed)
+    if as_csr:
+        return CSRGraph.from_networkx(G)
     # add small labels
     nx.set_node_attributes(G, {n: str(n) for n in G.nodes()}, name='label')
     return G
@@ -3,6 +3,25 @@ import pandas as pd
 from collections import Counter
 import time
 
+try:
+    from .centrality import (betweenness_parallel, betweenness_progressive, closeness_approx, eigenvector_sparse,
+                             estimate_error, pagerank_sparse)
+    from .igraph_backend import IgraphBackend
+    from .influence import DEFAULT_CANDIDATES, InfluenceModel
+    from .influencer_index import InfluencerIndex
+    from .personalized_pagerank import PersonalizedPageRank
+    from .profiling import profiled
+    from .community_detection import louvain_partition, louvain_sweep
+except ImportError:
+    from centrality import (betweenness_parallel, betweenness_progressive, closeness_approx, eigenvector_sparse,
+                            estimate_error, pagerank_sparse)
+    from igraph_backend import IgraphBackend
+    from influence import DEFAULT_CANDIDATES, InfluenceModel
+    from influencer_index import InfluencerIndex
+    from personalized_pagerank import PersonalizedPageRank
+    from profiling import profiled
+    from community_detection import louvain_partition, louvain_sweep
+
 # try to import python-louvain (community) and igraph if available
 try:
     import community as community_louvain
@@ -14,67 +33,135 @@ try:
 except Exception:
     ig = None
 
+# approximate closeness is also checked against the exact values on graphs up to this size
+CLOSENESS_ERROR_MAX_NODES = 5000
+# 'networkx' runs the NetworkX/SciPy code paths, 'igraph' runs every metric in igraph's C core
+BACKENDS = ('networkx', 'igraph')
+
 class GraphAnalyzer:
-    def __init__(self, G):
+    def __init__(self, G, backend='networkx'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}")
         self.G = G
+        self.backend = backend
         self.partition = None
+        self.sweep = None
+        self.influence_df = None
         self.centrality_df = None
+        self.closeness_error = None
+        self.betweenness_pivots = None
+        self._igraph = None
+        self._influencers = None
+        self._ppr = None
 
-    def compute_communities(self, method='louvain'):
+    def igraph_backend(self):
+        """The igraph graph, built once from the CSR edge arrays and reused by every stage."""
+        if self._igraph is None:
+            if ig is None:
+                raise ImportError("python-igraph is required for the igraph backend.")
+            self._igraph = IgraphBackend(self.G)
+        return self._igraph
+
+    @profiled()
+    def compute_communities(self, method='louvain', seed=None):
+        # the igraph backend runs Louvain as igraph's C multilevel implementation
+        if method == 'louvain' and self.backend == 'igraph':
+            method = 'igraph_multilevel'
         if method == 'louvain':
             if community_louvain is None:
                 raise ImportError("python-louvain (`community` package) is required for Louvain.")
-            # partition: node -> community id
-            self.partition = community_louvain.best_partition(self.G)
+            # partition: node -> community id; run on the CSR form, as analysis.py does, so that
+            # both fill the shared 'partition' cache entry with the same result
+            self.partition = louvain_partition(self.G, random_state=seed)
         elif method == 'igraph_multilevel':
             if ig is None:
                 raise ImportError("python-igraph is required for igraph_multilevel.")
-            # convert to igraph, run multilevel community detection
-            mapping = {n: i for i, n in enumerate(self.G.nodes())}
-            edges = [(mapping[u], mapping[v]) for u, v in self.G.edges()]
-            g_igraph = ig.Graph(edges=edges, directed=False)
-            parts = g_igraph.community_multilevel()
-            # build partition dict back to original node keys
-            membership = parts.membership
-            inv_map = {i: n for n, i in mapping.items()}
-            self.partition = {inv_map[i]: membership[i] for i in range(len(membership))}
+            self.partition = self.igraph_backend().communities(seed=seed)
         else:
             raise ValueError("Unsupported community detection method")
 
-    def compute_centralities(self, betweenness_k=None):
+    def sweep_communities(self, resolutions=(0.5, 1.0, 1.5, 2.0), seeds=(0, 1, 2), n_jobs=1, select='modularity'):
+        """
+        Louvain over a resolution/seed grid (see community_detection.louvain_sweep); keeps the best partition.
+        The sweep runs on the CSR form, as analysis.py's does, so both fill the shared cache entry alike.
+        """
+        if community_louvain is None:
+            raise ImportError("python-louvain (`community` package) is required for Louvain.")
+        self.sweep = louvain_sweep(self.G, resolutions, seeds, n_jobs=n_jobs, select=select)
+        self.partition = self.sweep['partition']
+        return self.sweep
+
+    @profiled()
+    def compute_centralities(self, betweenness_k=None, n_jobs=1, closeness_k=None, seed=42,
+                             betweenness_cutoff=None, on_update=None):
+        """
+        Fills centrality_df with degree, betweenness, closeness, eigenvector and pagerank columns.
+        With `on_update` and sampled betweenness on the networkx backend, centrality_df is first
+        built from a 50-pivot betweenness estimate and refined as pivots are added; on_update(self)
+        is called after each step and betweenness_pivots holds the pivots used so far.
+        """
         G = self.G
-        # degree
-        deg = dict(G.degree())
-        # betweenness: approximate if k provided (samples k nodes)
-        if betweenness_k is None:
-            try:
-                bc = nx.betweenness_centrality(G)
-            except Exception:
-                bc = {n: 0.0 for n in G.nodes()}
+        n = G.number_of_nodes()
+        zeros = lambda: {v: 0.0 for v in G.nodes()}
+        k = None if betweenness_k is None else min(int(betweenness_k), n-1)
+        if k is not None and k <= 0:
+            k = None
+        self.betweenness_pivots = k
+        refinements = None
+        if self.backend == 'igraph':
+            backend = self.igraph_backend()
+            deg = backend.degree()
+            betweenness = lambda: backend.betweenness(k=k, seed=seed, cutoff=betweenness_cutoff)
+            exact_closeness = backend.closeness
+            eigenvector = backend.eigenvector
+            pagerank = backend.pagerank
         else:
-            n = G.number_of_nodes()
-            k = min(int(betweenness_k), n-1)
-            if k <= 0 or k >= n:
+            if betweenness_cutoff is not None:
+                raise ValueError("betweenness_cutoff requires the igraph backend")
+            deg = dict(G.degree())
+            # pivots are split over n_jobs processes
+            betweenness = lambda: betweenness_parallel(G, k=k, seed=seed, n_jobs=n_jobs)
+            if on_update is not None and k is not None:
+                # the first estimate comes from 50 pivots, the rest refine it once the table exists
+                refinements = betweenness_progressive(G, k, seed=seed, n_jobs=n_jobs)
+                betweenness = lambda: next(refinements)
+            exact_closeness = lambda: nx.closeness_centrality(G)
+
+            def eigenvector():
+                # sparse power iteration; graphs where it does not converge go to ARPACK (eigsh)
                 try:
-                    bc = nx.betweenness_centrality(G)
-                except Exception:
-                    bc = {n: 0.0 for n in G.nodes()}
+                    return eigenvector_sparse(G, max_iter=1000, weight=None)
+                except nx.PowerIterationFailedConvergence:
+                    return nx.eigenvector_centrality_numpy(G)
+            pagerank = lambda: pagerank_sparse(G, weight=None)
+
+        # betweenness: approximate if k provided (samples k nodes)
+        try:
+            bc = betweenness()
+            if refinements is not None:
+                self.betweenness_pivots, bc = bc
+        except Exception:
+            bc = zeros()
+            refinements = None
+        # closeness: exact BFS from every node, or estimated from closeness_k pivots
+        self.closeness_error = None
+        try:
+            if closeness_k is None or int(closeness_k) >= n:
+                cc = exact_closeness()
             else:
-                try:
-                    bc = nx.betweenness_centrality(G, k=k, seed=42)
-                except TypeError:
-                    # older networkx versions might not accept seed
-                    bc = nx.betweenness_centrality(G, k=k)
-        # closeness
+                cc = closeness_approx(G, k=int(closeness_k), seed=seed)
+                if n <= CLOSENESS_ERROR_MAX_NODES:
+                    self.closeness_error = estimate_error(cc, exact_closeness())
+        except Exception:
+            cc = zeros()
         try:
-            cc = nx.closeness_centrality(G)
+            ev = eigenvector()
         except Exception:
-            cc = {n: 0.0 for n in G.nodes()}
-        # eigenvector (may fail for large disconnected graphs)
+            ev = zeros()
         try:
-            ev = nx.eigenvector_centrality_numpy(G)
+            pr = pagerank()
         except Exception:
-            ev = {n: 0.0 for n in G.nodes()}
+            pr = zeros()
 
         df = pd.DataFrame({
             'node': list(G.nodes()),
@@ -82,15 +169,63 @@ class GraphAnalyzer:
             'betweenness': [bc.get(n, 0.0) for n in G.nodes()],
             'closeness': [cc.get(n, 0.0) for n in G.nodes()],
             'eigenvector': [ev.get(n, 0.0) for n in G.nodes()],
+            'pagerank': [pr.get(n, 0.0) for n in G.nodes()],
         })
         if self.partition is not None:
             df['community'] = df['node'].map(self.partition)
         self.centrality_df = df.sort_values('degree', ascending=False).reset_index(drop=True)
+        self._influencers = InfluencerIndex(self.centrality_df, graph=G)
+        if on_update is not None:
+            on_update(self)
+            for pivots, bc in refinements or ():
+                df = self.centrality_df
+                self.betweenness_pivots = pivots
+                self.centrality_df = df.assign(betweenness=df['node'].map(bc))
+                on_update(self)
 
-    def top_n_by_metric(self, metric='degree', n=10):
+    def influencer_index(self):
+        """Rank index over centrality_df, rebuilt only when the table has been replaced (e.g. from a cache)."""
         if self.centrality_df is None:
             self.compute_centralities()
-        return self.centrality_df[['node', metric]].head(n)
+        if self._influencers is None or self._influencers.df is not self.centrality_df:
+            self._influencers = InfluencerIndex(self.centrality_df, graph=self.G)
+        return self._influencers
+
+    def influence_seeds(self, k=10, model='ic', trials=1000, method='celf++', candidates=DEFAULT_CANDIDATES,
+                        n_jobs=1, seed=42):
+        """
+        Seed set of size k maximising the simulated spread under IC or LT (see influence.InfluenceModel),
+        chosen among the `candidates` highest-degree nodes (None for all nodes).
+        The candidates' single-node spread is added to centrality_df as a '<model>_spread' column.
+        """
+        influence = InfluenceModel(self.G, model=model, n_jobs=n_jobs, seed=seed)
+        self.influence_df = influence.select_seeds(k=k, trials=trials, method=method, candidates=candidates)
+        if self.centrality_df is not None:
+            spread = influence.candidate_spread
+            # a new frame, so influencer_index() picks the column up
+            self.centrality_df = self.centrality_df.assign(
+                **{spread.name: spread.reindex(self.centrality_df['node'].to_numpy()).to_numpy()})
+        return self.influence_df
+
+    def ppr(self):
+        """Personalized PageRank query service, built once and reused (with its cache) by every query."""
+        if self._ppr is None:
+            self._ppr = PersonalizedPageRank(self.G, weight=None)
+        return self._ppr
+
+    def personalized_pagerank(self, seeds, k=10, method='auto'):
+        """Top-k nodes by PageRank personalized to a node, a list of nodes or a {node: weight} dict."""
+        return self.ppr().top(seeds, k=k, method=method)
+
+    def community_influence(self, k=10, communities=None):
+        """Top-k nodes by PageRank personalized to each community's members, one row per (community, rank)."""
+        if self.partition is None:
+            self.compute_communities()
+        return self.ppr().community_influence(self.partition, k=k, communities=communities)
+
+    def top_n_by_metric(self, metric='degree', n=10, community=None):
+        rows = self.influencer_index().top_rows(metric, k=n, community=community)
+        return self.centrality_df[['node', metric]].iloc[rows].reset_index(drop=True)
 
     def community_sizes(self):
         if self.partition is None:
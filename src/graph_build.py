@@ -1,19 +1,26 @@
 """
 Build graph from an edge list CSV. Expected columns: source,target,weight,timestamp,interaction_type
-Produces a NetworkX Graph and saves as gpickle for downstream analysis.
+Produces a NetworkX Graph and saves as gpickle (or a memory-mapped CSR directory) for downstream analysis.
 """
 import argparse
+import time
+import numpy as np
 import pandas as pd
 import networkx as nx
 from tqdm import tqdm
+from csr_graph import CSRGraph, write_graph
+from profiling import profiled
 
 def load_edges(path, chunksize=100000):
     for chunk in pd.read_csv(path, chunksize=chunksize):
         yield chunk
 
-def build_graph(edge_csv, directed=False, weight_col='weight'):
+@profiled()
+def build_graph(edge_csv, directed=False, weight_col='weight', stats=None):
     G = nx.DiGraph() if directed else nx.Graph()
+    rows = 0
     for chunk in load_edges(edge_csv):
+        rows += len(chunk)
         for _, row in chunk.iterrows():
             u = row['source']
             v = row['target']
@@ -22,17 +29,102 @@ def build_graph(edge_csv, directed=False, weight_col='weight'):
                 G[u][v]['weight'] += w
             else:
                 G.add_edge(u, v, weight=float(w))
+    if stats is not None:
+        stats['rows'] = rows
     return G
 
+def _aggregate_chunk(src, dst, w, directed):
+    """Sum duplicate (src, dst) weights of one chunk of integer-coded edges."""
+    if not directed:
+        # undirected edges are keyed on the (min, max) pair so u-v and v-u collapse
+        src, dst = np.minimum(src, dst), np.maximum(src, dst)
+    df = pd.DataFrame({'u': src, 'v': dst, 'w': w})
+    return df.groupby(['u', 'v'], sort=False, as_index=False)['w'].sum()
+
+def _bulk_edges(edge_csv, directed=False, weight_col='weight', chunksize=1000000):
+    """
+    Read the edge CSV as whole columns and return (node_ids, src_codes, dst_codes, weights, rows).
+    Node IDs are mapped to dense integers in order of first appearance, as the row-by-row
+    path would insert them, and duplicate edges are summed with a group-by.
+    """
+    labels = pd.Index([])
+    parts = []
+    rows = 0
+    for chunk in load_edges(edge_csv, chunksize=chunksize):
+        rows += len(chunk)
+        src = chunk['source'].to_numpy()
+        dst = chunk['target'].to_numpy()
+        if weight_col in chunk.columns:
+            w = chunk[weight_col].fillna(1).to_numpy(dtype=np.float64)
+        else:
+            w = np.ones(len(chunk), dtype=np.float64)
+        # interleave so that new IDs are numbered in row order: u0, v0, u1, v1, ...
+        ends = np.column_stack([src, dst]).ravel()
+        codes = labels.get_indexer(ends)
+        missing = codes < 0
+        if missing.any():
+            new = pd.unique(ends[missing])
+            labels = labels.append(pd.Index(new))
+            codes[missing] = labels.get_indexer(ends[missing])
+        codes = codes.reshape(-1, 2)
+        parts.append(_aggregate_chunk(codes[:, 0], codes[:, 1], w, directed))
+
+    names = np.array(labels.tolist(), dtype=object)
+    if parts:
+        edges = pd.concat(parts, ignore_index=True)
+        edges = edges.groupby(['u', 'v'], sort=False, as_index=False)['w'].sum()
+        u, v, w = edges['u'].to_numpy(), edges['v'].to_numpy(), edges['w'].to_numpy()
+    else:
+        u = v = np.empty(0, dtype=np.int64)
+        w = np.empty(0, dtype=np.float64)
+    return names, u, v, w, rows
+
+@profiled()
+def build_graph_bulk(edge_csv, directed=False, weight_col='weight', chunksize=1000000, stats=None):
+    """
+    Vectorized variant of build_graph.
+    Each chunk is read as whole columns, node IDs are mapped to dense integers,
+    duplicate edges are summed with a group-by and the graph is created in one batch.
+    """
+    names, u, v, w, rows = _bulk_edges(edge_csv, directed, weight_col, chunksize)
+    G = nx.DiGraph() if directed else nx.Graph()
+    G.add_nodes_from(names.tolist())
+    G.add_weighted_edges_from(zip(names[u].tolist(), names[v].tolist(), w.tolist()))
+    if stats is not None:
+        stats['rows'] = rows
+    return G
+
+@profiled()
+def build_csr_bulk(edge_csv, directed=False, weight_col='weight', chunksize=1000000, stats=None):
+    """Like build_graph_bulk but produces a CSRGraph without materializing NetworkX."""
+    names, u, v, w, rows = _bulk_edges(edge_csv, directed, weight_col, chunksize)
+    if stats is not None:
+        stats['rows'] = rows
+    return CSRGraph.from_edges(u, v, w, names.tolist(), directed=directed)
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--input', required=True)
     parser.add_argument('--output', required=True)
     parser.add_argument('--directed', action='store_true')
+    parser.add_argument('--bulk', action='store_true', help='vectorized bulk ingestion')
+    parser.add_argument('--chunksize', type=int, default=1000000, help='rows per chunk in --bulk mode')
+    parser.add_argument('--format', choices=['gpickle', 'csr'], default='gpickle',
+                        help='gpickle file or memory-mappable CSR directory')
     args = parser.parse_args()
 
-    G = build_graph(args.input, directed=args.directed)
-    nx.write_gpickle(G, args.output)
+    stats = {}
+    t0 = time.perf_counter()
+    if args.bulk and args.format == 'csr':
+        G = build_csr_bulk(args.input, directed=args.directed, chunksize=args.chunksize, stats=stats)
+    elif args.bulk:
+        G = build_graph_bulk(args.input, directed=args.directed, chunksize=args.chunksize, stats=stats)
+    else:
+        G = build_graph(args.input, directed=args.directed, stats=stats)
+    elapsed = time.perf_counter() - t0
+    rate = stats['rows'] / elapsed if elapsed > 0 else float('inf')
+    print(f"Ingested {stats['rows']} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec, {'bulk' if args.bulk else 'row-by-row'})")
+    write_graph(G, args.output, fmt=args.format)
     print(f"Saved graph: {args.output} | nodes={G.number_of_nodes()} edges={G.number_of_edges()}")
 
 if __name__ == '__main__':
@@ -0,0 +1,308 @@
+"""
+Incremental refresh: apply an edge-delta CSV to a stored graph and update the analysis outputs.
+The delta uses the graph_build columns (source,target[,weight]); weights are added to existing
+edges and an edge whose weight drops to zero or below is removed.
+The graph stays in CSR form: the rows the delta touches are rebuilt into an overlay
+(csr_graph.CSROverlay) on top of the untouched base arrays, and only the overlay is saved back
+until it outgrows OVERLAY_MAX_FRACTION of the base, when the two are merged.
+The metrics are then updated from the delta outward:
+degree changes only on the delta's endpoints, PageRank is corrected by local push from the
+previous scores (the residual sits next to the nodes whose out-edges changed), Louvain reruns on
+the touched communities while their combined size stays within LOUVAIN_REGION_MAX_NODES, seeded
+with their prior partition, and touched nodes of larger communities only make local moves.
+Betweenness and eigenvector centrality are global and carried forward (--eigenvector refreshes the
+latter with a power iteration warm-started from the previous scores).
+Only rows whose community or degree changed, or whose scores moved by more than the tolerance, are
+written, as delta files next to the tables (metrics_io.update_table) that the readers merge; rows
+the push did not move by more than the tolerance keep their stored score. Local moves and push
+leave small inaccuracies behind, so rerun analysis.py now and then for a full pass.
+A gpickle graph is converted to CSR and back in full; keep large graphs as CSR directories.
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from community_detection import run_louvain, align_partition
+from centrality import degree_centrality, eigenvector_scores, pagerank_scores
+from csr_graph import CSRGraph, CSROverlay, is_csr_graph, read_graph, write_graph
+from graph_build import _bulk_edges
+from metrics_io import (COMMUNITY_SUMMARY, NODE_METRICS, read_community_summary, read_node_metrics,
+                        update_table)
+
+# touched communities are rerun with Louvain while their combined size stays within this many nodes
+LOUVAIN_REGION_MAX_NODES = 20000
+
+def apply_edge_delta(graph, delta_csv, weight_col='weight'):
+    """
+    Merge the delta's (aggregated) edge weights into a CSRGraph or CSROverlay.
+    Only the rows holding a changed edge are rebuilt, into the overlay; the base arrays are not copied.
+    Returns the new CSROverlay (new nodes appended, in order of first appearance) and a DataFrame
+    of the edges whose weight changed: u, v (row positions), old and new weight (0 = absent).
+    """
+    if isinstance(graph, CSRGraph):
+        graph = CSROverlay(graph)
+    names, u, v, w, _ = _bulk_edges(delta_csv, directed=graph.directed, weight_col=weight_col)
+    n_old = graph.number_of_nodes()
+    pos = graph.positions(names) if len(names) else np.zeros(0, dtype=np.int64)
+    # an unknown ID only becomes a node through an edge the delta adds
+    unknown = (pos[u] < 0) | (pos[v] < 0)
+    u, v, w = u[~unknown | (w > 0)], v[~unknown | (w > 0)], w[~unknown | (w > 0)]
+    used = np.zeros(len(names), dtype=bool)
+    used[u] = used[v] = True
+    new_ids = np.flatnonzero(used & (pos < 0))
+    pos[new_ids] = n_old + np.arange(len(new_ids))
+    n = n_old + len(new_ids)
+    su, sv, m = pos[u], pos[v], len(u)
+
+    # stored entries to update; both directions of an undirected edge (a self-loop is stored once)
+    er, ec, ew = su, sv, w
+    if not graph.directed:
+        loop = su == sv
+        er, ec, ew = np.r_[su, sv[~loop]], np.r_[sv, su[~loop]], np.r_[w, w[~loop]]
+    rows = np.unique(er)
+    local, cols, weights = graph.row_entries(rows)
+    # columns are sorted within a row, so the keys of the gathered rows are sorted too
+    key = rows[local] * n + cols
+    query = er * n + ec
+    at = np.minimum(np.searchsorted(key, query), max(len(key) - 1, 0))
+    hit = key[at] == query if len(key) else np.zeros(len(query), dtype=bool)
+    old = np.where(hit, weights[at] if len(weights) else 0.0, 0.0)
+    new = np.maximum(old + ew, 0.0)
+
+    # rebuilt rows: their entries plus the delta, summed per column; a weight of zero or below drops out
+    keys, inverse = np.unique(np.r_[key, query], return_inverse=True)
+    total = np.bincount(inverse.ravel(), np.r_[weights, ew])
+    keys, total = keys[total > 0], total[total > 0]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(np.searchsorted(rows, keys // n), minlength=len(rows)), out=indptr[1:])
+    n_edges = graph.number_of_edges() + int((~hit[:m] & (new[:m] > 0)).sum()) - int((hit[:m] & (new[:m] == 0)).sum())
+    updated = graph.with_rows(rows, indptr, keys % n, total, added=names[new_ids].tolist(), n_edges=n_edges)
+    changes = pd.DataFrame({'u': su, 'v': sv, 'old': old[:m], 'new': new[:m]})
+    return updated, changes[changes['old'] != changes['new']].reset_index(drop=True)
+
+def pagerank_push(old, new, x, sources, alpha=0.85, tol=1e-06):
+    """
+    Update PageRank scores `x` of graph `old` (row order) to graph `new`, in which only the rows
+    `sources` changed and rows past the old ones are new nodes.
+    Works on y = K x, the solution of y = alpha P^T y + 1 without dangling redistribution, whose
+    normalisation is PageRank with uniform dangling mass (as nx.pagerank). The previous y's residual
+    under the new graph is nonzero only next to `sources` and on new nodes; it is pushed until no node
+    holds enough to move a score by tol. Returns the new scores and the rows the push touched.
+    """
+    n_old, n = old.number_of_nodes(), new.number_of_nodes()
+    dangling = old.row_counts() == 0
+    y = np.zeros(n)
+    y[:n_old] = x * n_old / (1 - alpha + alpha * x[dangling].sum())
+    r = np.zeros(n)
+    r[n_old:] = 1.0
+    sources = np.asarray(sources, dtype=np.int64)
+    touched = [np.arange(n_old, n)]
+    for csr, sign in ((old, -1.0), (new, 1.0)):
+        # each changed source takes back its old share and hands out its new one
+        src = sources[sources < csr.number_of_nodes()]
+        local, targets, w = csr.row_entries(src)
+        out = np.bincount(local, w, minlength=len(src))
+        np.add.at(r, targets, sign * alpha * (y[src] / np.where(out > 0, out, 1))[local] * w)
+        touched.append(targets)
+    # a residual below tol (1 - alpha) K moves no score by more than tol once spread
+    threshold = tol * (1 - alpha) * y.sum() if n_old else tol
+    frontier = np.unique(np.concatenate(touched))
+    frontier = frontier[np.abs(r[frontier]) > threshold]
+    pushed = [frontier]
+    while len(frontier):
+        mass = r[frontier]
+        r[frontier] = 0.0
+        y[frontier] += mass
+        local, targets, w = new.row_entries(frontier)
+        out = np.bincount(local, w, minlength=len(frontier))
+        np.add.at(r, targets, alpha * (mass / np.where(out > 0, out, 1))[local] * w)
+        frontier = np.unique(targets[np.abs(r[targets]) > threshold])
+        pushed.append(frontier)
+    return y / y.sum(), np.unique(np.concatenate(pushed))
+
+def local_moves(graph, community, degree, movers, resolution=1.0, max_passes=10):
+    """
+    Louvain's local-moving phase restricted to the `movers` rows: each joins the neighbouring
+    community with the best modularity gain, until none moves. Community totals come from the
+    per-row weighted `degree`, so the cost is the movers' rows, not the size of their communities.
+    Movers without a community (-1) start as singletons. Directed graphs use the out-edges.
+    """
+    community = np.asarray(community, dtype=np.int64).copy()
+    degree = np.asarray(degree, dtype=np.float64)
+    movers = np.asarray(movers, dtype=np.int64)
+    m2 = degree.sum()
+    if not len(movers) or m2 <= 0:
+        return community
+    fresh = movers[community[movers] < 0]
+    community[fresh] = int(community.max(initial=-1)) + 1 + np.arange(len(fresh))
+    assigned = community >= 0
+    totals = np.bincount(community[assigned], degree[assigned])
+    local, cols, w = graph.row_entries(movers)
+    bounds = np.searchsorted(local, np.arange(len(movers) + 1))
+    for _ in range(max_passes):
+        moved = False
+        for i, node in enumerate(movers.tolist()):
+            nb, nw = cols[bounds[i]:bounds[i + 1]], w[bounds[i]:bounds[i + 1]]
+            labels = community[nb]
+            mask = (nb != node) & (labels >= 0)
+            current = community[node]
+            totals[current] -= degree[node]
+            candidates, inv = np.unique(np.r_[current, labels[mask]], return_inverse=True)
+            # weight from the node to each candidate community, minus the expected share
+            k_in = np.bincount(inv.ravel(), np.r_[0.0, nw[mask]])
+            gain = k_in - resolution * totals[candidates] * degree[node] / m2
+            best = candidates[np.argmax(gain)]
+            if gain.max() <= gain[np.searchsorted(candidates, current)]:
+                best = current
+            community[node] = best
+            totals[best] += degree[node]
+            moved |= best != current
+        if not moved:
+            break
+    return community
+
+def local_louvain(graph, community, degree, touched, seed=None, max_nodes=LOUVAIN_REGION_MAX_NODES):
+    """
+    Update the community labels (one per row) around the `touched` rows.
+    Touched communities are rerun with Louvain on their subgraph, seeded with their prior labels,
+    smallest first while the region stays within `max_nodes`; touched rows of the remaining
+    (larger) communities and rows without one only move locally (local_moves). Other rows keep theirs.
+    """
+    community = np.asarray(community, dtype=np.int64)
+    touched = np.asarray(touched, dtype=np.int64)
+    labels = np.unique(community[touched])
+    labels = labels[labels >= 0]
+    sizes = np.bincount(community[community >= 0], minlength=int(community.max(initial=-1)) + 1)[labels]
+    order = np.argsort(sizes, kind='stable')
+    rerun = labels[order][np.cumsum(sizes[order]) <= max_nodes]
+    movers = touched[~np.isin(community[touched], rerun)]
+    community = local_moves(graph, community, degree, movers)
+    region = np.flatnonzero(np.isin(community, rerun))
+    if len(region) == 0:
+        return community
+    nodes = graph.nodes[region].tolist()
+    prior = dict(zip(nodes, community[region].tolist()))
+    partition = run_louvain(graph.to_networkx(region), partition=prior, random_state=seed)
+    # fresh labels start past every existing one, so split communities never merge with untouched ones
+    partition = align_partition(partition, prior, next_id=int(community.max(initial=-1)) + 1)
+    community[region] = [partition[n] for n in nodes]
+    return community
+
+def _merged(graph):
+    return graph.merged() if isinstance(graph, CSROverlay) else graph
+
+def update_node_metrics(old, new, prior, changes, pagerank_tol=1e-6, seed=None, eigenvector=False):
+    """
+    Update the prior node_metrics table (indexed by node) from graph `old` to `new` after the edge
+    `changes` returned by apply_edge_delta. Returns the updated table and the index of rows whose
+    community or degree changed or whose scores moved by more than pagerank_tol.
+    """
+    df = prior.reindex(pd.Index(new.nodes, name=prior.index.name))
+    n_old, n = old.number_of_nodes(), new.number_of_nodes()
+    u, v = changes['u'].to_numpy(), changes['v'].to_numpy()
+    touched = np.unique(np.r_[u, v])
+    changed = np.zeros(n, dtype=bool)
+    changed[n_old:] = True
+
+    # degree moves by the weight change on both endpoints of every changed edge
+    if 'degree' in df:
+        degree = df['degree'].fillna(0.0).to_numpy(dtype=np.float64)
+        dw = (changes['new'] - changes['old']).to_numpy()
+        np.add.at(degree, u, dw)
+        np.add.at(degree, v, dw)
+    else:
+        degree = pd.Series(degree_centrality(_merged(new))).to_numpy(dtype=np.float64)
+    changed[touched] = True
+
+    # community: Louvain rerun on the (small) communities the delta touches, local moves elsewhere
+    prior_community = df['community'].fillna(-1).to_numpy(dtype=np.int64) if 'community' in df \
+        else np.full(n, -1, dtype=np.int64)
+    community = local_louvain(new, prior_community, degree, touched, seed=seed)
+    changed |= community != prior_community
+
+    # PageRank: local push from the previous scores; a table without them is computed in full
+    prev = df['pagerank'].to_numpy(dtype=np.float64)[:n_old] if 'pagerank' in df else None
+    if prev is None or np.isnan(prev).any() or not prev.any():
+        pr = pagerank_scores(_merged(new), tol=pagerank_tol)
+        changed[:] = True
+    else:
+        # a source whose out-edges changed: u, and v too when edges spread both ways
+        sources = np.unique(u if new.directed else np.r_[u, v])
+        pr, _ = pagerank_push(old, new, prev, sources, tol=pagerank_tol)
+        changed |= np.abs(pr - np.r_[prev, np.zeros(n - n_old)]) > pagerank_tol
+
+    df['community'] = community
+    df['degree'] = degree
+    df['pagerank'] = pr
+    if 'eigenvector' in df and eigenvector:
+        # global: sparse passes over the whole graph, warm-started from the previous scores
+        start = df['eigenvector'].fillna(0.0).to_numpy(dtype=np.float64)
+        try:
+            ev = eigenvector_scores(_merged(new), nstart=start if start.any() else None)
+            changed |= np.abs(ev - start) > pagerank_tol
+            df['eigenvector'] = ev
+        except Exception as e:
+            print('Eigenvector failed', e)
+    # global metrics not refreshed incrementally; new nodes start at 0
+    for name in ('betweenness', 'eigenvector'):
+        if name in df:
+            df[name] = df[name].fillna(0.0)
+    return df, df.index[changed]
+
+def update_community_summary(df, prior_summary, changed, prior_communities):
+    """
+    Recompute only the summary rows of communities that gained, lost or changed members.
+    Returns the full summary and those rows, where a community left without members has size 0.
+    """
+    affected = set(df.loc[changed, 'community']) | set(prior_communities.reindex(changed).dropna().astype(int))
+    affected = pd.Index(sorted(c for c in affected if c >= 0), name='community')
+    sub = df[df['community'].isin(affected)].reset_index()
+    fresh = sub.groupby('community').agg({
+        'node': 'count',
+        'degree': 'mean',
+        'pagerank': 'mean'
+    }).rename(columns={'node': 'size'})
+    kept = prior_summary.drop(index=affected.intersection(prior_summary.index))
+    rows = fresh.reindex(affected)
+    rows['size'] = rows['size'].fillna(0).astype(np.int64)
+    return pd.concat([kept, fresh]).sort_index(), rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graph', required=True, help='gpickle file or CSR graph directory')
+    parser.add_argument('--delta', required=True, help='edge-delta CSV (source,target[,weight])')
+    parser.add_argument('--outdir', required=True, help='directory holding node_metrics / community_summary (Parquet or CSV)')
+    parser.add_argument('--output', default=None, help='where to store the updated graph (default: overwrite --graph)')
+    parser.add_argument('--pagerank_tol', type=float, default=1e-6)
+    parser.add_argument('--seed', type=int, default=42, help='Louvain seed for the touched communities')
+    parser.add_argument('--eigenvector', action='store_true',
+                        help='also refresh eigenvector centrality (a power iteration over the whole graph)')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    csr_input = is_csr_graph(args.graph)
+    old = CSROverlay.load(args.graph) if csr_input else read_graph(args.graph, as_networkx=False)
+    new, changes = apply_edge_delta(old, args.delta)
+    print(f'Applied delta: {len(changes)} edges changed | nodes={new.number_of_nodes()} edges={new.number_of_edges()}')
+
+    prior = read_node_metrics(args.outdir).set_index('node')
+    prior_summary = read_community_summary(args.outdir)
+
+    df, changed = update_node_metrics(old, new, prior, changes, pagerank_tol=args.pagerank_tol, seed=args.seed,
+                                      eigenvector=args.eigenvector)
+    summary, summary_rows = update_community_summary(df, prior_summary, changed, prior['community'])
+    # only the changed rows are written, as delta files the readers merge
+    df = df.rename_axis('node').reset_index()
+    update_table(df, df[df['node'].isin(changed)], args.outdir, NODE_METRICS)
+    update_table(summary.reset_index(), summary_rows.reset_index(), args.outdir, COMMUNITY_SUMMARY)
+
+    output = args.output or args.graph
+    if csr_input:
+        # the overlay alone is written back next to its base until it outgrows it
+        new.save(output)
+    else:
+        write_graph(new, output, fmt='gpickle')
+    print(f'Updated {len(changed)} of {len(df)} node rows in {time.perf_counter() - t0:.2f}s; graph saved to {output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+Influence-spread estimation and seed-set selection.
+Independent Cascade (IC) and Linear Threshold (LT) cascades are simulated as Monte Carlo trials
+over the CSR arrays. Many trials, and many candidate seed sets, run together: every active
+(trial, node) pair is one int64 key, each round expands the whole frontier with array gathers,
+and memory follows the number of activations rather than trials x nodes. Blocks of trials are
+spread over worker processes. Seed sets of size k are chosen greedily with CELF or CELF++
+(lazy evaluation of marginal gains).
+
+    python src/influence.py --graph outputs/graph.gpickle --outdir outputs --k 50 --trials 1000 --n_jobs 8
+"""
+import argparse
+import heapq
+import os
+import shutil
+import tempfile
+import time
+import weakref
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+
+try:
+    from .csr_graph import CSRGraph
+    from .profiling import profiled
+except ImportError:
+    from csr_graph import CSRGraph
+    from profiling import profiled
+
+MODELS = ('ic', 'lt')
+METHODS = ('celf', 'celf++')
+INFLUENCE_SEEDS = 'influence_seeds'
+# trials handed to one worker task
+BLOCK_ROWS = 4096
+# trials x nodes cells of dense cascade state per batch inside a task
+DENSE_CELLS = 1 << 24
+# default candidate pool of the CLI and GraphAnalyzer: this many highest-degree nodes
+DEFAULT_CANDIDATES = 1000
+# CELF++ estimates the gain given the first pick (mg2) only for this many highest-spread candidates;
+# the rest are re-evaluated as in CELF, so the extra first-round pass stays bounded on large pools
+MG2_CANDIDATES = 256
+
+def _uniform(keys, salt):
+    """Reproducible U[0, 1) per key (splitmix64), so LT thresholds need no per-node storage."""
+    z = keys.astype(np.uint64) + np.uint64(salt * 0x9E3779B97F4A7C15 % (1 << 64))
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def _simulate_block(indptr, indices, edge_weight, model, row_start, row_end, trials, set_ptr, set_nodes, salt):
+    """
+    Cascades for rows [row_start, row_end); row r is a trial of seed set r // trials.
+    Returns the number of active nodes per row.
+    """
+    n = len(indptr) - 1
+    rng = np.random.default_rng([salt, row_start])
+    batch = max(1, min(row_end - row_start, DENSE_CELLS // max(n, 1)))
+    # one (batch x n) state, reused by every batch and cleared through the keys it touched
+    active = np.zeros(batch * n, dtype=bool)
+    level = np.zeros(batch * n, dtype=np.float32) if model == 'lt' else None
+    out = np.zeros(row_end - row_start, dtype=np.int64)
+    for b0 in range(row_start, row_end, batch):
+        rows = np.arange(b0, min(b0 + batch, row_end), dtype=np.int64)
+        sets = rows // trials
+        counts = set_ptr[sets + 1] - set_ptr[sets]
+        idx = np.repeat(set_ptr[sets] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        frontier = np.unique(np.repeat(rows - b0, counts) * n + set_nodes[idx])
+        activated, touched = [frontier], []
+        active[frontier] = True
+        while len(frontier):
+            local, nodes = np.divmod(frontier, n)
+            starts = indptr[nodes]
+            counts = indptr[nodes + 1] - starts
+            edges = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            keys = np.repeat(local, counts) * n + indices[edges]
+            keys_w = edge_weight[edges]
+            keep = ~active[keys]
+            keys, keys_w = keys[keep], keys_w[keep]
+            if model == 'ic':
+                # every (trial, edge) is tried once, when its source becomes active
+                frontier = np.unique(keys[rng.random(len(keys)) < keys_w])
+            else:
+                np.add.at(level, keys, keys_w)
+                keys = np.unique(keys)
+                touched.append(keys)
+                frontier = keys[level[keys] >= _uniform(keys + b0 * n, salt)]
+            active[frontier] = True
+            activated.append(frontier)
+        activated = np.concatenate(activated)
+        out[b0 - row_start:b0 - row_start + len(rows)] = np.bincount(activated // n, minlength=len(rows))
+        active[activated] = False
+        if touched:
+            level[np.concatenate(touched)] = 0
+    return out
+
+class InfluenceModel:
+    def __init__(self, G, model='ic', probability='wc', weight='weight', n_jobs=1, seed=42, block_rows=BLOCK_ROWS):
+        """
+        G is a NetworkX graph or CSRGraph; undirected edges spread both ways.
+        IC edge probabilities: 'wc' (weighted cascade, w_uv / total in-weight of v), 'weight'
+        (the edge weight, clipped to [0, 1]) or a constant float. LT always uses the
+        normalised in-weights w_uv / total in-weight of v with thresholds drawn per trial.
+        """
+        if model not in MODELS:
+            raise ValueError(f"Unsupported influence model: {model}")
+        self.csr = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G, weight=weight)
+        csr = self.csr
+        self.model = model
+        self.n_jobs = n_jobs
+        self.seed = seed
+        self.block_rows = block_rows
+        self._calls = 0
+        self.candidate_spread = None
+        n = csr.number_of_nodes()
+        w = np.asarray(csr.weights, dtype=np.float64)
+        in_weight = np.bincount(csr.indices, w, minlength=n)
+        normalised = np.divide(w, in_weight[csr.indices], out=np.zeros_like(w), where=in_weight[csr.indices] > 0)
+        if model == 'lt' or probability == 'wc':
+            edge_weight = normalised
+        elif probability == 'weight':
+            edge_weight = np.clip(w, 0.0, 1.0)
+        else:
+            edge_weight = np.full(len(w), float(probability))
+        arrays = {'indptr': np.asarray(csr.indptr, dtype=np.int64), 'indices': np.asarray(csr.indices),
+                  'edge_weight': edge_weight}
+        if n_jobs != 1:
+            # written once and reopened as memmaps, so every worker task ships file references, not arrays
+            tmp = tempfile.mkdtemp(prefix='influence-')
+            weakref.finalize(self, shutil.rmtree, tmp, True)
+            for name, arr in arrays.items():
+                np.save(os.path.join(tmp, f'{name}.npy'), arr)
+                arrays[name] = np.load(os.path.join(tmp, f'{name}.npy'), mmap_mode='r')
+        self._arrays = arrays
+
+    def number_of_nodes(self):
+        return self.csr.number_of_nodes()
+
+    def number_of_edges(self):
+        return self.csr.number_of_edges()
+
+    def _simulate(self, seed_sets, trials):
+        """Active-node counts, shape (len(seed_sets), trials), for seed sets of row positions."""
+        self._calls += 1
+        salt = int(np.random.SeedSequence([self.seed, self._calls]).generate_state(1)[0])
+        set_ptr = np.zeros(len(seed_sets) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in seed_sets], out=set_ptr[1:])
+        set_nodes = np.fromiter((v for s in seed_sets for v in s), dtype=np.int64, count=set_ptr[-1])
+        n_rows = len(seed_sets) * trials
+        # at least one task per worker, so single seed-set evaluations are split too
+        step = max(1, min(self.block_rows, -(-n_rows // effective_n_jobs(self.n_jobs))))
+        bounds = list(range(0, n_rows, step)) + [n_rows]
+        a = self._arrays
+        blocks = [(a['indptr'], a['indices'], a['edge_weight'], self.model, r0, r1, trials, set_ptr, set_nodes, salt)
+                  for r0, r1 in zip(bounds[:-1], bounds[1:])]
+        if self.n_jobs == 1 or len(blocks) == 1:
+            counts = [_simulate_block(*b) for b in blocks]
+        else:
+            counts = Parallel(n_jobs=self.n_jobs, max_nbytes='1M', mmap_mode='r')(
+                delayed(_simulate_block)(*b) for b in blocks)
+        return np.concatenate(counts).reshape(len(seed_sets), trials)
+
+    def _positions(self, nodes):
+        pos = self.csr.positions(list(nodes))
+        if (pos < 0).any():
+            raise KeyError(f"Unknown node(s): {np.asarray(list(nodes), dtype=object)[pos < 0].tolist()}")
+        return pos
+
+    def spread(self, seeds, trials=1000):
+        """Expected number of active nodes (seeds included) and its standard error."""
+        counts = self._simulate([self._positions(seeds)], trials)[0]
+        return float(counts.mean()), float(counts.std(ddof=1) / np.sqrt(trials)) if trials > 1 else 0.0
+
+    def node_spread(self, nodes=None, trials=200):
+        """Expected spread of every node on its own (all nodes by default), as a Series."""
+        pos = np.arange(self.number_of_nodes()) if nodes is None else self._positions(nodes)
+        means = self._simulate([[p] for p in pos], trials).mean(axis=1)
+        return pd.Series(means, index=self.csr.nodes[pos], name=f'{self.model}_spread')
+
+    def _candidates(self, candidates):
+        if candidates is None:
+            return np.arange(self.number_of_nodes())
+        if np.isscalar(candidates):
+            # the highest weighted out-degree nodes
+            degree = self.csr.degree(weighted=True)
+            return np.sort(np.argsort(-degree, kind='stable')[:int(candidates)])
+        return self._positions(candidates)
+
+    @profiled()
+    def select_seeds(self, k=10, trials=1000, method='celf++', candidates=None):
+        """
+        Greedy seed set of size k by lazy evaluation of marginal gains (CELF, or CELF++ which
+        also estimates each gain given the current best node and can skip a re-evaluation).
+        `candidates`: node IDs, an int (that many highest-degree nodes) or None for all nodes;
+        every candidate is simulated once up front, so cap the pool on large graphs.
+        CELF++ adds one more batch for its MG2_CANDIDATES highest-spread candidates.
+        Returns a DataFrame: rank, node, marginal_gain, spread (of the seeds so far), evaluations, seconds.
+        The single-node spread of every candidate is kept in `candidate_spread`.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unsupported seed selection method: {method}")
+        t0 = time.perf_counter()
+        cand = self._candidates(candidates)
+        k = min(k, len(cand))
+        rows = []
+        if k == 0:
+            return pd.DataFrame(rows, columns=['rank', 'node', 'marginal_gain', 'spread', 'evaluations', 'seconds'])
+        # first round: every candidate on its own, all simulated together
+        mg1 = self._simulate([[v] for v in cand], trials).mean(axis=1)
+        self.candidate_spread = pd.Series(mg1, index=self.csr.nodes[cand], name=f'{self.model}_spread')
+        evaluations = len(cand)
+        S, spread = [], 0.0
+        if method == 'celf':
+            heap = [(-g, int(v), 0) for g, v in zip(mg1, cand)]
+            heapq.heapify(heap)
+            while len(S) < k:
+                gain, v, fresh = heapq.heappop(heap)
+                if fresh == len(S):
+                    S.append(v)
+                    spread -= gain
+                    rows.append((len(S), self.csr.nodes[v], -gain, spread, evaluations, time.perf_counter() - t0))
+                    continue
+                gain = self._simulate([S + [v]], trials)[0].mean() - spread
+                evaluations += 1
+                heapq.heappush(heap, (-gain, v, len(S)))
+        else:
+            # CELF++ (Goyal et al. 2011): mg2 is the gain given S + prev_best. Only the top of the heap
+            # is popped again once best is picked, so low-spread candidates skip the mg2 estimate
+            best = int(cand[np.argmax(mg1)])
+            state = {int(v): [g1, None, None] for v, g1 in zip(cand, mg1)}
+            ahead = [int(v) for v in cand[np.argsort(-mg1, kind='stable')[:MG2_CANDIDATES]] if v != best]
+            if ahead:
+                mg2 = self._simulate([[v, best] for v in ahead], trials).mean(axis=1) - mg1.max()
+                evaluations += len(ahead)
+                for v, g2 in zip(ahead, mg2):
+                    state[v][1:] = [best, g2]
+            heap = [(-g, int(v), 0) for g, v in zip(mg1, cand)]
+            heapq.heapify(heap)
+            last_seed, cur_best = None, None
+            while len(S) < k:
+                gain, v, flag = heapq.heappop(heap)
+                s = state[v]
+                if flag == len(S):
+                    S.append(v)
+                    spread += s[0]
+                    last_seed, cur_best = v, None
+                    rows.append((len(S), self.csr.nodes[v], s[0], spread, evaluations, time.perf_counter() - t0))
+                    continue
+                if s[1] == last_seed and flag == len(S) - 1:
+                    s[0] = s[2]
+                elif cur_best is None:
+                    s[0] = self._simulate([S + [v]], trials)[0].mean() - spread
+                    s[1] = None
+                    evaluations += 1
+                else:
+                    both = self._simulate([S + [v], S + [v, cur_best]], trials).mean(axis=1)
+                    s[0], s[1], s[2] = both[0] - spread, cur_best, both[1] - spread - state[cur_best][0]
+                    evaluations += 2
+                if cur_best is None or s[0] > state[cur_best][0]:
+                    cur_best = v
+                heapq.heappush(heap, (-s[0], v, len(S)))
+        return pd.DataFrame(rows, columns=['rank', 'node', 'marginal_gain', 'spread', 'evaluations', 'seconds'])
+
+def main():
+    from csr_graph import read_graph
+    from metrics_io import FORMATS, NODE_METRICS, read_node_metrics, table_path, write_node_metrics, write_table
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graph', required=True, help='gpickle file or CSR graph directory')
+    parser.add_argument('--outdir', required=True)
+    parser.add_argument('--model', choices=MODELS, default='ic')
+    parser.add_argument('--probability', default='wc', help="IC edge probability: 'wc', 'weight' or a number")
+    parser.add_argument('--k', type=int, default=50, help='seed set size')
+    parser.add_argument('--trials', type=int, default=1000, help='Monte Carlo trials per spread estimate')
+    parser.add_argument('--method', choices=METHODS, default='celf++')
+    parser.add_argument('--candidates', type=int, default=DEFAULT_CANDIDATES,
+                        help='only consider this many highest-degree nodes (default: %(default)s; 0 = all nodes)')
+    parser.add_argument('--n_jobs', type=int, default=1, help='worker processes (-1 = all cores)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    args = parser.parse_args()
+    probability = args.probability if args.probability in ('wc', 'weight') else float(args.probability)
+
+    G = read_graph(args.graph, as_networkx=False)
+    model = InfluenceModel(G, model=args.model, probability=probability, n_jobs=args.n_jobs, seed=args.seed)
+    seeds = model.select_seeds(k=args.k, trials=args.trials, method=args.method, candidates=args.candidates or None)
+    path = write_table(seeds, args.outdir, INFLUENCE_SEEDS, fmt=args.format)
+    print(seeds.to_string(index=False, float_format=lambda x: f'{x:.2f}'))
+    print('Seed set written to', path)
+    metrics = table_path(args.outdir, NODE_METRICS)
+    if metrics is not None:
+        # add the candidates' single-node spread next to the centralities, in the table's own format
+        df = read_node_metrics(args.outdir)
+        spread = model.candidate_spread
+        df[spread.name] = spread.reindex(df['node'].to_numpy()).to_numpy()
+        write_node_metrics(df, args.outdir, fmt=os.path.splitext(metrics)[1][1:])
+        print(f'{spread.name} added to', metrics)
+
+if __name__ == '__main__':
+    main()
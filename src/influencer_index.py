@@ -0,0 +1,225 @@
+"""
+Precomputed influencer index over a node-metric table.
+For every metric it keeps the descending rank order, each node's rank and a per-community
+ordering, so top-k by metric, by community or within a node's ego neighbourhood, and
+percentile lookups, are array slices rather than sorts. It can also be served over HTTP:
+
+    python src/influencer_index.py --outdir outputs --graph outputs/graph.gpickle --port 8765
+    curl 'localhost:8765/top?metric=pagerank&k=10&community=3'
+    curl 'localhost:8765/ego?node=42&metric=pagerank&k=5'
+    curl 'localhost:8765/percentile?node=42&metric=pagerank'
+"""
+import argparse
+import json
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+try:
+    from .csr_graph import CSRGraph
+except ImportError:
+    from csr_graph import CSRGraph
+
+class InfluencerIndex:
+    def __init__(self, df, metrics=None, graph=None):
+        """
+        df has a 'node' column, an optional 'community' column and one column per metric
+        (all other numeric columns by default). `graph` (NetworkX or CSRGraph) enables ego queries.
+        """
+        self.df = df
+        self.nodes = df['node'].to_numpy()
+        n = len(df)
+        if metrics is None:
+            metrics = [c for c in df.columns if c not in ('node', 'community') and pd.api.types.is_numeric_dtype(df[c])]
+        self.metrics = list(metrics)
+        idx_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+        self.values, self.order, self.rank, self.sorted_values = {}, {}, {}, {}
+        self.has_communities = 'community' in df.columns and df['community'].notna().any()
+        if self.has_communities:
+            self.community = df['community'].to_numpy()
+            codes, labels = pd.factorize(df['community'])
+            self._community_code = {label: code for code, label in enumerate(labels.tolist())}
+            # communities are contiguous slices of every per-community order; code -1 (no community) sorts first
+            self._community_offsets = np.searchsorted(np.sort(codes), np.arange(-1, len(labels) + 1))
+            self.community_order = {}
+        for m in self.metrics:
+            v = df[m].to_numpy(dtype=np.float64)
+            order = np.argsort(-v, kind='stable').astype(idx_dtype)  # descending, NaN last
+            rank = np.empty(n, dtype=idx_dtype)
+            rank[order] = np.arange(n, dtype=idx_dtype)
+            self.values[m], self.order[m], self.rank[m] = v, order, rank
+            ranked = v[order]
+            self.sorted_values[m] = ranked[:n - np.count_nonzero(np.isnan(v))][::-1]  # ascending, NaN dropped
+            if self.has_communities:
+                # a stable integer sort by community keeps the metric order inside each community
+                self.community_order[m] = order[np.argsort(codes[order], kind='stable')]
+        self._node_index = pd.Index(self.nodes)
+        self._graph = graph
+        self._csr = None
+        self._csr_rows = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _check_metric(self, metric):
+        if metric not in self.values:
+            raise KeyError(f"Unknown metric: {metric} (indexed: {', '.join(self.metrics)})")
+
+    def rows(self, nodes):
+        """Table rows of the given node IDs (-1 for unknown IDs, including IDs of another type)."""
+        try:
+            return self._node_index.get_indexer(np.atleast_1d(np.asarray(nodes, dtype=self.nodes.dtype)))
+        except (ValueError, TypeError, OverflowError):
+            # e.g. 'abc' among integer IDs: convert one by one, the ones that fail are unknown
+            items = np.atleast_1d(np.asarray(nodes, dtype=object))
+            rows = np.full(len(items), -1, dtype=np.intp)
+            for i, node in enumerate(items.tolist()):
+                try:
+                    rows[i] = self._node_index.get_indexer(np.asarray([node], dtype=self.nodes.dtype))[0]
+                except (ValueError, TypeError, OverflowError):
+                    pass
+            return rows
+
+    def top_rows(self, metric, k=10, community=None):
+        """Row positions of the k highest-ranked nodes, overall or within one community."""
+        self._check_metric(metric)
+        if community is None:
+            return self.order[metric][:k]
+        if not self.has_communities:
+            raise ValueError("the indexed table has no community column")
+        code = self._community_code.get(community)
+        if code is None:
+            return self.order[metric][:0]
+        start, end = self._community_offsets[code + 1], self._community_offsets[code + 2]
+        return self.community_order[metric][start:min(end, start + k)]
+
+    def _frame(self, rows, metric):
+        out = {'node': self.nodes[rows]}
+        if self.has_communities:
+            out['community'] = self.community[rows]
+        out[metric] = self.values[metric][rows]
+        out['rank'] = self.rank[metric][rows] + 1
+        return pd.DataFrame(out)
+
+    def top(self, metric, k=10, community=None):
+        """DataFrame of the top-k nodes by metric: node, community, metric value and global rank (1 = best)."""
+        return self._frame(self.top_rows(metric, k, community), metric)
+
+    def percentile(self, nodes, metric):
+        """Share of nodes (in %) whose metric value is at or below each node's value."""
+        self._check_metric(metric)
+        rows = self.rows(nodes)
+        if (rows < 0).any():
+            raise KeyError(f"Unknown node(s): {np.atleast_1d(np.asarray(nodes, dtype=object))[rows < 0].tolist()}")
+        ranked = self.sorted_values[metric]
+        pct = 100.0 * np.searchsorted(ranked, self.values[metric][rows], side='right') / max(len(ranked), 1)
+        return pct if np.ndim(nodes) else float(pct[0])
+
+    def _ego_rows(self, node, radius):
+        if self._graph is None:
+            raise ValueError("ego queries need the graph; pass graph= when building the index")
+        if self._csr is None:
+            csr = self._graph if isinstance(self._graph, CSRGraph) else CSRGraph.from_networkx(self._graph)
+            self._csr, self._csr_rows = csr, self.rows(csr.nodes)
+        csr = self._csr
+        start = csr.positions([node])
+        if start[0] < 0:
+            raise KeyError(f"Unknown node: {node}")
+        frontier, seen = start, start
+        for _ in range(radius):
+            # out-neighbours of the whole frontier, like nx.ego_graph
+            counts = csr.indptr[frontier + 1] - csr.indptr[frontier]
+            idx = np.repeat(csr.indptr[frontier] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            frontier = np.setdiff1d(csr.indices[idx], seen)
+            seen = np.union1d(seen, frontier)
+        rows = self._csr_rows[np.setdiff1d(seen, start)]
+        return rows[rows >= 0]
+
+    def ego(self, node, metric, k=10, radius=1):
+        """Top-k nodes by metric among the neighbours of `node` within `radius` hops (the node itself excluded)."""
+        self._check_metric(metric)
+        rows = self._ego_rows(node, radius)
+        rank = self.rank[metric][rows]
+        if len(rows) > k:
+            keep = np.argpartition(rank, k)[:k]
+            rows, rank = rows[keep], rank[keep]
+        return self._frame(rows[np.argsort(rank)], metric)
+
+# ---------- HTTP endpoint ----------
+
+def _records(df):
+    return json.loads(df.to_json(orient='records'))
+
+def make_handler(index):
+    def parse_node(value):
+        # anything that is not an integer is looked up as is and reported as an unknown node
+        return int(value) if index.nodes.dtype.kind in 'iu' and value.lstrip('-').isdigit() else value
+
+    def parse_community(value):
+        if value is None:
+            return None
+        return int(value) if index.has_communities and index.community.dtype.kind in 'iuf' else value
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = {key: vals[0] for key, vals in parse_qs(url.query).items()}
+            try:
+                metric = q.get('metric', 'pagerank')
+                k = int(q.get('k', 10))
+                if url.path == '/top':
+                    body = _records(index.top(metric, k, community=parse_community(q.get('community'))))
+                elif url.path == '/ego':
+                    body = _records(index.ego(parse_node(q['node']), metric, k, radius=int(q.get('radius', 1))))
+                elif url.path == '/percentile':
+                    body = {'node': q['node'], 'metric': metric,
+                            'percentile': index.percentile(parse_node(q['node']), metric)}
+                elif url.path == '/metrics':
+                    body = index.metrics
+                else:
+                    return self._send(404, {'error': f'unknown path {url.path}'})
+            except (KeyError, ValueError) as e:
+                return self._send(400, {'error': str(e.args[0]) if e.args else str(e)})
+            self._send(200, body)
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve(index, host='127.0.0.1', port=8765):
+    """Serve /top, /ego, /percentile and /metrics as JSON until interrupted."""
+    server = ThreadingHTTPServer((host, port), make_handler(index))
+    print(f"Serving influencer index ({len(index)} nodes) on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main():
+    from csr_graph import read_graph
+    from metrics_io import read_node_metrics
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--outdir', required=True, help='directory holding node_metrics (Parquet or CSV)')
+    parser.add_argument('--graph', default=None, help='gpickle file or CSR graph directory (enables /ego)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    graph = read_graph(args.graph, as_networkx=False) if args.graph else None
+    serve(InfluencerIndex(read_node_metrics(args.outdir), graph=graph), host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""
+Background jobs for the dashboard.
+Streamlit reruns the whole script on every widget change, so long work is handed to a small
+thread pool that outlives the reruns. A job reports its stages through progress(), publishes
+intermediate results that the page can show before the job ends, and checks for cancellation
+between steps. Heavy steps go through Job.run, which forks a process (as the scheduler does for
+its stages) that cancel() kills, so a cancelled job stops inside closeness, Louvain, ... too and
+frees its pool slot; the job shows 'cancelling' until its thread has actually returned.
+"""
+import atexit
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import wait
+
+try:
+    from . import profiling
+    from .scheduler import _worker_pool
+except ImportError:
+    import profiling
+    from scheduler import _worker_pool
+
+STATUSES = ('queued', 'running', 'cancelling', 'done', 'failed', 'cancelled')
+# finished jobs kept for display; older ones are dropped
+MAX_FINISHED = 20
+# seconds a cancelled step process gets to exit on SIGTERM before it is killed
+KILL_TIMEOUT = 2.0
+
+class Cancelled(BaseException):
+    """
+    Raised inside a job at its next progress() or check() once cancel() was requested.
+    A BaseException, like KeyboardInterrupt, so `except Exception` fallbacks do not swallow it.
+    """
+
+class Job:
+    def __init__(self, job_id, name):
+        self.id = job_id
+        self.name = name
+        self.status = 'queued'
+        self.stage = None
+        self.events = []  # (seconds since submit, stage, message)
+        self.results = {}
+        self.error = None
+        self.version = 0  # bumped on every change, so pollers know when to redraw
+        self.submitted = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._future = None
+        self._proc = None  # the forked process of the step being run, if any
+        self._conn = None  # set in that process: send() writes to the parent
+        self._on_message = None
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def elapsed(self):
+        return (self.finished or time.time()) - self.submitted
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def progress(self, stage, message=''):
+        """Record a step; raises Cancelled if the job was cancelled meanwhile."""
+        self.check()
+        with self._lock:
+            self.stage = stage
+            self.events.append((time.time() - self.submitted, stage, message))
+            self.version += 1
+
+    def publish(self, key, value):
+        """Make a (possibly partial) result visible to the page while the job keeps running."""
+        with self._lock:
+            self.results[key] = value
+            self.version += 1
+
+    def send(self, value):
+        """From inside a Job.run step: hand `value` to the step's on_message callback in the job's thread."""
+        if self._conn is not None:
+            self._conn.send(('message', value))
+        elif self._on_message is not None:
+            self._on_message(value)
+
+    def run(self, fn, *args, on_message=None, **kwargs):
+        """
+        Run the step fn(*args, **kwargs) in a forked process and return its result; an exception
+        it raises is raised here. cancel() kills the process and this raises Cancelled. Values the
+        step passes to job.send() reach on_message(value) here while it runs. The step works on a
+        copy of the parent's memory: changes to objects are lost unless returned or sent.
+        Without fork (Windows) the step runs in this thread and is only cancelled at progress()/check().
+        """
+        self.check()
+        ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else None
+        if ctx is None:
+            self._on_message = on_message
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._on_message = None
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        # not a daemon, so the step can start joblib workers itself
+        proc = ctx.Process(target=_step, args=(self, child_conn, fn, args, kwargs),
+                           name=f'job-{self.id}', daemon=False)
+        proc.start()
+        child_conn.close()
+        # cancel() sets the flag before it looks for the process, so one of the two sides kills it
+        with self._lock:
+            self._proc = proc
+        if self._cancel.is_set():
+            _kill(proc, signal.SIGTERM)
+        returned = False
+        try:
+            while True:
+                if not wait([parent_conn], timeout=KILL_TIMEOUT):
+                    if self._cancel.is_set():
+                        _kill(proc, signal.SIGKILL)
+                    continue
+                try:
+                    kind, payload = parent_conn.recv()
+                except (EOFError, OSError):
+                    self.check()
+                    raise RuntimeError(f"job step exited with code {proc.exitcode}") from None
+                if kind == 'message':
+                    if on_message is not None:
+                        on_message(payload)
+                    continue
+                returned = True
+                value, records = payload
+                profiling.PROFILER.records.extend(records)
+                if kind == 'error':
+                    raise value
+                return value
+        finally:
+            with self._lock:
+                self._proc = None
+            parent_conn.close()
+            if not returned:
+                _kill(proc, signal.SIGTERM)
+            proc.join(KILL_TIMEOUT)
+            if proc.is_alive():
+                _kill(proc, signal.SIGKILL)
+                proc.join()
+
+    def cancel(self):
+        """Request cancellation; a running step process is killed, the status is 'cancelling' until the job returns."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self._finish('cancelled')
+            return
+        with self._lock:
+            if self.status == 'running':
+                self.status = 'cancelling'
+                self.version += 1
+            if self._proc is not None:
+                _kill(self._proc, signal.SIGTERM)
+
+    def _finish(self, status, error=None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished = time.time()
+            self.version += 1
+
+class JobRunner:
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # kill running steps at exit, which would otherwise wait for them
+        atexit.register(self.shutdown)
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Run fn(job, *args, **kwargs) in the pool; returns the Job right away."""
+        with self._lock:
+            job = Job(next(self._ids), name)
+            self._jobs[job.id] = job
+            finished = [j for j in self._jobs.values() if j.done]
+            for old in finished[:max(0, len(finished) - MAX_FINISHED)]:
+                del self._jobs[old.id]
+        job._future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+    def _run(self, job, fn, args, kwargs):
+        with job._lock:
+            started = not job.cancel_requested
+            if started:
+                job.status = 'running'
+        if not started:
+            job._finish('cancelled')
+            return
+        try:
+            fn(job, *args, **kwargs)
+        except Cancelled:
+            job._finish('cancelled')
+        except Exception:
+            job._finish('failed', traceback.format_exc())
+        else:
+            job._finish('done')
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job in self.jobs():
+                job.cancel()
+        self._pool.shutdown(wait=False)
+
+def _kill(proc, sig):
+    # the step leads its own process group, so this reaches the workers it started too
+    try:
+        os.killpg(proc.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+def _step(job, conn, fn, args, kwargs):
+    os.setpgrp()
+    profiling.PROFILER.records = []
+    _worker_pool(reset=True)
+    job._conn = conn
+    try:
+        try:
+            payload = ('result', (fn(*args, **kwargs), profiling.PROFILER.records))
+        except BaseException as e:
+            payload = ('error', (e, profiling.PROFILER.records))
+        try:
+            conn.send(payload)
+        except Exception:
+            # an unpicklable result or exception
+            conn.send(('error', (RuntimeError(traceback.format_exc()), profiling.PROFILER.records)))
+    finally:
+        conn.close()
+        pool = _worker_pool()
+        if pool is not None:
+            getattr(pool, 'terminate', pool.shutdown)(kill_workers=True)
+        os._exit(0)
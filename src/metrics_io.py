@@ -0,0 +1,147 @@
+"""
+Node-metric and community-summary tables on disk.
+CSV is the default, for tools that want plain text. Parquet (opt-in) keeps typed columns, stores
+the community column dictionary-encoded and sorts rows by community, so every row group covers a
+narrow range of communities and readers load only the columns they ask for.
+An update can write just its changed rows as delta files next to a table (node_metrics.delta-00001.parquet,
+...); read_table merges them in order by the table's key column.
+"""
+import glob
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = pq = None
+
+FORMATS = ('parquet', 'csv')
+NODE_METRICS = 'node_metrics'
+COMMUNITY_SUMMARY = 'community_summary'
+ROW_GROUP_SIZE = 128 * 1024
+# the column delta rows are matched on
+TABLE_KEYS = {NODE_METRICS: 'node', COMMUNITY_SUMMARY: 'community'}
+# once this many deltas have piled up, or one update changes this fraction of the rows, the table is rewritten
+MAX_DELTAS = 8
+DELTA_MAX_FRACTION = 0.25
+
+def node_table(nodes, partition, centralities):
+    """One column per metric, aligned to `nodes`; nodes missing from the partition get community -1."""
+    index = pd.Index(list(nodes))
+    df = pd.DataFrame({'node': index})
+    df['community'] = pd.Series(partition, dtype=object).reindex(index).fillna(-1).to_numpy(dtype=np.int64)
+    for name, values in centralities.items():
+        df[name] = pd.Series(values, dtype=np.float64).reindex(index).to_numpy()
+    return df
+
+def community_summary(df):
+    """Size, mean degree and mean PageRank per community, straight from the in-memory node table."""
+    means = {c: 'mean' for c in ('degree', 'pagerank') if c in df.columns}
+    return df.groupby('community').agg({'node': 'count', **means}).rename(columns={'node': 'size'})
+
+def table_path(outdir, name):
+    """Path of an existing table (Parquet preferred over CSV), or None."""
+    for fmt in FORMATS:
+        path = os.path.join(outdir, f'{name}.{fmt}')
+        if os.path.exists(path):
+            return path
+    return None
+
+def table_deltas(outdir, name):
+    """Delta files of a table, oldest first, in the format of its base file."""
+    path = table_path(outdir, name)
+    if path is None:
+        return []
+    return sorted(glob.glob(os.path.join(outdir, f'{name}.delta-*{os.path.splitext(path)[1]}')))
+
+def table_version(outdir, name):
+    """(path, mtime) of a table and each of its deltas, e.g. as a cache key; None if there is no table."""
+    path = table_path(outdir, name)
+    if path is None:
+        return None
+    return tuple((p, os.path.getmtime(p)) for p in [path] + table_deltas(outdir, name))
+
+def write_table(df, outdir, name, fmt='csv'):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported table format: {fmt}")
+    os.makedirs(outdir, exist_ok=True)
+    path = os.path.join(outdir, f'{name}.{fmt}')
+    # drop a stale copy in the other format, and any deltas, so readers never pick up old results
+    for stale in glob.glob(os.path.join(outdir, f'{name}.delta-*')):
+        os.remove(stale)
+    for other in FORMATS:
+        stale = os.path.join(outdir, f'{name}.{other}')
+        if other != fmt and os.path.exists(stale):
+            os.remove(stale)
+    return _write(df, path, fmt)
+
+def _write(df, path, fmt):
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+        return path
+    if pq is None:
+        raise ImportError("pyarrow is required for Parquet output.")
+    dictionary = []
+    if 'community' in df.columns:
+        df = df.sort_values('community', kind='stable')
+        dictionary = ['community']
+    # only the community column repeats enough to benefit from dictionary pages; metrics stay plain
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=ROW_GROUP_SIZE,
+                   use_dictionary=dictionary)
+    return path
+
+def update_table(table, delta, outdir, name):
+    """
+    Write `delta`, the changed rows of `table`, as the table's next delta file in the format on disk;
+    the full `table` is written instead, dropping the deltas, once they have piled up.
+    Returns the path written.
+    """
+    path = table_path(outdir, name)
+    fmt = os.path.splitext(path)[1][1:] if path else 'csv'
+    deltas = table_deltas(outdir, name)
+    if path is None or len(deltas) >= MAX_DELTAS or len(delta) > DELTA_MAX_FRACTION * len(table):
+        return write_table(table, outdir, name, fmt)
+    last = int(deltas[-1].rsplit('-', 1)[1].split('.')[0]) if deltas else 0
+    return _write(delta, os.path.join(outdir, f'{name}.delta-{last + 1:05d}.{fmt}'), fmt)
+
+def _read(path, columns):
+    if path.endswith('.csv'):
+        return pd.read_csv(path, usecols=columns)
+    if pq is None:
+        raise ImportError("pyarrow is required to read Parquet output.")
+    return pq.read_table(path, columns=columns).to_pandas()
+
+def read_table(outdir, name, columns=None):
+    """Read a table written by write_table, with its deltas merged in; only `columns` are loaded when given."""
+    path = table_path(outdir, name)
+    if path is None:
+        raise FileNotFoundError(f"No {name}.parquet or {name}.csv in {outdir}")
+    deltas = table_deltas(outdir, name)
+    key = TABLE_KEYS.get(name)
+    load = columns if columns is None or key in columns or not deltas else list(columns) + [key]
+    df = _read(path, load)
+    for delta in deltas:
+        rows = _read(delta, load)[df.columns]
+        at = pd.Index(df[key]).get_indexer(rows[key])
+        found = at >= 0
+        # later rows replace earlier ones with the same key; new keys are appended
+        for col in df.columns:
+            df.loc[at[found], col] = rows[col].to_numpy()[found]
+        df = pd.concat([df, rows[~found]], ignore_index=True)
+    return df if load is columns else df[columns]
+
+def write_node_metrics(df, outdir, fmt='csv'):
+    return write_table(df, outdir, NODE_METRICS, fmt)
+
+def read_node_metrics(outdir, columns=None):
+    return read_table(outdir, NODE_METRICS, columns=columns)
+
+def write_community_summary(summary, outdir, fmt='csv'):
+    return write_table(summary.reset_index(), outdir, COMMUNITY_SUMMARY, fmt)
+
+def read_community_summary(outdir):
+    df = read_table(outdir, COMMUNITY_SUMMARY)
+    # a delta marks a community that lost all its members with size 0
+    return df[df['size'] > 0].set_index('community')
@@ -0,0 +1,362 @@
+"""
+Out-of-core analysis for edge lists that do not fit in memory.
+The edge CSV is streamed three times: once to collect the node IDs, once to count the edges per
+source node, and once to encode the edges and spill them, partitioned into source-node ranges of
+about equal edge counts, to on-disk runs. Every run is then sorted and its
+duplicate edges summed into a shard of .npy arrays. Degree, PageRank and connected components
+are computed by streaming over the memory-mapped shards block by block, so only per-node
+vectors and one block of edges are held in memory. CSV chunk, shard and block sizes all follow
+from the memory budget.
+
+    python src/out_of_core.py --input edges.csv --workdir /scratch/shards --outdir outputs --memory_mb 2048
+
+The node table has analysis.py's node_metrics schema (node, community, degree, pagerank) plus component;
+no community detection runs out of core, so every community is -1 (unassigned).
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import time
+import numpy as np
+import networkx as nx
+import pandas as pd
+from metrics_io import FORMATS, write_node_metrics
+import profiling
+
+FORMAT_NAME = 'edge-shards'
+FORMAT_VERSION = 1
+# bytes per CSV row while pandas parses a chunk (object columns, intermediate copies)
+_PARSE_BYTES_PER_ROW = 256
+# bytes per edge while a block is processed (three edge arrays plus a few temporaries)
+_BLOCK_BYTES_PER_EDGE = 96
+# bytes per edge while a run is sorted into a shard (record, key, order, aggregated output)
+_SORT_BYTES_PER_EDGE = 80
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def budget(memory_mb, n_nodes=0):
+    """
+    Split a memory budget into CSV chunk rows, streaming block edges and shard edges.
+    Half of it is reserved for the per-node vectors (about 64 bytes per node) and node table.
+    """
+    avail = max(memory_mb * 1024 ** 2 // 2 - n_nodes * 64, 16 * 1024 ** 2)
+    return {
+        'chunk_rows': int(max(10000, avail // _PARSE_BYTES_PER_ROW)),
+        'block_edges': int(max(10000, avail // _BLOCK_BYTES_PER_EDGE)),
+        'shard_edges': int(max(10000, avail // _SORT_BYTES_PER_EDGE)),
+    }
+
+def _read_chunks(edge_csv, chunk_rows, weight_col, id_dtype=None):
+    usecols = lambda c: c in ('source', 'target', weight_col)
+    dtype = {'source': id_dtype, 'target': id_dtype} if id_dtype is not None else None
+    for chunk in pd.read_csv(edge_csv, chunksize=chunk_rows, usecols=usecols, dtype=dtype):
+        if weight_col in chunk.columns:
+            w = chunk[weight_col].fillna(1).to_numpy(dtype=np.float64)
+        else:
+            w = np.ones(len(chunk), dtype=np.float64)
+        yield chunk['source'].to_numpy(), chunk['target'].to_numpy(), w
+
+ID_TYPES = ('auto', 'int', 'str')
+
+def collect_nodes(edge_csv, chunk_rows, weight_col='weight', id_type='auto'):
+    """
+    First pass: sorted unique node IDs, the row count and the ID dtype used for the second pass.
+    Integer IDs stay integers (as with graph_build); anything else is read as strings. With
+    id_type='auto' the dtype is guessed from the first rows, and the pass restarts with strings
+    if a later chunk holds an ID that does not parse as an integer.
+    """
+    if id_type == 'auto':
+        first = pd.read_csv(edge_csv, nrows=1000, usecols=['source', 'target'])
+        integer = all(pd.api.types.is_integer_dtype(first[c]) for c in ('source', 'target'))
+        if integer:
+            try:
+                return _collect(edge_csv, chunk_rows, weight_col, 'int64')
+            except (ValueError, OverflowError):
+                pass
+        return _collect(edge_csv, chunk_rows, weight_col, 'str')
+    if id_type not in ID_TYPES:
+        raise ValueError(f'id_type must be one of {ID_TYPES}, got {id_type!r}')
+    return _collect(edge_csv, chunk_rows, weight_col, 'int64' if id_type == 'int' else 'str')
+
+def _collect(edge_csv, chunk_rows, weight_col, id_dtype):
+    labels = np.empty(0, dtype=np.int64 if id_dtype == 'int64' else object)
+    rows = 0
+    for src, dst, _ in _read_chunks(edge_csv, chunk_rows, weight_col, id_dtype):
+        rows += len(src)
+        labels = np.union1d(labels, np.unique(np.concatenate([src, dst])))
+    return labels, rows, id_dtype
+
+def shard_bounds(counts, n_shards):
+    """
+    Source-node boundaries that split the edges into at most n_shards ranges of about equal edge counts
+    (edge-count quantiles of the per-node histogram). A node's edges always stay in one shard.
+    """
+    n = len(counts)
+    cum = np.cumsum(counts)
+    total = cum[-1] if n else 0
+    cuts = np.searchsorted(cum, total * np.arange(1, n_shards) / n_shards, side='left') + 1
+    return np.r_[0, np.unique(cuts[(cuts > 0) & (cuts < n)]), n].astype(np.int64)
+
+class EdgeShards:
+    """
+    Edges sorted by (source, target) with duplicates summed, stored as shards of .npy arrays.
+    Shard i holds the sources in [bounds[i], bounds[i+1]); undirected edges are stored once,
+    keyed on (min, max).
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT_NAME:
+            raise ValueError(f"{path} is not an {FORMAT_NAME} directory")
+        self.directed = meta['directed']
+        self.n_shards = meta['n_shards']
+        self.n_edges = meta['n_edges']
+        self.rows = meta['rows']
+        self.nodes = np.load(os.path.join(path, 'nodes.npy'), mmap_mode='r')
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return self.n_edges
+
+    def is_directed(self):
+        return self.directed
+
+    def _shard(self, i):
+        d = os.path.join(self.path, f'shard-{i:05d}')
+        return tuple(np.load(os.path.join(d, f'{name}.npy'), mmap_mode='r') for name in ('src', 'dst', 'weight'))
+
+    def blocks(self, block_edges):
+        """Yield (src, dst, weight) arrays of at most block_edges edges, in (source, target) order."""
+        for i in range(self.n_shards):
+            src, dst, w = self._shard(i)
+            for start in range(0, len(src), block_edges):
+                end = start + block_edges
+                yield np.asarray(src[start:end]), np.asarray(dst[start:end]), np.asarray(w[start:end])
+
+    @classmethod
+    def build(cls, edge_csv, path, directed=False, weight_col='weight', memory_mb=1024, id_type='auto'):
+        """Encode, externally sort and aggregate the edge CSV into shards under `path`."""
+        limits = budget(memory_mb)
+        with profiling.stage('out_of_core.collect_nodes'):
+            labels, rows, id_dtype = collect_nodes(edge_csv, limits['chunk_rows'], weight_col, id_type)
+        n = len(labels)
+        limits = budget(memory_mb, n)
+        idx = np.int32 if n < np.iinfo(np.int32).max else np.int64
+        record = np.dtype([('u', idx), ('v', idx), ('w', np.float64)])
+        index = pd.Index(labels) if labels.dtype == object else None
+
+        def encode(src, dst):
+            if index is None:
+                u, v = np.searchsorted(labels, src), np.searchsorted(labels, dst)
+            else:
+                u, v = index.get_indexer(src), index.get_indexer(dst)
+            if not directed:
+                u, v = np.minimum(u, v), np.maximum(u, v)
+            return u, v
+
+        # range-partition on the source so that shards concatenate in sorted order; the ranges are
+        # edge-count quantiles, so a few high-degree sources do not overflow a shard's sort budget
+        with profiling.stage('out_of_core.histogram', rows=rows):
+            counts = np.zeros(n, dtype=np.int64)
+            for src, dst, _ in _read_chunks(edge_csv, limits['chunk_rows'], weight_col, id_dtype):
+                counts += np.bincount(encode(src, dst)[0], minlength=n)
+        bounds = shard_bounds(counts, max(1, -(-rows // limits['shard_edges'])))
+        n_shards = len(bounds) - 1
+        del counts
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        # fixed-width strings, like CSRGraph's node table, so the IDs stay memory-mappable
+        np.save(os.path.join(path, 'nodes.npy'), labels if index is None else labels.astype(str))
+
+        with profiling.stage('out_of_core.spill', rows=rows, n_shards=n_shards):
+            runs = [open(os.path.join(path, f'run-{i:05d}.bin'), 'wb') for i in range(n_shards)]
+            try:
+                for src, dst, w in _read_chunks(edge_csv, limits['chunk_rows'], weight_col, id_dtype):
+                    u, v = encode(src, dst)
+                    shard = np.searchsorted(bounds, u, side='right') - 1
+                    order = np.argsort(shard, kind='stable')
+                    recs = np.empty(len(u), dtype=record)
+                    recs['u'], recs['v'], recs['w'] = u[order], v[order], w[order]
+                    cuts = np.searchsorted(shard[order], np.arange(n_shards + 1))
+                    for i in np.flatnonzero(np.diff(cuts)):
+                        runs[i].write(recs[cuts[i]:cuts[i + 1]].tobytes())
+            finally:
+                for f in runs:
+                    f.close()
+
+        n_edges = 0
+        with profiling.stage('out_of_core.sort_shards', n_shards=n_shards):
+            for i in range(n_shards):
+                run = os.path.join(path, f'run-{i:05d}.bin')
+                recs = np.fromfile(run, dtype=record)
+                key = recs['u'].astype(np.int64) * n + recs['v']
+                order = np.argsort(key, kind='stable')
+                key = key[order]
+                starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+                shard = os.path.join(path, f'shard-{i:05d}')
+                os.makedirs(shard)
+                np.save(os.path.join(shard, 'src.npy'), recs['u'][order][starts])
+                np.save(os.path.join(shard, 'dst.npy'), recs['v'][order][starts])
+                np.save(os.path.join(shard, 'weight.npy'), np.add.reduceat(recs['w'][order], starts)
+                        if len(starts) else np.empty(0))
+                n_edges += len(starts)
+                del recs, key, order
+                os.remove(run)
+
+        meta = {'format': FORMAT_NAME, 'version': FORMAT_VERSION, 'directed': bool(directed),
+                'n_nodes': n, 'n_edges': n_edges, 'n_shards': n_shards, 'rows': rows}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        return cls(path)
+
+def streaming_degree(shards, block_edges):
+    """Weighted degree (in + out for directed graphs; self-loops count twice), as G.degree(weight=...)."""
+    n = shards.number_of_nodes()
+    deg = np.zeros(n)
+    for u, v, w in shards.blocks(block_edges):
+        deg += np.bincount(u, w, minlength=n)
+        deg += np.bincount(v, w, minlength=n)
+    return deg
+
+def _out_weight(shards, block_edges):
+    n = shards.number_of_nodes()
+    out = np.zeros(n)
+    for u, v, w in shards.blocks(block_edges):
+        out += np.bincount(u, w, minlength=n)
+        if not shards.directed:
+            # the reverse direction of an undirected edge; a self-loop is a single edge
+            out += np.bincount(v, w * (u != v), minlength=n)
+    return out
+
+def streaming_pagerank(shards, block_edges, alpha=0.85, max_iter=100, tol=1e-06):
+    """Weighted PageRank (uniform teleport and dangling), one streaming pass over the shards per iteration."""
+    n = shards.number_of_nodes()
+    if n == 0:
+        return np.zeros(0)
+    out = _out_weight(shards, block_edges)
+    dangling = out == 0
+    inv_out = np.divide(1.0, out, out=np.zeros(n), where=~dangling)
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        xlast = x
+        share = x * inv_out
+        y = np.zeros(n)
+        for u, v, w in shards.blocks(block_edges):
+            y += np.bincount(v, share[u] * w, minlength=n)
+            if not shards.directed:
+                y += np.bincount(u, share[v] * w * (u != v), minlength=n)
+        x = alpha * (y + x[dangling].sum() / n) + (1 - alpha) / n
+        # check convergence, l1 norm
+        if np.abs(x - xlast).sum() < n * tol:
+            return x
+    raise nx.PowerIterationFailedConvergence(max_iter)
+
+def streaming_components(shards, block_edges):
+    """
+    Weakly connected component per node, numbered 0.. by decreasing size.
+    Union-find by min-label hooking and pointer jumping, one streaming pass per round.
+    """
+    n = shards.number_of_nodes()
+    parent = np.arange(n)
+    changed = True
+    while changed:
+        changed = False
+        for u, v, _ in shards.blocks(block_edges):
+            pu, pv = parent[u], parent[v]
+            lo, hi = np.minimum(pu, pv), np.maximum(pu, pv)
+            hook = lo < hi
+            if hook.any():
+                np.minimum.at(parent, hi[hook], lo[hook])
+                changed = True
+            # pointer jumping keeps the trees flat between blocks
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    break
+                parent = grand
+    _, comp, sizes = np.unique(parent, return_inverse=True, return_counts=True)
+    rank = np.empty(len(sizes), dtype=np.int64)
+    rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+    return rank[comp.ravel()]
+
+def analyze(edge_csv, workdir, directed=False, weight_col='weight', memory_mb=1024, pagerank_tol=1e-6,
+            reuse_shards=False, id_type='auto'):
+    """Build (or reuse) the shards and return (node_metrics DataFrame, report dict)."""
+    t0 = time.perf_counter()
+    shard_dir = os.path.join(workdir, 'shards')
+    if reuse_shards and os.path.exists(os.path.join(shard_dir, 'meta.json')):
+        shards = EdgeShards(shard_dir)
+    else:
+        shards = EdgeShards.build(edge_csv, shard_dir, directed=directed, weight_col=weight_col, memory_mb=memory_mb,
+                                   id_type=id_type)
+    t_build = time.perf_counter() - t0
+    block_edges = budget(memory_mb, shards.number_of_nodes())['block_edges']
+
+    timings = {}
+    results = {}
+    for name, fn in (('degree', lambda: streaming_degree(shards, block_edges)),
+                     ('pagerank', lambda: streaming_pagerank(shards, block_edges, tol=pagerank_tol)),
+                     ('component', lambda: streaming_components(shards, block_edges))):
+        t = time.perf_counter()
+        with profiling.stage(f'out_of_core.{name}', graph=shards):
+            results[name] = fn()
+        timings[name] = time.perf_counter() - t
+
+    # same columns as analysis.py's node_metrics, so the dashboard and the other readers load it as is
+    df = pd.DataFrame({'node': shards.nodes, 'community': np.full(shards.number_of_nodes(), -1, dtype=np.int64),
+                       **results})
+    report = {
+        'rows': shards.rows,
+        'nodes': shards.number_of_nodes(),
+        'edges': shards.number_of_edges(),
+        'shards': shards.n_shards,
+        'components': int(df['component'].max() + 1) if len(df) else 0,
+        'memory_budget_mb': memory_mb,
+        'peak_rss_mb': peak_rss_mb(),
+        'seconds': {'shards': t_build, **timings},
+    }
+    return df, report
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', required=True, help='edge CSV (source,target[,weight])')
+    parser.add_argument('--workdir', required=True, help='scratch directory for the on-disk shards')
+    parser.add_argument('--outdir', required=True)
+    parser.add_argument('--directed', action='store_true')
+    parser.add_argument('--memory_mb', type=int, default=1024, help='memory budget for chunks, shards and blocks')
+    parser.add_argument('--pagerank_tol', type=float, default=1e-6)
+    parser.add_argument('--format', choices=FORMATS, default='csv')
+    parser.add_argument('--id_type', choices=ID_TYPES, default='auto',
+                        help="node ID type; 'auto' reads integers and falls back to strings")
+    parser.add_argument('--reuse_shards', action='store_true', help='skip the sort if the workdir already has shards')
+    parser.add_argument('--profile', nargs='?', const=profiling.DEFAULT_DIR, default=None, metavar='DIR',
+                        help='record per-stage timings and memory; writes trace.json and stages.csv to DIR')
+    args = parser.parse_args()
+    if args.profile:
+        profiling.enable(output_dir=args.profile)
+
+    df, report = analyze(args.input, args.workdir, directed=args.directed, memory_mb=args.memory_mb,
+                         pagerank_tol=args.pagerank_tol, reuse_shards=args.reuse_shards, id_type=args.id_type)
+    path = write_node_metrics(df, args.outdir, fmt=args.format)
+    report['peak_rss_mb'] = peak_rss_mb()
+    with open(os.path.join(args.outdir, 'out_of_core_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{report['nodes']} nodes, {report['edges']} edges in {report['shards']} shard(s), "
+          f"{report['components']} components")
+    print('Stage seconds:', {k: round(v, 2) for k, v in report['seconds'].items()})
+    print(f"Peak memory: {report['peak_rss_mb']:.0f} MB (budget {args.memory_mb} MB)")
+    if args.profile:
+        print(profiling.PROFILER.summary().to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+        print('Profile written to', profiling.PROFILER.write())
+    print('Node metrics written to', path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Stage-level instrumentation for the pipeline.
+Pipeline functions are wrapped with @profiled (or a `with stage(...)` block). While profiling is
+off the wrapper costs one attribute check. When it is on, each stage records wall and CPU time,
+peak memory (RSS sampled every 10 ms, or tracemalloc) and the size of the graph going in and
+coming out. The timeline can be exported as a Chrome trace (chrome://tracing, ui.perfetto.dev)
+and every outermost stage can optionally be dumped as a cProfile file.
+
+Turn it on with `--profile` on the command-line tools, or for any process with the environment
+variable NETWORK_PROFILE=1 (NETWORK_PROFILE=cprofile adds the cProfile dumps, NETWORK_PROFILE_DIR
+sets the output directory); the trace is then written when the process exits.
+"""
+import atexit
+import cProfile
+import functools
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+ENV_VAR = 'NETWORK_PROFILE'
+ENV_DIR = 'NETWORK_PROFILE_DIR'
+DEFAULT_DIR = 'profile'
+MEMORY_MODES = ('rss', 'tracemalloc')
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return 0.0
+
+def _graph_size(obj):
+    """(nodes, edges) of a graph-like object, (len, None) of a sized container, else None."""
+    if hasattr(obj, 'number_of_nodes') and hasattr(obj, 'number_of_edges'):
+        return obj.number_of_nodes(), obj.number_of_edges()
+    if isinstance(obj, (dict, list)):
+        return len(obj), None
+    if isinstance(obj, tuple) and obj:
+        return _graph_size(obj[0])
+    return None
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+        self.output_dir = DEFAULT_DIR
+        self.cprofile = False
+        self.memory = 'rss'
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._open = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def enable(self, output_dir=None, cprofile=False, memory='rss', interval=0.01):
+        if memory not in MEMORY_MODES:
+            raise ValueError(f"Unsupported memory mode: {memory}")
+        self.output_dir = output_dir or self.output_dir
+        self.cprofile = cprofile
+        self.memory = memory
+        if memory == 'tracemalloc' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if memory == 'rss' and self._sampler is None:
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, args=(interval,), daemon=True)
+            self._sampler.start()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def reset(self):
+        self.records = []
+        self._origin = time.perf_counter()
+
+    def _sample(self, interval):
+        while not self._stop.wait(interval):
+            rss = _rss_mb()
+            with self._lock:
+                for rec in self._open:
+                    rec['_peak'] = max(rec['_peak'], rss)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name, graph=None, **attrs):
+        if not self.enabled:
+            yield {}
+            return
+        stack = self._stack()
+        rec = {'name': name, 'depth': len(stack), **attrs}
+        size = _graph_size(graph) if graph is not None else None
+        if size is not None:
+            rec['nodes_in'], rec['edges_in'] = size
+        if self.memory == 'tracemalloc':
+            start_mem = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        else:
+            start_mem = rec['_peak'] = _rss_mb()
+            with self._lock:
+                self._open.append(rec)
+        prof = None
+        if self.cprofile and not stack:
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:
+                prof = None  # another thread's stage is already being profiled
+        stack.append(rec)
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield rec
+        finally:
+            wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+            if prof is not None:
+                prof.disable()
+            stack.pop()
+            if self.memory == 'tracemalloc':
+                peak = tracemalloc.get_traced_memory()[1]
+                rec['peak_mb'] = max(peak - start_mem, rec.pop('_child_peak', 0)) / 1024 ** 2
+                if stack:
+                    # reset_peak in this stage hid the parent's peak so far; hand ours up
+                    stack[-1]['_child_peak'] = max(stack[-1].get('_child_peak', 0), peak - start_mem)
+            else:
+                with self._lock:
+                    self._open.remove(rec)
+                rec['peak_mb'] = max(rec.pop('_peak'), _rss_mb()) - start_mem
+            rec.update(start=t0 - self._origin, wall=wall, cpu=cpu, pid=os.getpid(), tid=threading.get_ident())
+            if prof is not None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+                rec['cprofile'] = os.path.join(self.output_dir, f'{len(self.records):04d}-{slug}.prof')
+                prof.dump_stats(rec['cprofile'])
+            self.records.append(rec)
+
+    def summary(self):
+        """Per-stage totals as a DataFrame sorted by wall time."""
+        import pandas as pd
+        cols = ['stage', 'calls', 'wall', 'cpu', 'peak_mb', 'nodes_in', 'edges_in', 'nodes_out', 'edges_out']
+        if not self.records:
+            return pd.DataFrame(columns=cols)
+        df = pd.DataFrame(self.records).reindex(columns=['name'] + cols[2:])
+        out = df.groupby('name', sort=False).agg(calls=('wall', 'size'), wall=('wall', 'sum'), cpu=('cpu', 'sum'),
+                                                 peak_mb=('peak_mb', 'max'), nodes_in=('nodes_in', 'max'),
+                                                 edges_in=('edges_in', 'max'), nodes_out=('nodes_out', 'max'),
+                                                 edges_out=('edges_out', 'max'))
+        out = out.astype({c: 'Int64' for c in cols[5:]})
+        return out.rename_axis('stage').reset_index().sort_values('wall', ascending=False, ignore_index=True)
+
+    def chrome_trace(self):
+        """The recorded stages as Chrome trace-event JSON (complete events, microseconds)."""
+        events = []
+        for rec in self.records:
+            args = {k: v for k, v in rec.items() if k not in ('name', 'start', 'wall', 'pid', 'tid', 'depth')}
+            events.append({'name': rec['name'], 'cat': rec['name'].split('.')[0], 'ph': 'X',
+                           'ts': rec['start'] * 1e6, 'dur': rec['wall'] * 1e6,
+                           'pid': rec['pid'], 'tid': rec['tid'], 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, output_dir=None):
+        """Write trace.json (Chrome trace) and stages.csv into output_dir; return the trace path."""
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, 'trace.json')
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        self.summary().to_csv(os.path.join(output_dir, 'stages.csv'), index=False)
+        return path
+
+PROFILER = Profiler()
+
+def stage(name, graph=None, **attrs):
+    """Context manager recording one stage; yields a dict where output sizes can be added."""
+    return PROFILER.stage(name, graph=graph, **attrs)
+
+def profiled(name=None):
+    """Decorator recording every call as a stage; the first graph-like argument is the input size."""
+    def decorate(fn):
+        label = name or f"{fn.__module__.split('.')[-1]}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+            graph = next((a for a in args if hasattr(a, 'number_of_nodes')), None)
+            if graph is None:
+                graph = getattr(args[0], 'G', None) if args else None  # methods of GraphAnalyzer
+            with PROFILER.stage(label, graph=graph) as rec:
+                result = fn(*args, **kwargs)
+                size = _graph_size(result)
+                if size is not None:
+                    rec['nodes_out'], rec['edges_out'] = size
+                return result
+        return wrapper
+    return decorate
+
+def enable(output_dir=None, cprofile=False, memory='rss'):
+    PROFILER.enable(output_dir=output_dir, cprofile=cprofile, memory=memory)
+
+def enabled():
+    return PROFILER.enabled
+
+def _from_environment():
+    value = os.environ.get(ENV_VAR, '').strip().lower()
+    if value in ('', '0', 'false', 'no', 'off'):
+        return
+    enable(output_dir=os.environ.get(ENV_DIR, DEFAULT_DIR), cprofile=value == 'cprofile',
+           memory='tracemalloc' if value == 'tracemalloc' else 'rss')
+
+    @atexit.register
+    def _write():
+        if PROFILER.records:
+            print('Profile written to', PROFILER.write())
+
+_from_environment()
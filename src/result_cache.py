@@ -0,0 +1,120 @@
+"""
+Disk-backed, content-addressed cache for pipeline stage results.
+Entries are keyed by a fingerprint of the graph's edges plus the stage parameters and stored
+as one pickle per entry; the total size is bounded with least-recently-used eviction
+(file mtime serves as the access time, so several processes can share one cache directory).
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import numpy as np
+
+try:
+    from .csr_graph import CSRGraph
+except ImportError:
+    from csr_graph import CSRGraph
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'results')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+_MISSING = object()
+
+def graph_fingerprint(G):
+    """Hash of the node table and weighted edges (in graph order) of a NetworkX graph or CSRGraph."""
+    csr = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(b'directed' if csr.is_directed() else b'undirected')
+    h.update(np.ascontiguousarray(csr.indptr, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(csr.indices, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(csr.weights, dtype=np.float64).tobytes())
+    h.update('\x00'.join(map(str, csr.nodes.tolist())).encode('utf-8'))
+    return h.hexdigest()
+
+class ResultCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, stage, fingerprint, params=None):
+        payload = json.dumps({'stage': stage, 'graph': fingerprint, 'params': params or {}},
+                             sort_keys=True, default=str)
+        return f"{stage}-{hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()}"
+
+    def _path(self, key):
+        return os.path.join(self.root, f'{key}.pkl')
+
+    def get(self, stage, fingerprint, params=None, default=None):
+        path = self._path(self.key(stage, fingerprint, params))
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+        self.hits += 1
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def put(self, stage, fingerprint, params, value):
+        path = self._path(self.key(stage, fingerprint, params))
+        # write to a temp file and rename so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+        return value
+
+    def get_or_compute(self, stage, fingerprint, params, fn):
+        value = self.get(stage, fingerprint, params, default=_MISSING)
+        if value is _MISSING:
+            value = self.put(stage, fingerprint, params, fn())
+        return value
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith('.pkl'):
+                try:
+                    st = os.stat(os.path.join(self.root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, name in self._entries():
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+        }
@@ -0,0 +1,187 @@
+"""
+Dependency-graph scheduler for pipeline stages.
+Every stage runs in its own forked process, so independent stages (Louvain, PageRank,
+betweenness, ...) run side by side over the parent's graph, shared copy-on-write rather than
+pickled. A stage that raises, crashes or runs past its timeout is reported as failed and only
+the stages depending on it are skipped. With a ResultCache as checkpoint, each finished stage
+is stored as soon as it completes and a rerun picks up where the last one stopped.
+"""
+import multiprocessing as mp
+import os
+import sys
+import time
+import traceback
+from multiprocessing.connection import wait
+
+try:
+    from . import profiling
+except ImportError:
+    import profiling
+
+STATUSES = ('done', 'cached', 'failed', 'timeout', 'skipped')
+# seconds a stage process may take to exit after sending its result before it is terminated
+JOIN_TIMEOUT = 5.0
+_MISSING = object()
+
+class Stage:
+    def __init__(self, name, fn, deps=(), params=None, timeout=None):
+        """
+        fn is called with the results of `deps` as keyword arguments. `params` (JSON-able)
+        identify the result in the checkpoint; `timeout` is in seconds.
+        """
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.params = params or {}
+        self.timeout = timeout
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, deps={list(self.deps)})"
+
+def _check(stages):
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names: {names}")
+    known = set(names)
+    for s in stages:
+        missing = set(s.deps) - known
+        if missing:
+            raise ValueError(f"Stage {s.name} depends on unknown stage(s): {sorted(missing)}")
+    # Kahn's algorithm, only to reject cycles up front
+    indegree = {s.name: len(s.deps) for s in stages}
+    ready = [n for n, d in indegree.items() if d == 0]
+    seen = 0
+    while ready:
+        name = ready.pop()
+        seen += 1
+        for s in stages:
+            if name in s.deps:
+                indegree[s.name] -= 1
+                if indegree[s.name] == 0:
+                    ready.append(s.name)
+    if seen != len(stages):
+        raise ValueError("Stage dependencies contain a cycle")
+
+def _worker_pool(reset=False):
+    """
+    joblib's reusable process pool (loky), if one was started; it outlives Parallel() calls.
+    reset=True forgets a pool inherited through fork, whose management threads did not survive it.
+    """
+    loky = sys.modules.get('joblib.externals.loky.reusable_executor')
+    if loky is None:
+        return None
+    if reset:
+        loky._executor = loky._executor_kwargs = None
+    return loky._executor
+
+def _child(stage, inputs, conn):
+    # records from the parent are already in its own trace; keep only this stage's
+    profiling.PROFILER.records = []
+    _worker_pool(reset=True)
+    try:
+        result = stage.fn(**inputs)
+        conn.send(('ok', result, profiling.PROFILER.records))
+    except BaseException:
+        conn.send(('error', traceback.format_exc(), profiling.PROFILER.records))
+    finally:
+        conn.close()
+        # stop the workers a stage started (e.g. for betweenness), then skip the exit handlers,
+        # which would otherwise wait on such persistent pools and never return
+        pool = _worker_pool()
+        if pool is not None:
+            # joblib's executor also removes its memmapping folder on terminate()
+            getattr(pool, 'terminate', pool.shutdown)(kill_workers=True)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(0)
+
+def run_stages(stages, max_workers=None, checkpoint=None, fingerprint=None, log=print):
+    """
+    Run the stages in dependency order, at most max_workers at a time (default: CPU count).
+    Returns (results, report): results maps each finished stage to its value, report maps
+    every stage to {'status', 'seconds', 'error'}. checkpoint is a ResultCache keyed by the
+    graph fingerprint and each stage's params.
+    """
+    _check(stages)
+    max_workers = max_workers or os.cpu_count() or 1
+    by_name = {s.name: s for s in stages}
+    results, report = {}, {}
+    pending = list(stages)
+    running = {}  # conn -> (stage, process, start)
+    ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else None
+
+    def finish(stage, status, seconds=0.0, error=None, value=None):
+        report[stage.name] = {'status': status, 'seconds': seconds, 'error': error}
+        if status in ('done', 'cached'):
+            results[stage.name] = value
+            if status == 'done' and checkpoint is not None:
+                checkpoint.put(stage.name, fingerprint, stage.params, value)
+        if log is not None:
+            detail = f" ({error.strip().splitlines()[-1]})" if error else ''
+            log(f"[{status}] {stage.name} {seconds:.2f}s{detail}")
+
+    while pending or running:
+        for stage in list(pending):
+            states = [report.get(d, {}).get('status') for d in stage.deps]
+            if any(s in ('failed', 'timeout', 'skipped') for s in states):
+                pending.remove(stage)
+                finish(stage, 'skipped', error=f"dependency failed: {', '.join(stage.deps)}")
+                continue
+            if any(s is None for s in states) or len(running) >= max_workers:
+                continue
+            pending.remove(stage)
+            if checkpoint is not None:
+                value = checkpoint.get(stage.name, fingerprint, stage.params, default=_MISSING)
+                if value is not _MISSING:
+                    finish(stage, 'cached', value=value)
+                    continue
+            inputs = {d: results[d] for d in stage.deps}
+            start = time.perf_counter()
+            if ctx is None:
+                # no fork on this platform: run in-process, timeouts are not enforced
+                try:
+                    value = stage.fn(**inputs)
+                except Exception:
+                    finish(stage, 'failed', time.perf_counter() - start, traceback.format_exc())
+                else:
+                    finish(stage, 'done', time.perf_counter() - start, value=value)
+                continue
+            parent_conn, child_conn = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_child, args=(stage, inputs, child_conn), name=f'stage-{stage.name}', daemon=False)
+            proc.start()
+            child_conn.close()
+            running[parent_conn] = (stage, proc, start)
+        if not running:
+            continue
+
+        now = time.perf_counter()
+        deadlines = [start + stage.timeout - now for stage, _, start in running.values() if stage.timeout]
+        ready = wait(list(running), timeout=max(min(deadlines), 0) if deadlines else None)
+        for conn in ready:
+            stage, proc, start = running.pop(conn)
+            try:
+                kind, payload, records = conn.recv()
+            except (EOFError, OSError):
+                kind, payload, records = 'crashed', None, []
+            conn.close()
+            proc.join(JOIN_TIMEOUT)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join()
+            if kind == 'crashed':
+                payload = f"process exited with code {proc.exitcode}\n"
+            profiling.PROFILER.records.extend(records)
+            if kind == 'ok':
+                finish(stage, 'done', time.perf_counter() - start, value=payload)
+            else:
+                finish(stage, 'failed', time.perf_counter() - start, payload)
+        now = time.perf_counter()
+        for conn, (stage, proc, start) in list(running.items()):
+            if stage.timeout and now - start >= stage.timeout:
+                del running[conn]
+                proc.terminate()
+                proc.join()
+                conn.close()
+                finish(stage, 'timeout', now - start, f"exceeded {stage.timeout:g}s timeout\n")
+
+    return results, {name: report[name] for name in by_name}
@@ -1,40 +1,230 @@
-from pyvis.network import Network
+"""
+Network rendering with vis-network (the library behind PyVis) and Plotly.
+Large graphs are shown level by level: the community supergraph (one node per community,
+aggregated edge weights) on top, and the subgraph of a single community on drill-down.
+Layouts are computed server-side with numpy and embedded as fixed coordinates with physics
+turned off, so the browser only draws; each level is a plain dict of DataFrames that callers cache.
+"""
+import json
 import networkx as nx
+import numpy as np
 import plotly.express as px
 import pandas as pd
 import os
 
-def create_pyvis_network(G, partition=None, output_path='network.html', notebook=False, max_nodes=1000):
+try:
+    from .csr_graph import CSRGraph
+    from .profiling import profiled
+except ImportError:
+    from csr_graph import CSRGraph
+    from profiling import profiled
+
+# the layout holds an n x n distance matrix, so every rendered level is capped at this many nodes
+LAYOUT_MAX_NODES = 2000
+
+def _as_csr(G):
+    return G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+
+def community_membership(csr, partition):
+    """Community code per CSR row (-1 when missing from the partition) and the community label per code."""
+    codes, labels = pd.factorize(np.asarray(list(partition.values())))
+    membership = np.full(csr.number_of_nodes(), -1, dtype=np.int64)
+    pos = csr.positions(list(partition.keys()))
+    found = pos >= 0
+    membership[pos[found]] = codes[found]
+    return membership, np.asarray(labels)
+
+@profiled()
+def layout_positions(n, src, dst, weights=None, seed=42, iterations=50, scale=1000.0):
     """
-    Create interactive HTML using PyVis. If graph is large, sample top-degree nodes.
-    Automatically disables notebook mode when saving to file.
+    Fruchterman-Reingold layout in numpy: repulsion between all node pairs in one broadcast,
+    attraction summed per edge with bincount. Returns an (n, 2) array scaled to [-scale, scale].
     """
-    # Downsample if too many nodes
-    if G.number_of_nodes() > max_nodes:
-        degrees = dict(G.degree())
-        top_nodes = sorted(degrees, key=degrees.get, reverse=True)[:max_nodes]
-        H = G.subgraph(top_nodes).copy()
-    else:
-        H = G
+    if n > LAYOUT_MAX_NODES:
+        raise ValueError(f"layout is limited to {LAYOUT_MAX_NODES} nodes, got {n}")
+    pos = np.random.default_rng(seed).random((n, 2))
+    if n < 2:
+        return np.zeros((n, 2))
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    w = np.ones(len(src)) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(w):
+        w = w / (w.max() or 1.0)
+    k = np.sqrt(1.0 / n)
+    t = 0.1
+    cooling = t / (iterations + 1)
+    for _ in range(iterations):
+        # the pairwise terms are float32: they dominate the cost and need no more precision
+        x, y = pos.astype(np.float32).T
+        dx = np.subtract.outer(x, x)
+        dy = np.subtract.outer(y, y)
+        force = dx * dx
+        force += dy * dy
+        np.maximum(force, 1e-4, out=force)
+        np.divide(np.float32(k * k), force, out=force)
+        disp = np.column_stack([np.einsum('ij,ij->i', force, dx), np.einsum('ij,ij->i', force, dy)]).astype(np.float64)
+        d = pos[src] - pos[dst]
+        length = np.maximum(np.sqrt((d * d).sum(axis=1)), 0.01)
+        f = d * (w * length / k)[:, None]
+        for c in range(2):
+            disp[:, c] += np.bincount(dst, f[:, c], minlength=n) - np.bincount(src, f[:, c], minlength=n)
+        length = np.maximum(np.sqrt((disp * disp).sum(axis=1)), 0.01)
+        pos += disp * (np.minimum(length, t) / length)[:, None]
+        t -= cooling
+    pos -= pos.mean(axis=0)
+    return pos * (scale / (np.abs(pos).max() or 1.0))
+
+def _subgraph_level(csr, positions, group=None, seed=42):
+    """Layout and tables for the subgraph induced on the given CSR rows."""
+    positions = np.unique(positions)
+    rows, cols, w = csr.induced_edges(positions)
+    local = np.full(csr.number_of_nodes(), -1, dtype=np.int64)
+    local[positions] = np.arange(len(positions))
+    xy = layout_positions(len(positions), local[rows], local[cols], w, seed=seed)
+    labels = csr.nodes[positions]
+    nodes = pd.DataFrame({
+        'id': labels,
+        'label': labels.astype(str),
+        'title': [f"Node {n}" for n in labels.tolist()],
+        'value': csr.degree(weighted=True)[positions],
+        'group': group[positions] if group is not None else None,
+        'x': xy[:, 0],
+        'y': xy[:, 1],
+    })
+    edges = pd.DataFrame({'source': csr.nodes[rows], 'target': csr.nodes[cols], 'weight': w})
+    return {'nodes': nodes, 'edges': edges, 'directed': csr.is_directed()}
 
-    # Force notebook=False when writing standalone HTML
-    net = Network(height='750px', width='100%', notebook=False)
+def community_supergraph(G, partition, max_communities=300, max_edges=3000):
+    """
+    Collapse each community to one node. Returns (nodes_df, edges_df): nodes_df has community,
+    size and internal_weight for the max_communities largest communities, edges_df has source,
+    target and the summed weight of the edges between them (the heaviest max_edges).
+    """
+    csr = _as_csr(G)
+    membership, labels = community_membership(csr, partition)
+    n_comm = len(labels)
+    sizes = np.bincount(membership[membership >= 0], minlength=n_comm)
+    rows, cols, w = csr.induced_edges()
+    cu, cv = membership[rows], membership[cols]
+    valid = (cu >= 0) & (cv >= 0)
+    cu, cv, w = cu[valid], cv[valid], w[valid]
+    inside = cu == cv
+    internal = np.bincount(cu[inside], w[inside], minlength=n_comm)
+    keep = np.argsort(-sizes, kind='stable')[:max_communities]
+    rank = np.full(n_comm, -1, dtype=np.int64)
+    rank[keep] = np.arange(len(keep))
+    cross = ~inside & (rank[cu] >= 0) & (rank[cv] >= 0)
+    cu, cv, w = cu[cross], cv[cross], w[cross]
+    if not csr.is_directed():
+        cu, cv = np.minimum(cu, cv), np.maximum(cu, cv)
+    keys, inv = np.unique(cu * n_comm + cv, return_inverse=True)
+    weight = np.bincount(inv.ravel(), w, minlength=len(keys))
+    top = np.argsort(-weight, kind='stable')[:max_edges]
+    nodes_df = pd.DataFrame({'community': labels[keep], 'size': sizes[keep], 'internal_weight': internal[keep]})
+    edges_df = pd.DataFrame({'source': labels[keys[top] // n_comm], 'target': labels[keys[top] % n_comm],
+                             'weight': weight[top]})
+    return nodes_df, edges_df
 
-    # Add nodes
-    for n in H.nodes():
-        title = f"Node {n}"
-        group = partition.get(n, 0) if partition else None
-        net.add_node(int(n), label=str(n), title=title, group=group)
+@profiled()
+def supergraph_level(G, partition, max_communities=300, max_edges=3000, seed=42):
+    """Top level: the community supergraph with a precomputed layout."""
+    csr = _as_csr(G)
+    nodes_df, edges_df = community_supergraph(csr, partition, max_communities=min(max_communities, LAYOUT_MAX_NODES),
+                                              max_edges=max_edges)
+    index = pd.Index(nodes_df['community'])
+    xy = layout_positions(len(nodes_df), index.get_indexer(edges_df['source']),
+                          index.get_indexer(edges_df['target']), edges_df['weight'].to_numpy(), seed=seed)
+    nodes = pd.DataFrame({
+        'id': nodes_df['community'],
+        'label': [f"C{c}" for c in nodes_df['community'].tolist()],
+        'title': [f"Community {c}: {s} nodes" for c, s in zip(nodes_df['community'].tolist(), nodes_df['size'].tolist())],
+        'value': nodes_df['size'],
+        'group': nodes_df['community'],
+        'x': xy[:, 0],
+        'y': xy[:, 1],
+    })
+    return {'nodes': nodes, 'edges': edges_df, 'directed': csr.is_directed()}
 
-    # Add edges
-    for u, v in H.edges():
-        net.add_edge(int(u), int(v))
+@profiled()
+def community_level(G, partition, community, max_nodes=1000, seed=42):
+    """Drill-down level: the subgraph of one community (its max_nodes highest-degree members)."""
+    csr = _as_csr(G)
+    membership, labels = community_membership(csr, partition)
+    code = np.flatnonzero(labels == community)
+    if len(code) == 0:
+        raise KeyError(f"Unknown community: {community}")
+    members = np.flatnonzero(membership == code[0])
+    max_nodes = min(max_nodes, LAYOUT_MAX_NODES)
+    if len(members) > max_nodes:
+        degree = csr.degree(weighted=True)[members]
+        members = members[np.argsort(-degree, kind='stable')[:max_nodes]]
+    return _subgraph_level(csr, members, group=labels[np.maximum(membership, 0)], seed=seed)
 
-    # Ensure output folder exists
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+# vis-network, the library PyVis wraps, from the same CDN build PyVis 0.3 links
+VIS_NETWORK_JS = 'https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js'
+_LEVEL_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script type="text/javascript" src="{script}"></script>
+<style>#network {{ width: 100%; height: {height}; border: 1px solid lightgray; }}</style>
+</head>
+<body>
+<div id="network"></div>
+<script type="text/javascript">
+var nodes = new vis.DataSet({nodes});
+var edges = new vis.DataSet({edges});
+var network = new vis.Network(document.getElementById('network'), {{nodes: nodes, edges: edges}}, {options});
+</script>
+</body>
+</html>
+"""
 
-    # Save as HTML file
-    net.write_html(output_path, notebook=False)
+@profiled()
+def render_level(level, output_path=None, height='750px'):
+    """
+    vis-network HTML for a precomputed level, with the node and edge JSON serialized straight from
+    its tables: fixed coordinates, physics off. (PyVis' add_node/add_edge check every earlier node
+    or edge for duplicates, quadratic in the level size.)
+    """
+    nodes = level['nodes'][['id', 'label', 'title', 'value', 'x', 'y', 'group']]
+    if nodes['group'].isna().all():
+        nodes = nodes.drop(columns='group')
+    nodes = nodes.assign(shape='dot', physics=False)
+    edges = level['edges'].rename(columns={'source': 'from', 'target': 'to', 'weight': 'value'})
+    options = {'physics': {'enabled': False}, 'edges': {'smooth': False}}
+    if level['directed']:
+        options['edges']['arrows'] = 'to'
+    # to_json escapes '/', so a '</script>' inside a label cannot end the script block
+    html = _LEVEL_HTML.format(script=VIS_NETWORK_JS, height=height, options=json.dumps(options),
+                              nodes=nodes.to_json(orient='records'),
+                              edges=edges[['from', 'to', 'value']].to_json(orient='records'))
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+    return html
+
+@profiled()
+def top_degree_level(G, partition=None, max_nodes=1000, seed=42):
+    """Flat level: the subgraph of the max_nodes highest-degree nodes, coloured by community."""
+    csr = _as_csr(G)
+    max_nodes = min(max_nodes, LAYOUT_MAX_NODES)
+    positions = np.arange(csr.number_of_nodes())
+    if len(positions) > max_nodes:
+        positions = np.argsort(-csr.degree(weighted=False), kind='stable')[:max_nodes]
+    group = None
+    if partition:
+        membership, labels = community_membership(csr, partition)
+        group = np.where(membership >= 0, labels[np.maximum(membership, 0)], 0)
+    return _subgraph_level(csr, positions, group=group, seed=seed)
+
+def create_pyvis_network(G, partition=None, output_path='network.html', notebook=False, max_nodes=1000):
+    """
+    Create interactive HTML using PyVis. If graph is large, sample top-degree nodes.
+    Automatically disables notebook mode when saving to file.
+    """
+    render_level(top_degree_level(G, partition, max_nodes=max_nodes), output_path=output_path)
     print(f"✅ PyVis network saved at: {output_path}")
 
 def plot_centralities_summary(df):
@@ -0,0 +1,88 @@
+import random
+import networkx as nx
+import pytest
+
+from centrality import betweenness_parallel, closeness_approx, eigenvector_sparse, estimate_error, pagerank_sparse
+from csr_graph import CSRGraph
+
+def weighted_digraph(n=200, p=0.04, seed=2):
+    G = nx.gnp_random_graph(n, p, seed=seed, directed=True)
+    rng = random.Random(seed)
+    for u, v in G.edges():
+        G[u][v]['weight'] = rng.choice([0.5, 1.0, 2.0])
+    return G
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_weighted_betweenness_matches_networkx(directed):
+    G = weighted_digraph()
+    if not directed:
+        G = G.to_undirected()
+    expected = nx.betweenness_centrality(G, weight='weight')
+    for graph in (G, CSRGraph.from_networkx(G)):
+        assert betweenness_parallel(graph, weight='weight') == pytest.approx(expected, abs=1e-12)
+
+def test_sampled_betweenness_same_for_any_n_jobs():
+    G = weighted_digraph()
+    serial = betweenness_parallel(G, k=64, weight='weight', seed=3, block_size=8)
+    assert betweenness_parallel(G, k=64, weight='weight', seed=3, n_jobs=2, block_size=8) == serial
+
+def with_dangling(G):
+    # nodes without out-edges (and an isolated one) exercise the dangling-mass redistribution
+    G = G.copy()
+    n = G.number_of_nodes()
+    G.add_edge(0, n, weight=3.0)
+    G.add_edge(1, n + 1, weight=0.5)
+    G.add_node(n + 2)
+    return G
+
+PAGERANK_GRAPHS = {
+    'undirected': lambda: weighted_digraph().to_undirected(),
+    'directed': weighted_digraph,
+    'directed_dangling': lambda: with_dangling(weighted_digraph()),
+}
+
+@pytest.mark.parametrize('graph', sorted(PAGERANK_GRAPHS))
+@pytest.mark.parametrize('weight', ['weight', None])
+def test_pagerank_matches_networkx(graph, weight):
+    G = PAGERANK_GRAPHS[graph]()
+    expected = nx.pagerank(G, weight=weight, tol=1e-12, max_iter=1000)
+    for g in (G, CSRGraph.from_networkx(G)):
+        assert pagerank_sparse(g, weight=weight, tol=1e-12, max_iter=1000) == pytest.approx(expected, abs=1e-9)
+
+def test_personalized_pagerank_with_dangling_matches_networkx():
+    G = with_dangling(weighted_digraph())
+    personalization = {0: 1.0, 5: 2.0}
+    dangling = {v: 1.0 for v in G if v % 2}
+    expected = nx.pagerank(G, personalization=personalization, dangling=dangling, tol=1e-12, max_iter=1000)
+    result = pagerank_sparse(G, personalization=personalization, dangling=dangling, tol=1e-12, max_iter=1000)
+    assert result == pytest.approx(expected, abs=1e-9)
+
+@pytest.mark.parametrize('directed', [True, False])
+@pytest.mark.parametrize('weight', ['weight', None])
+def test_eigenvector_matches_networkx(directed, weight):
+    G = weighted_digraph(p=0.08)
+    if directed:
+        # the dominant eigenvector is only unique (and positive) on a strongly connected graph
+        G = G.subgraph(max(nx.strongly_connected_components(G), key=len)).copy()
+    else:
+        G = G.to_undirected()
+    expected = nx.eigenvector_centrality_numpy(G, weight=weight)
+    for g in (G, CSRGraph.from_networkx(G)):
+        result = eigenvector_sparse(g, weight=weight, tol=1e-12, max_iter=10000)
+        assert result == pytest.approx(expected, abs=1e-6)
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('harmonic', [False, True])
+def test_exact_closeness_matches_networkx(directed, harmonic):
+    # two components, so the Wasserman-Faust scaling is exercised too
+    G = nx.disjoint_union(nx.gnp_random_graph(60, 0.06, seed=1, directed=directed),
+                          nx.gnp_random_graph(20, 0.2, seed=2, directed=directed))
+    expected = nx.harmonic_centrality(G) if harmonic else nx.closeness_centrality(G)
+    assert closeness_approx(G, k=None, harmonic=harmonic, batch_size=16) == pytest.approx(expected, abs=1e-12)
+
+def test_sampled_closeness_tracks_exact_ranking():
+    G = nx.barabasi_albert_graph(1000, 3, seed=1)
+    exact = nx.closeness_centrality(G)
+    error = estimate_error(closeness_approx(G, k=200, seed=3), exact)
+    assert error['spearman'] > 0.95
+    assert error['relative_error'] < 0.05
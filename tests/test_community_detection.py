@@ -0,0 +1,52 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from community_detection import louvain_partition, louvain_sweep, modularity, undirected_edges
+from csr_graph import CSRGraph
+from graph_analysis import GraphAnalyzer
+
+@pytest.fixture(scope='module')
+def planted():
+    G = nx.planted_partition_graph(5, 40, 0.3, 0.02, seed=4)
+    # relabel so node IDs are not row positions
+    return nx.relabel_nodes(G, {n: f'n{n}' for n in G})
+
+def test_sweep_selection(planted):
+    csr = CSRGraph.from_networkx(planted)
+    sweep = louvain_sweep(csr, resolutions=(0.2, 1.0, 3.0), seeds=(0, 1, 2))
+    runs = sweep['runs']
+    assert len(runs) == 9 and set(sweep['partition']) == set(planted)
+    best = runs.loc[runs['modularity'].idxmax()]
+    assert sweep['best'] == (best['resolution'], best['seed'])
+    # the reported modularity is community.modularity of the kept partition
+    import community as community_louvain
+    assert best['modularity'] == pytest.approx(community_louvain.modularity(sweep['partition'], planted))
+    stable = louvain_sweep(csr, resolutions=(0.2, 1.0, 3.0), seeds=(0, 1, 2), select='stability')
+    by_resolution = runs.groupby('resolution')['stability'].mean()
+    assert stable['best'][0] == by_resolution.idxmax()
+    within = runs[runs['resolution'] == by_resolution.idxmax()]
+    assert stable['best'][1] == within.loc[within['modularity'].idxmax(), 'seed']
+    with pytest.raises(ValueError):
+        louvain_sweep(csr, select='size')
+
+def test_sweep_runs_on_the_csr_form(planted):
+    # NetworkX and CSR inputs give the same runs, and the resolution-1 run is louvain_partition's
+    from_nx = louvain_sweep(planted, resolutions=(1.0,), seeds=(3,))
+    from_csr = louvain_sweep(CSRGraph.from_networkx(planted), resolutions=(1.0,), seeds=(3,))
+    assert from_nx['partition'] == from_csr['partition'] == louvain_partition(planted, random_state=3)
+    analyzer = GraphAnalyzer(planted)
+    analyzer.sweep_communities(resolutions=(1.0,), seeds=(3,))
+    assert analyzer.partition == from_csr['partition']
+
+def test_directed_edges_collapse_like_to_undirected():
+    D = nx.DiGraph()
+    D.add_weighted_edges_from([(0, 1, 1.0), (1, 0, 5.0), (1, 2, 2.0), (2, 2, 4.0)])
+    csr = CSRGraph.from_networkx(D)
+    src, dst, w = undirected_edges(csr)
+    U = D.to_undirected()
+    expected = {(min(u, v), max(u, v)): d for u, v, d in U.edges(data='weight')}
+    nodes = csr.nodes
+    assert {(nodes[a], nodes[b]): x for a, b, x in zip(src, dst, w)} == expected
+    labels = np.zeros(3, dtype=np.int64)
+    assert modularity(labels, src, dst, w) == pytest.approx(0.0)
@@ -0,0 +1,49 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from csr_graph import CSRGraph, is_csr_graph, read_graph, write_graph
+
+def sample_graph(directed, labels=int):
+    G = nx.gnp_random_graph(80, 0.08, seed=1, directed=directed)
+    G.add_edge(3, 3)
+    G.add_node(200)  # isolated
+    for i, (u, v) in enumerate(G.edges()):
+        G[u][v]['weight'] = 1.0 + i % 3
+    return nx.relabel_nodes(G, labels)
+
+def edge_weights(G):
+    key = (lambda u, v: (u, v)) if G.is_directed() else (lambda u, v: frozenset((u, v)))
+    return {key(u, v): w for u, v, w in G.edges(data='weight')}
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('labels', [int, lambda n: f'user-{n}'], ids=['int', 'str'])
+def test_save_load_round_trip(tmp_path, directed, labels):
+    G = sample_graph(directed, labels)
+    path = str(tmp_path / 'g')
+    write_graph(G, path, fmt='csr')
+    assert is_csr_graph(path)
+    csr = read_graph(path, as_networkx=False)
+    assert isinstance(csr.indices, np.memmap)
+    assert csr.number_of_nodes() == G.number_of_nodes()
+    assert csr.number_of_edges() == G.number_of_edges()
+    assert csr.is_directed() == directed
+    H = read_graph(path)
+    assert list(H.nodes()) == list(G.nodes())
+    assert edge_weights(H) == edge_weights(G)
+
+def test_positions_and_degree():
+    G = sample_graph(False)
+    csr = CSRGraph.from_networkx(G)
+    nodes = list(G.nodes())
+    assert csr.positions([nodes[5], nodes[0], 999]).tolist() == [5, 0, -1]
+    # out-degree per row; an undirected self-loop is stored once
+    degree = dict(G.degree(weight='weight'))
+    degree[3] -= G[3][3]['weight']
+    assert csr.degree().tolist() == pytest.approx([degree[n] for n in nodes])
+
+def test_gpickle_round_trip(tmp_path):
+    G = sample_graph(True)
+    path = str(tmp_path / 'g.gpickle')
+    write_graph(CSRGraph.from_networkx(G), path)
+    assert edge_weights(read_graph(path)) == edge_weights(G)
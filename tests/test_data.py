@@ -0,0 +1,46 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from csr_graph import CSRGraph
+from data import generate_edge_arrays, generate_synthetic_graph
+
+@pytest.mark.parametrize('model', ['chung_lu', 'planted'])
+def test_edge_arrays_are_simple_exact_and_reproducible(model):
+    src, dst, membership = generate_edge_arrays(2000, 10000, seed=3, model=model)
+    assert len(src) == 10000
+    assert (src != dst).all() and (src < 2000).all() and (dst < 2000).all()
+    keys = np.minimum(src, dst) * 2000 + np.maximum(src, dst)
+    assert len(np.unique(keys)) == len(keys)
+    again = generate_edge_arrays(2000, 10000, seed=3, model=model)
+    assert (again[0] == src).all() and (again[1] == dst).all()
+    assert (membership is None) == (model == 'chung_lu')
+    other = generate_edge_arrays(2000, 10000, seed=4, model=model)
+    assert not np.array_equal(np.sort(keys), np.sort(np.minimum(other[0], other[1]) * 2000 + np.maximum(other[0], other[1])))
+
+def test_chung_lu_degrees_are_heavy_tailed():
+    src, dst, _ = generate_edge_arrays(20000, 100000, seed=1)
+    degree = np.bincount(np.r_[src, dst], minlength=20000)
+    assert degree.max() > 20 * degree.mean()
+
+def test_planted_communities_hold_most_edges():
+    G = generate_synthetic_graph(3000, 15000, seed=2, model='planted', n_communities=8, mixing=0.1)
+    community = nx.get_node_attributes(G, 'community')
+    inside = sum(community[u] == community[v] for u, v in G.edges())
+    assert inside / G.number_of_edges() > 0.8
+    assert len(set(community.values())) == 8
+
+def test_near_complete_graph_is_filled_exactly():
+    src, dst, _ = generate_edge_arrays(60, 60 * 59 // 2 - 3, seed=5)
+    assert len(src) == 60 * 59 // 2 - 3
+    # more edges than possible is capped at the complete graph
+    assert len(generate_edge_arrays(30, 10 ** 6, seed=5)[0]) == 30 * 29 // 2
+
+@pytest.mark.parametrize('model', ['ba', 'chung_lu'])
+def test_graph_and_csr_forms_agree(model):
+    G = generate_synthetic_graph(1000, 5000, seed=7, model=model)
+    csr = generate_synthetic_graph(1000, 5000, seed=7, model=model, as_csr=True)
+    assert isinstance(csr, CSRGraph)
+    assert G.number_of_nodes() == csr.number_of_nodes() == 1000
+    assert G.number_of_edges() == csr.number_of_edges() == 5000
+    assert sorted(map(sorted, G.edges())) == sorted(map(sorted, csr.to_networkx().edges()))
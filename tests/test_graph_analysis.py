@@ -0,0 +1,24 @@
+import networkx as nx
+import pytest
+
+import graph_analysis
+from graph_analysis import GraphAnalyzer
+
+def test_centrality_columns_match_networkx():
+    G = nx.karate_club_graph()
+    analyzer = GraphAnalyzer(G)
+    analyzer.compute_centralities()
+    df = analyzer.centrality_df.set_index('node')
+    assert list(df.columns) == ['degree', 'betweenness', 'closeness', 'eigenvector', 'pagerank']
+    assert df['eigenvector'].to_dict() == pytest.approx(nx.eigenvector_centrality_numpy(G), abs=1e-5)
+    assert df['pagerank'].to_dict() == pytest.approx(nx.pagerank(G, weight=None), abs=1e-5)
+
+def test_eigenvector_falls_back_when_power_iteration_fails(monkeypatch):
+    def fail(*args, **kwargs):
+        raise nx.PowerIterationFailedConvergence(1000)
+    monkeypatch.setattr(graph_analysis, 'eigenvector_sparse', fail)
+    G = nx.barabasi_albert_graph(200, 2, seed=1)
+    analyzer = GraphAnalyzer(G)
+    analyzer.compute_centralities()
+    ev = analyzer.centrality_df.set_index('node')['eigenvector']
+    assert ev.to_dict() == pytest.approx(nx.eigenvector_centrality_numpy(G), abs=1e-8)
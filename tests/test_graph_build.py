@@ -0,0 +1,36 @@
+import random
+import pandas as pd
+import pytest
+
+from graph_build import build_csr_bulk, build_graph, build_graph_bulk
+
+@pytest.fixture
+def edge_csv(tmp_path):
+    # repeated pairs in both directions, self-loops and string IDs
+    rng = random.Random(0)
+    rows = [(f'n{rng.randrange(60)}', f'n{rng.randrange(60)}', rng.choice([0.5, 1.0, 2.0])) for _ in range(1500)]
+    path = tmp_path / 'edges.csv'
+    pd.DataFrame(rows, columns=['source', 'target', 'weight']).to_csv(path, index=False)
+    return str(path)
+
+@pytest.mark.parametrize('directed', [False, True])
+def test_bulk_matches_row_by_row(edge_csv, directed):
+    expected = build_graph(edge_csv, directed=directed)
+    stats = {}
+    # a small chunk size so duplicates are summed across chunks too
+    G = build_graph_bulk(edge_csv, directed=directed, chunksize=100, stats=stats)
+    assert stats['rows'] == 1500
+    assert list(G.nodes()) == list(expected.nodes())
+    assert G.is_directed() == directed
+    assert {e[:2]: pytest.approx(e[2]) for e in G.edges(data='weight')} == \
+        {e[:2]: e[2] for e in expected.edges(data='weight')}
+
+@pytest.mark.parametrize('directed', [False, True])
+def test_csr_bulk_matches_row_by_row(edge_csv, directed):
+    expected = build_graph(edge_csv, directed=directed)
+    csr = build_csr_bulk(edge_csv, directed=directed, chunksize=100)
+    assert csr.number_of_edges() == expected.number_of_edges()
+    H = csr.to_networkx()
+    assert sorted(H.nodes()) == sorted(expected.nodes())
+    weight = lambda G: {(u, v) if directed else tuple(sorted((u, v))): w for u, v, w in G.edges(data='weight')}
+    assert weight(H) == pytest.approx(weight(expected))
@@ -0,0 +1,174 @@
+import random
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from centrality import pagerank_scores
+from community_detection import run_louvain
+from csr_graph import CSRGraph, CSROverlay, read_graph
+from incremental import apply_edge_delta, local_louvain, pagerank_push, update_node_metrics
+from metrics_io import read_table, table_deltas, update_table, write_table
+
+def weighted_graph(directed, n=300, seed=4):
+    G = nx.gnp_random_graph(n, 0.03, seed=seed, directed=directed)
+    rng = random.Random(seed)
+    for a, b in G.edges():
+        G[a][b]['weight'] = rng.choice([1.0, 2.0, 3.0])
+    return G
+
+def delta_rows(G, seed=5):
+    # reweighted, removed and added edges, a self-loop and two new nodes (one dangling)
+    rng = random.Random(seed)
+    edges = rng.sample(sorted(G.edges()), 20)
+    rows = [(a, b, 1.0) for a, b in edges[:10]]
+    rows += [(a, b, -G[a][b]['weight']) for a, b in edges[10:]]
+    rows += [(rng.randrange(len(G)), rng.randrange(len(G)), 2.0) for _ in range(10)]
+    rows += [(3, 3, 1.0), (7, 'x', 1.0), ('y', 'x', 2.0), (8, 'ghost', -1.0)]
+    return rows
+
+def apply_to_networkx(G, rows):
+    G = G.copy()
+    for a, b, dw in rows:
+        if G.has_edge(a, b):
+            w = G[a][b]['weight'] + dw
+            if w <= 0:
+                G.remove_edge(a, b)
+            else:
+                G[a][b]['weight'] = w
+        elif dw > 0:
+            G.add_edge(a, b, weight=dw)
+    return G
+
+@pytest.fixture(params=[False, True], ids=['undirected', 'directed'])
+def delta(request, tmp_path):
+    G = weighted_graph(request.param)
+    G = nx.relabel_nodes(G, str)
+    rows = [(str(a), str(b), w) for a, b, w in delta_rows(nx.relabel_nodes(G, int))]
+    path = tmp_path / 'delta.csv'
+    pd.DataFrame(rows, columns=['source', 'target', 'weight']).to_csv(path, index=False)
+    return G, apply_to_networkx(G, rows), str(path)
+
+def test_apply_edge_delta_matches_networkx(delta):
+    G, expected, path = delta
+    old = CSRGraph.from_networkx(G)
+    new, changes = apply_edge_delta(old, path)
+    assert new.nodes.tolist() == list(expected.nodes())
+    assert new.number_of_edges() == expected.number_of_edges()
+    H = new.to_networkx()
+    assert sorted(H.edges(data='weight')) == sorted(expected.edges(data='weight'))
+    assert (changes['old'] != changes['new']).all() and len(changes) <= 34
+    # the base arrays are shared, not copied; only the touched rows live in the overlay
+    assert new.base is old and len(new.rows) <= 2 * 34
+    merged = new.merged()
+    assert sorted(merged.to_networkx().edges(data='weight')) == sorted(expected.edges(data='weight'))
+
+def test_overlay_saved_next_to_base_and_merged_on_load(delta, tmp_path, monkeypatch):
+    G, expected, path = delta
+    # the test graph is small, so the delta is a large share of it
+    monkeypatch.setattr('csr_graph.OVERLAY_MAX_FRACTION', 1.0)
+    CSRGraph.from_networkx(G).save(tmp_path / 'g')
+    old = CSROverlay.load(str(tmp_path / 'g'))
+    new, _ = apply_edge_delta(old, path)
+    new.save(str(tmp_path / 'g'))
+    assert (tmp_path / 'g' / 'overlay' / 'rows.npy').exists()
+    # a second delta on top of the saved overlay
+    again, _ = apply_edge_delta(CSROverlay.load(str(tmp_path / 'g')), path)
+    twice = apply_to_networkx(expected, pd.read_csv(path).itertuples(index=False, name=None))
+    H = read_graph(str(tmp_path / 'g'))
+    assert sorted(H.edges(data='weight')) == sorted(expected.edges(data='weight'))
+    assert sorted(again.to_networkx().edges(data='weight')) == sorted(twice.edges(data='weight'))
+    # saving elsewhere writes the merged graph
+    again.save(str(tmp_path / 'copy'))
+    assert not (tmp_path / 'copy' / 'overlay').exists()
+    assert sorted(read_graph(str(tmp_path / 'copy')).edges(data='weight')) == sorted(twice.edges(data='weight'))
+
+def test_pagerank_push_matches_full_pagerank(delta):
+    G, expected, path = delta
+    old = CSRGraph.from_networkx(G)
+    new, changes = apply_edge_delta(old, path)
+    x = pagerank_scores(old, tol=1e-12, max_iter=1000)
+    sources = np.unique(changes['u'] if new.directed else np.r_[changes['u'], changes['v']])
+    pr, pushed = pagerank_push(old, new, x, sources, tol=1e-9)
+    full = pagerank_scores(new.merged(), tol=1e-12, max_iter=1000)
+    assert pr == pytest.approx(full, abs=1e-8)
+
+def test_pagerank_push_stays_local(tmp_path):
+    G = nx.barabasi_albert_graph(20000, 3, seed=1)
+    old = CSRGraph.from_networkx(G)
+    path = tmp_path / 'delta.csv'
+    pd.DataFrame([(19999, 19998, 1.0), (17, 20003, 1.0)], columns=['source', 'target', 'weight']).to_csv(path, index=False)
+    new, changes = apply_edge_delta(old, str(path))
+    x = pagerank_scores(old, tol=1e-10, max_iter=1000)
+    pr, pushed = pagerank_push(old, new, x, np.unique(np.r_[changes['u'], changes['v']]), tol=1e-6)
+    assert len(pushed) < 500
+    assert np.abs(pr - pagerank_scores(new.merged(), tol=1e-10, max_iter=1000)).max() < 1e-6
+
+def test_update_keeps_untouched_rows_and_communities(delta):
+    G, expected, path = delta
+    old = CSRGraph.from_networkx(G)
+    partition = run_louvain(old.to_networkx(), random_state=1)
+    community = np.array([partition[n] for n in old.nodes.tolist()])
+    prior = pd.DataFrame({'community': community, 'degree': old.degree(),
+                          'pagerank': pagerank_scores(old, tol=1e-12, max_iter=1000)}, index=old.nodes)
+    if old.directed:
+        prior['degree'] += np.bincount(old.indices, old.weights, minlength=len(prior))
+    new, changes = apply_edge_delta(old, path)
+    df, changed = update_node_metrics(old, new, prior, changes, pagerank_tol=1e-9, seed=1)
+    assert df['degree'].to_dict() == pytest.approx(dict(expected.degree(weight='weight')))
+    assert df['pagerank'].to_numpy() == pytest.approx(pagerank_scores(new.merged(), tol=1e-12, max_iter=1000), abs=1e-7)
+    same = df.index.difference(changed)
+    assert (df.loc[same, ['community', 'degree']] == prior.loc[same, ['community', 'degree']]).all().all()
+    assert df.loc[same, 'pagerank'].to_numpy() == pytest.approx(prior.loc[same, 'pagerank'].to_numpy(), abs=1e-9)
+    touched = set(new.nodes[np.r_[changes['u'], changes['v']]])
+    outside = ~prior['community'].isin(prior.loc[prior.index.intersection(touched), 'community'])
+    assert (df.loc[outside[outside].index, 'community'] == prior.loc[outside, 'community']).all()
+
+def test_local_louvain_caps_the_rerun_region():
+    G = nx.barabasi_albert_graph(2000, 3, seed=2)
+    csr = CSRGraph.from_networkx(G)
+    partition = run_louvain(G, random_state=1)
+    community = np.array([partition[n] for n in csr.nodes.tolist()])
+    degree = csr.degree()
+    touched = np.array([0, 1, 2])
+    sizes = np.bincount(community)
+    calls = []
+    import incremental
+    original = incremental.run_louvain
+    incremental.run_louvain = lambda H, **kw: calls.append(H.number_of_nodes()) or original(H, **kw)
+    try:
+        capped = local_louvain(csr, community, degree, touched, seed=1, max_nodes=sizes[community[touched]].min() - 1)
+        full = local_louvain(csr, community, degree, touched, seed=1, max_nodes=len(community))
+    finally:
+        incremental.run_louvain = original
+    # too large to rerun: only the touched nodes may move, nothing else
+    assert calls == [np.isin(community, community[touched]).sum()]
+    assert (capped != community).sum() <= len(touched)
+    assert (full[~np.isin(community, community[touched])] == community[~np.isin(community, community[touched])]).all()
+
+def test_local_moves_assign_new_nodes_to_a_neighbouring_community():
+    G = nx.disjoint_union(nx.complete_graph(10), nx.complete_graph(10))
+    G.add_edges_from([(20, 0), (20, 1), (20, 2)])
+    csr = CSRGraph.from_networkx(G)
+    community = np.r_[np.zeros(10, dtype=int), np.ones(10, dtype=int), -1]
+    out = local_louvain(csr, community, csr.degree(), [20, 0, 1, 2], max_nodes=0)
+    assert out[20] == 0 and (out[:20] == community[:20]).all()
+
+def test_table_deltas_are_merged_by_key(tmp_path, monkeypatch):
+    monkeypatch.setattr('metrics_io.DELTA_MAX_FRACTION', 1.0)
+    for fmt in ('parquet', 'csv'):
+        outdir = str(tmp_path / fmt)
+        table = pd.DataFrame({'node': ['a', 'b', 'c'], 'community': [0, 0, 1], 'pagerank': [0.2, 0.3, 0.5]})
+        write_table(table, outdir, 'node_metrics', fmt)
+        changed = pd.DataFrame({'node': ['b', 'd'], 'community': [1, 1], 'pagerank': [0.25, 0.05]})
+        update_table(table, changed, outdir, 'node_metrics')
+        assert len(table_deltas(outdir, 'node_metrics')) == 1
+        df = read_table(outdir, 'node_metrics', columns=['pagerank']).sort_values('pagerank')
+        assert df['pagerank'].tolist() == [0.05, 0.2, 0.25, 0.5] and df.columns.tolist() == ['pagerank']
+        df = read_table(outdir, 'node_metrics').set_index('node').sort_index()
+        assert df['community'].tolist() == [0, 1, 1, 1]
+        # once deltas pile up the full table is written and the deltas dropped
+        monkeypatch.setattr('metrics_io.MAX_DELTAS', 1)
+        update_table(df.reset_index(), changed, outdir, 'node_metrics')
+        assert table_deltas(outdir, 'node_metrics') == []
+        assert read_table(outdir, 'node_metrics')['node'].tolist() == ['a', 'b', 'c', 'd']
@@ -0,0 +1,22 @@
+import networkx as nx
+import pytest
+
+import influence
+from influence import InfluenceModel
+
+@pytest.fixture
+def model():
+    return InfluenceModel(nx.barabasi_albert_graph(600, 2, seed=1), seed=3)
+
+def test_celf_pp_mg2_pass_is_bounded(model, monkeypatch):
+    monkeypatch.setattr(influence, 'MG2_CANDIDATES', 32)
+    seeds = model.select_seeds(k=5, trials=20, method='celf++')
+    # one single-node pass over every node, then mg2 for at most 32 of them
+    assert seeds['evaluations'].iloc[0] <= 600 + 32
+    assert seeds['node'].is_unique and len(seeds) == 5
+
+def test_degree_capped_candidates(model):
+    model.select_seeds(k=3, trials=20, candidates=50)
+    degree = dict(model.csr.to_networkx().degree())
+    top = sorted(degree, key=degree.get, reverse=True)[:50]
+    assert set(model.candidate_spread.index) == set(top)
@@ -0,0 +1,66 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+from http.server import ThreadingHTTPServer
+
+from influencer_index import InfluencerIndex, make_handler
+
+@pytest.fixture(scope='module')
+def table():
+    rng = np.random.default_rng(2)
+    n = 500
+    return pd.DataFrame({'node': np.arange(n), 'community': rng.integers(0, 7, n),
+                         # a coarse metric, so ties have to be broken the way a stable sort does
+                         'degree': rng.integers(0, 20, n).astype(float), 'pagerank': rng.random(n)})
+
+@pytest.fixture(scope='module')
+def index(table):
+    return InfluencerIndex(table, graph=nx.gnm_random_graph(500, 2000, seed=1))
+
+@pytest.mark.parametrize('metric', ['degree', 'pagerank'])
+def test_top_k_matches_sort_values(index, table, metric):
+    expected = table.sort_values(metric, ascending=False, kind='stable')
+    assert index.top(metric, k=25)['node'].tolist() == expected['node'].head(25).tolist()
+    for community in range(7):
+        got = index.top(metric, k=10, community=community)
+        assert got['node'].tolist() == expected[expected['community'] == community]['node'].head(10).tolist()
+    # global rank (1 = best) of every returned node
+    rank = {n: r + 1 for r, n in enumerate(expected['node'])}
+    assert index.top(metric, k=40)['rank'].tolist() == [rank[n] for n in expected['node'].head(40)]
+    assert index.top(metric, k=5, community=99).empty
+
+def test_percentile_and_ego(index, table):
+    values = table['pagerank'].to_numpy()
+    for node in (0, 17, 499):
+        assert index.percentile(node, 'pagerank') == pytest.approx(100 * (values <= values[node]).mean())
+    G = index._graph
+    ego = index.ego(3, 'pagerank', k=5)
+    neighbours = table.set_index('node').loc[list(G[3])].sort_values('pagerank', ascending=False)
+    assert ego['node'].tolist() == neighbours.index[:5].tolist()
+
+@pytest.mark.parametrize('nodes', ['abc', ['abc', 1], 10 ** 30, 999])
+def test_unknown_or_mistyped_ids_raise_key_error(index, nodes):
+    with pytest.raises(KeyError):
+        index.percentile(nodes, 'pagerank')
+    rows = index.rows(nodes)
+    assert (rows == -1).sum() == len(rows) - (1 in np.atleast_1d(np.asarray(nodes, dtype=object)).tolist())
+
+def test_http_reports_unknown_nodes(index):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(index))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        with urllib.request.urlopen(f'{base}/top?metric=pagerank&k=3') as r:
+            assert [row['node'] for row in json.load(r)] == index.top('pagerank', 3)['node'].tolist()
+        for query in ('percentile?node=abc', 'ego?node=abc', 'percentile?node=99999'):
+            with pytest.raises(urllib.error.HTTPError) as err:
+                urllib.request.urlopen(f'{base}/{query}&metric=pagerank')
+            assert err.value.code == 400 and 'nknown node' in json.load(err.value)['error']
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,72 @@
+import os
+import time
+import networkx as nx
+import pytest
+
+from centrality import betweenness_parallel
+from jobs import Cancelled, JobRunner
+
+def wait_for(predicate, timeout=30):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.02)
+
+@pytest.fixture
+def runner():
+    runner = JobRunner(max_workers=1)
+    yield runner
+    runner.shutdown()
+
+def test_step_results_messages_and_errors(runner):
+    G = nx.barabasi_albert_graph(200, 3, seed=1)
+    seen = []
+
+    def work(job):
+        def step(k):
+            job.send('started')
+            return betweenness_parallel(G, k=k, seed=1, n_jobs=2, block_size=16)
+        job.publish('bc', job.run(step, 50, on_message=seen.append))
+        job.run(lambda: 1 / 0)
+
+    job = runner.submit('work', work)
+    wait_for(lambda: job.done)
+    assert seen == ['started']
+    assert job.results['bc'] == pytest.approx(betweenness_parallel(G, k=50, seed=1))
+    # the step's exception comes back with its own type
+    assert job.status == 'failed' and 'ZeroDivisionError' in job.error
+
+def test_cancel_kills_a_step_that_never_checks(runner):
+    started = []
+
+    def work(job):
+        def spin():
+            job.send(os.getpid())
+            while True:  # no progress() or check() in here
+                pass
+        job.run(spin, on_message=started.append)
+
+    job = runner.submit('spin', work)
+    wait_for(lambda: started)
+    job.cancel()
+    # the job only counts as cancelled once its thread has returned
+    assert job.status == 'cancelling' and not job.done
+    wait_for(lambda: job.done, timeout=10)
+    assert job.status == 'cancelled'
+    with pytest.raises(ProcessLookupError):
+        os.kill(started[0], 0)
+    # the single pool slot is free again
+    other = runner.submit('next', lambda job: job.publish('x', job.run(lambda: 42)))
+    wait_for(lambda: other.done, timeout=10)
+    assert (other.status, other.results) == ('done', {'x': 42})
+
+def test_cancel_before_the_step_starts(runner):
+    def work(job):
+        job.cancel()
+        job.run(lambda: 1)
+
+    job = runner.submit('early', work)
+    wait_for(lambda: job.done)
+    assert job.status == 'cancelled'
+    with pytest.raises(Cancelled):
+        job.check()
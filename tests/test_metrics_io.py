@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics_io import (community_summary, node_table, read_community_summary, read_node_metrics, table_path,
+                        write_community_summary, write_node_metrics)
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+@pytest.fixture
+def metrics():
+    rng = np.random.default_rng(1)
+    nodes = list(range(1000))
+    partition = {n: int(c) for n, c in zip(nodes[:-5], rng.integers(0, 20, 995))}
+    central = {'degree': dict(zip(nodes, rng.random(1000))), 'pagerank': dict(zip(nodes, rng.random(1000) / 1000))}
+    return node_table(nodes, partition, central)
+
+def test_csv_is_the_default(metrics, tmp_path):
+    path = write_node_metrics(metrics, str(tmp_path))
+    assert path.endswith('node_metrics.csv')
+
+def test_parquet_reads_only_the_requested_columns(metrics, tmp_path):
+    path = write_node_metrics(metrics, str(tmp_path), fmt='parquet')
+    assert table_path(str(tmp_path), 'node_metrics') == path
+    df = read_node_metrics(str(tmp_path), columns=['node', 'pagerank'])
+    assert df.columns.tolist() == ['node', 'pagerank']
+    expected = metrics.set_index('node')['pagerank']
+    assert df.set_index('node')['pagerank'].sort_index().equals(expected.sort_index())
+    # rows are sorted by community, so row groups cover narrow community ranges
+    assert pq.read_table(path, columns=['community']).column('community').to_pandas().is_monotonic_increasing
+    # nodes missing from the partition keep community -1
+    assert (read_node_metrics(str(tmp_path), columns=['community'])['community'] == -1).sum() == 5
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_formats_round_trip(metrics, tmp_path, fmt):
+    write_node_metrics(metrics, str(tmp_path), fmt=fmt)
+    write_community_summary(community_summary(metrics), str(tmp_path), fmt=fmt)
+    df = read_node_metrics(str(tmp_path)).set_index('node').sort_index()
+    pd.testing.assert_frame_equal(df, metrics.set_index('node'), check_dtype=False)
+    summary = read_community_summary(str(tmp_path))
+    pd.testing.assert_frame_equal(summary.sort_index(), community_summary(metrics), check_dtype=False)
+
+def test_switching_format_removes_the_stale_file(metrics, tmp_path):
+    write_node_metrics(metrics, str(tmp_path), fmt='parquet')
+    write_node_metrics(metrics.head(3), str(tmp_path), fmt='csv')
+    assert not (tmp_path / 'node_metrics.parquet').exists()
+    assert len(read_node_metrics(str(tmp_path))) == 3
@@ -0,0 +1,43 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from out_of_core import analyze, shard_bounds
+
+@pytest.fixture
+def edge_csv(tmp_path):
+    G = nx.barabasi_albert_graph(500, 3, seed=1)
+    path = tmp_path / 'edges.csv'
+    pd.DataFrame(list(G.edges()), columns=['source', 'target']).to_csv(path, index=False)
+    return G, str(path)
+
+def test_node_table_has_analysis_schema(edge_csv, tmp_path):
+    G, path = edge_csv
+    df, report = analyze(path, str(tmp_path / 'work'), memory_mb=16)
+    # the dashboard reads exactly these columns from node_metrics
+    assert {'node', 'community', 'pagerank', 'degree'} <= set(df.columns)
+    assert (df['community'] == -1).all()
+    degree = dict(G.degree())
+    assert np.array_equal(df['degree'].to_numpy(), [degree[n] for n in df['node']])
+    assert report['components'] == 1
+
+def test_shard_bounds_balance_edge_counts():
+    # a few low node IDs hold most of the edges; equal node ranges would put them all in shard 0
+    counts = np.r_[np.full(10, 5000), np.ones(9990, dtype=np.int64)]
+    bounds = shard_bounds(counts, 8)
+    assert bounds[0] == 0 and bounds[-1] == len(counts) and (np.diff(bounds) > 0).all()
+    sizes = np.add.reduceat(counts, bounds[:-1])
+    assert sizes.max() <= counts.sum() / 8 + counts.max()
+
+def test_late_string_ids_fall_back_to_str(tmp_path):
+    # the dtype guess only sees the first rows; a string ID further down must not crash the pass
+    edges = [(i, i + 1) for i in range(2000)] + [('abc', 0), ('abc', 'def')]
+    path = tmp_path / 'edges.csv'
+    pd.DataFrame(edges, columns=['source', 'target']).to_csv(path, index=False)
+    df, report = analyze(str(path), str(tmp_path / 'work'), memory_mb=16)
+    assert report['nodes'] == 2003 and report['edges'] == 2002
+    degree = df.set_index('node')['degree']
+    assert (degree['abc'], degree['0'], degree['def']) == (2, 2, 1)
+    with pytest.raises(ValueError):
+        analyze(str(path), str(tmp_path / 'work2'), memory_mb=16, id_type='int')
@@ -0,0 +1,10 @@
+import networkx as nx
+import pytest
+
+from personalized_pagerank import PersonalizedPageRank
+
+@pytest.mark.parametrize('seeds', ['abc', ['abc', 1], 10 ** 30, 99])
+def test_unknown_seed_raises_key_error(seeds):
+    ppr = PersonalizedPageRank(nx.karate_club_graph())
+    with pytest.raises(KeyError):
+        ppr.top(seeds)
@@ -0,0 +1,98 @@
+import json
+import os
+import pstats
+import time
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+import profiling
+from profiling import Profiler, profiled
+
+@pytest.fixture
+def global_profiler(tmp_path):
+    # the decorator records into the module-wide PROFILER
+    profiling.PROFILER.reset()
+    profiling.enable(output_dir=str(tmp_path), memory='tracemalloc')
+    yield profiling.PROFILER
+    profiling.PROFILER.disable()
+    profiling.PROFILER.reset()
+
+def test_disabled_profiler_records_nothing():
+    prof = Profiler()
+    with prof.stage('a') as rec:
+        pass
+    assert rec == {} and prof.records == []
+
+def test_nested_stages_time_and_memory(tmp_path):
+    prof = Profiler()
+    prof.enable(output_dir=str(tmp_path), memory='tracemalloc')
+    try:
+        with prof.stage('outer', graph=nx.path_graph(5)):
+            with prof.stage('inner'):
+                block = np.ones(4 * 1024 * 1024)  # 32 MB
+                del block
+            time.sleep(0.05)
+    finally:
+        prof.disable()
+    inner, outer = prof.records
+    assert (inner['name'], inner['depth'], outer['depth']) == ('inner', 1, 0)
+    assert outer['wall'] >= 0.05 and outer['wall'] >= inner['wall'] and outer['cpu'] >= 0
+    assert (outer['nodes_in'], outer['edges_in']) == (5, 4)
+    # the child's peak counts towards the parent even though the child reset the peak
+    assert inner['peak_mb'] > 30 and outer['peak_mb'] >= inner['peak_mb']
+    assert inner['start'] >= outer['start']
+
+def test_summary_trace_and_files(tmp_path):
+    prof = Profiler()
+    prof.enable(output_dir=str(tmp_path))
+    try:
+        for _ in range(3):
+            with prof.stage('io.read'):
+                pass
+        with prof.stage('calc.run', graph=nx.complete_graph(4)) as rec:
+            rec['nodes_out'], rec['edges_out'] = 1, 0
+    finally:
+        prof.disable()
+    summary = prof.summary().set_index('stage')
+    assert summary.loc['io.read', 'calls'] == 3 and summary.loc['calc.run', 'edges_in'] == 6
+    trace = prof.chrome_trace()
+    assert len(trace['traceEvents']) == 4
+    event = trace['traceEvents'][-1]
+    assert (event['ph'], event['cat']) == ('X', 'calc')
+    assert event['dur'] == pytest.approx(prof.records[-1]['wall'] * 1e6)
+    path = prof.write()
+    with open(path) as f:
+        assert json.load(f) == json.loads(json.dumps(trace))
+    assert pd.read_csv(os.path.join(str(tmp_path), 'stages.csv'))['stage'].tolist() == summary.index.tolist()
+
+def test_cprofile_dumps_outermost_stages_only(tmp_path):
+    prof = Profiler()
+    prof.enable(output_dir=str(tmp_path), cprofile=True)
+    try:
+        with prof.stage('outer stage'):
+            with prof.stage('inner'):
+                sum(range(10000))
+    finally:
+        prof.disable()
+    inner, outer = prof.records
+    assert 'cprofile' not in inner
+    assert os.path.basename(outer['cprofile']) == '0001-outer_stage.prof'
+    assert pstats.Stats(outer['cprofile']).total_calls > 0
+
+def test_decorator_records_graph_sizes(global_profiler):
+    @profiled('test.grow')
+    def grow(G):
+        H = G.copy()
+        H.add_edge(100, 101)
+        return H
+
+    H = grow(nx.path_graph(10))
+    assert H.number_of_nodes() == 12
+    rec, = global_profiler.records
+    assert (rec['name'], rec['nodes_in'], rec['edges_in'], rec['nodes_out'], rec['edges_out']) == \
+        ('test.grow', 10, 9, 12, 10)
+    global_profiler.disable()
+    grow(nx.path_graph(3))
+    assert len(global_profiler.records) == 1
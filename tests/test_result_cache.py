@@ -0,0 +1,62 @@
+import os
+import random
+import networkx as nx
+import numpy as np
+
+from community_detection import louvain_partition
+from csr_graph import CSRGraph
+from graph_analysis import GraphAnalyzer
+from result_cache import ResultCache, graph_fingerprint
+
+def test_hit_miss_and_params(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get('partition', 'abc', {'seed': 1}) is None
+    cache.put('partition', 'abc', {'seed': 1}, {'a': 0})
+    assert cache.get('partition', 'abc', {'seed': 1}) == {'a': 0}
+    # any change of graph, stage or params is a different entry
+    assert cache.get('partition', 'abd', {'seed': 1}) is None
+    assert cache.get('partition', 'abc', {'seed': 2}) is None
+    assert cache.get('layout', 'abc', {'seed': 1}) is None
+    calls = []
+    assert cache.get_or_compute('partition', 'abc', {'seed': 1}, lambda: calls.append(1)) == {'a': 0}
+    assert calls == []
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (2, 4, 1)
+    cache.clear()
+    assert cache.stats()['entries'] == 0
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=10 ** 9)
+    for i in range(3):
+        cache.put('stage', 'g', {'i': i}, np.zeros(1000))
+        os.utime(os.path.join(str(tmp_path), f"{cache.key('stage', 'g', {'i': i})}.pkl"), (i, i))
+    entry = cache.stats()['bytes'] // 3
+    # reading entry 0 makes it the most recently used one
+    cache.get('stage', 'g', {'i': 0})
+    cache.max_bytes = 2 * entry
+    cache.evict()
+    assert cache.get('stage', 'g', {'i': 1}) is None
+    assert cache.get('stage', 'g', {'i': 0}) is not None and cache.get('stage', 'g', {'i': 2}) is not None
+
+def test_fingerprint_is_independent_of_the_graph_form(tmp_path):
+    G = nx.gnm_random_graph(200, 600, seed=3)
+    csr = CSRGraph.from_networkx(G)
+    csr.save(str(tmp_path / 'g'))
+    assert graph_fingerprint(G) == graph_fingerprint(csr) == graph_fingerprint(CSRGraph.load(str(tmp_path / 'g')))
+    H = G.copy()
+    H[0][next(iter(H[0]))]['weight'] = 2.0
+    assert graph_fingerprint(H) != graph_fingerprint(G)
+
+def test_app_and_batch_partitions_agree():
+    # same nodes and edges, adjacency inserted in another order: same fingerprint, so the
+    # 'partition' cache entry must not depend on which of them computed it
+    G = nx.planted_partition_graph(8, 40, 0.3, 0.02, seed=5)
+    edges = list(G.edges())
+    random.Random(1).shuffle(edges)
+    H = nx.Graph()
+    H.add_nodes_from(G)
+    H.add_edges_from(edges)
+    assert graph_fingerprint(G) == graph_fingerprint(H)
+    analyzer = GraphAnalyzer(H)
+    analyzer.compute_communities(seed=7)
+    assert analyzer.partition == louvain_partition(CSRGraph.from_networkx(G), random_state=7)
@@ -0,0 +1,28 @@
+import threading
+import networkx as nx
+import pytest
+
+from centrality import betweenness_parallel
+from scheduler import Stage, run_stages
+
+def test_stage_starting_worker_pool_exits():
+    # a stage that starts joblib workers used to leave its process waiting on them at exit
+    G = nx.barabasi_albert_graph(300, 3, seed=1)
+    stages = [Stage('betweenness', lambda: betweenness_parallel(G, k=64, seed=1, n_jobs=2, block_size=16))]
+    out = {}
+    runner = threading.Thread(target=lambda: out.update(zip(('results', 'report'), run_stages(stages, log=None))),
+                              daemon=True)
+    runner.start()
+    runner.join(60)
+    assert not runner.is_alive(), "run_stages did not return"
+    assert out['report']['betweenness']['status'] == 'done'
+    expected = betweenness_parallel(G, k=64, seed=1, n_jobs=1, block_size=16)
+    assert out['results']['betweenness'] == pytest.approx(expected)
+
+def test_failed_stage_skips_dependents():
+    def boom():
+        raise RuntimeError('boom')
+    stages = [Stage('a', boom), Stage('b', lambda a: a, deps=['a']), Stage('c', lambda: 1)]
+    results, report = run_stages(stages, log=None)
+    assert [report[s]['status'] for s in 'abc'] == ['failed', 'skipped', 'done']
+    assert results == {'c': 1}
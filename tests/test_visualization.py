@@ -0,0 +1,51 @@
+import json
+import re
+import networkx as nx
+import pytest
+
+from csr_graph import CSRGraph
+from visualization import community_level, render_level, supergraph_level, top_degree_level
+
+def network_data(html):
+    nodes, edges = re.findall(r'new vis\.DataSet\((.*?)\);\n', html)
+    options = re.search(r'\{nodes: nodes, edges: edges\}, (.*?)\);\n', html).group(1)
+    return json.loads(nodes), json.loads(edges), json.loads(options)
+
+@pytest.fixture(scope='module')
+def planted():
+    G = nx.planted_partition_graph(6, 50, 0.2, 0.01, seed=3)
+    partition = {n: n // 50 for n in G}
+    return G, partition
+
+def test_level_html_carries_the_layout(planted, tmp_path):
+    G, partition = planted
+    level = top_degree_level(G, partition, max_nodes=100)
+    path = tmp_path / 'out' / 'network.html'
+    html = render_level(level, output_path=str(path))
+    assert path.read_text(encoding='utf-8') == html
+    nodes, edges, options = network_data(html)
+    assert [n['id'] for n in nodes] == level['nodes']['id'].tolist()
+    assert [n['x'] for n in nodes] == pytest.approx(level['nodes']['x'].tolist())
+    assert all(n['physics'] is False and n['group'] == partition[n['id']] for n in nodes)
+    assert len(edges) == len(level['edges']) and options['physics']['enabled'] is False
+    assert 'arrows' not in options['edges']
+
+def test_supergraph_and_drill_down(planted):
+    G, partition = planted
+    level = supergraph_level(G, partition)
+    assert sorted(level['nodes']['id'].tolist()) == list(range(6))
+    nodes, edges, _ = network_data(render_level(level))
+    assert len(nodes) == 6 and len(edges) == len(level['edges'])
+    level = community_level(CSRGraph.from_networkx(G), partition, 2, max_nodes=20)
+    assert len(level['nodes']) == 20 and set(level['nodes']['group']) == {2}
+    with pytest.raises(KeyError):
+        community_level(G, partition, 99)
+
+def test_labels_cannot_break_out_of_the_script():
+    G = nx.DiGraph([('</script><b>x', 'b'), ('b', 'c')])
+    html = render_level(top_degree_level(G))
+    assert html.count('</script>') == 2
+    nodes, edges, options = network_data(html)
+    assert sorted(n['label'] for n in nodes) == sorted(['</script><b>x', 'b', 'c'])
+    assert 'group' not in nodes[0] and options['edges']['arrows'] == 'to'
+    assert {(e['from'], e['to']) for e in edges} == set(G.edges())